@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.conftest
+~~~~~~~~~~~~
+Shared fixtures of the pytest-benchmark suite: fixed seeds, the benchmark schema and workflow clients, and the
+library versions recorded in the machine info of every saved benchmark run.
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import importlib.metadata
+import importlib.util
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPO_DIR)
+
+BENCHMARK_SEED = 42
+
+# Groupable, joinable, numeric and string columns with fixed cardinalities, so that results are comparable
+BENCHMARK_SCHEMA = {'key__city': {'provider': 'city', 'cardinality': 100},
+                    'grp__country_code': {'provider': 'country_code', 'cardinality': 20},
+                    'num__pyint': 'pyint',
+                    'num__random_int': 'random_int',
+                    'txt__sentence': 'sentence',
+                    'id__uuid4': 'uuid4'}
+
+# In-process clients and the file formats they serialize to. Modin and dask are left out, their engine startup
+# dominates small benchmarks.
+CLIENT_FORMATS = {'pandas': ['csv'],
+                  'sql': ['csv'],
+                  'chunked': ['csv'],
+                  'duckdb': ['csv', 'parquet'],
+                  'polars': ['csv', 'parquet']}
+
+_CLIENT_MODULES = {'duckdb': 'duckdb', 'polars': 'polars'}
+
+_LIBRARIES = ['fuzzydata', 'pandas', 'numpy', 'faker', 'SQLAlchemy', 'duckdb', 'polars', 'pyarrow']
+
+
+def pytest_benchmark_update_machine_info(config, machine_info):
+    """ Record the versions of fuzzydata and its libraries, so that saved runs are only compared like for like """
+    versions = {}
+    for library in _LIBRARIES:
+        try:
+            versions[library] = importlib.metadata.version(library)
+        except importlib.metadata.PackageNotFoundError:
+            versions[library] = None
+    machine_info['libraries'] = versions
+    machine_info['cpu_count'] = os.cpu_count()
+    machine_info['benchmark_seed'] = BENCHMARK_SEED
+
+
+@pytest.fixture(autouse=True)
+def fixed_seed():
+    """ Seed the global random generators before every benchmark """
+    random.seed(BENCHMARK_SEED)
+    np.random.seed(BENCHMARK_SEED)
+
+
+def client_workflow(client: str, out_directory: str):
+    """
+    Workflow of a client, skipping the benchmark if the client's library is not installed
+    :param client: Client name, see fuzzydata.clients.supported_workflows
+    :param out_directory: Output directory of the workflow
+    :return: Workflow object
+    """
+    if client in _CLIENT_MODULES and not importlib.util.find_spec(_CLIENT_MODULES[client]):
+        pytest.skip(f'{_CLIENT_MODULES[client]} is not installed')
+    from fuzzydata.clients import supported_workflows
+    return supported_workflows[client](name=f'bench_{client}', out_directory=out_directory)
+
+
+def client_artifact(workflow, label: str, df, file_format: str = 'csv'):
+    """
+    Artifact of a workflow holding df, with the benchmark schema
+    :param workflow: Workflow object
+    :param label: Artifact label
+    :param df: pandas Dataframe
+    :param file_format: File format of the artifact
+    :return: Artifact object
+    """
+    artifact = workflow.initialize_new_artifact(label=label, filename=f'{workflow.artifact_dir}/{label}.{file_format}',
+                                                schema_map=BENCHMARK_SCHEMA)
+    artifact.file_format = file_format
+    artifact.from_df(df)
+    return artifact
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.startup
+~~~~~~~~~~~~
+Measures process startup cost of fuzzydata: importing the CLI, printing its help and resolving each installed
+workflow client, each in a fresh interpreter.
+
+Usage: python benchmarks/startup.py [--repeat N] [--importtime]
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPO_DIR)
+
+
+def scenarios():
+    from fuzzydata.clients import supported_workflows
+    yield 'import fuzzydata.cli', ['-c', 'import fuzzydata.cli']
+    yield 'fuzzydata --help', ['-m', 'fuzzydata.cli', '--help']
+    for name in supported_workflows:
+        yield f'resolve client {name}', ['-c', f'from fuzzydata.clients import supported_workflows; '
+                                               f'supported_workflows[{name!r}]']
+
+
+def time_process(args, repeat):
+    """
+    :return: List of wall clock times in seconds of running the interpreter with args repeat times
+    """
+    env = dict(os.environ, PYTHONPATH=_REPO_DIR)
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable] + args, env=env, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def top_imports(args, num=10):
+    """
+    :return: The num slowest (cumulative) imports of running the interpreter with args, from python -X importtime
+    """
+    env = dict(os.environ, PYTHONPATH=_REPO_DIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=env, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            imports.append((int(fields[1]), fields[2].strip()))
+    return sorted(imports, reverse=True)[:num]
+
+
+def main(args):
+    parser = argparse.ArgumentParser(prog='startup')
+    parser.add_argument('--repeat', help='Number of runs per scenario', type=int, default=5)
+    parser.add_argument('--importtime', help='Also list the slowest imports per scenario', action='store_true')
+    options = parser.parse_args(args)
+
+    print(f"{'scenario':<32}{'min (s)':>10}{'median (s)':>12}")
+    for name, scenario_args in scenarios():
+        timings = time_process(scenario_args, options.repeat)
+        print(f'{name:<32}{min(timings):>10.3f}{statistics.median(timings):>12.3f}')
+        if options.importtime:
+            for cumulative_us, module in top_imports(scenario_args):
+                print(f'    {cumulative_us / 1e6:>8.3f}  {module}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
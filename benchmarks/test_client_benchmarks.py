@@ -0,0 +1,86 @@
+import itertools
+
+import pytest
+
+from benchmarks.conftest import BENCHMARK_SCHEMA, BENCHMARK_SEED, CLIENT_FORMATS, client_artifact, client_workflow
+from fuzzydata.core.generator import generate_table
+
+_OP_LISTS = {
+    'rowwise': [{'op': 'select', 'args': {'condition': '`num__random_int` <= 5000'}},
+                {'op': 'fill', 'args': {'col_name': 'grp__country_code', 'old_value': '"US"', 'new_value': '"CA"'}},
+                {'op': 'project', 'args': {'output_cols': ['key__city', 'grp__country_code', 'num__pyint']}}],
+    'groupby': [{'op': 'sample', 'args': {'frac': 0.5}},
+                {'op': 'groupby', 'args': {'group_columns': ['grp__country_code'],
+                                           'agg_columns': ['num__pyint', 'num__random_int'],
+                                           'agg_function': 'sum'}}],
+}
+
+_SIZES = [1000, 100000]
+
+_labels = itertools.count()
+
+
+@pytest.fixture(scope='module', params=_SIZES)
+def source_df(request):
+    return generate_table(request.param, column_dict=BENCHMARK_SCHEMA, seed=BENCHMARK_SEED)
+
+
+@pytest.mark.parametrize('client', list(CLIENT_FORMATS))
+@pytest.mark.parametrize('op_list', list(_OP_LISTS))
+def test_materialize(benchmark, client, op_list, source_df, tmp_path):
+    workflow = client_workflow(client, str(tmp_path))
+    source = client_artifact(workflow, 'source', source_df)
+
+    def chained_operation():
+        operation = source.operation_class(sources=[source])
+        for op_dict in _OP_LISTS[op_list]:
+            operation.chain_operation(op_dict['op'], op_dict['args'])
+        return (operation,), {}
+
+    def execute(operation):
+        return operation.execute(f'result_{next(_labels)}')
+
+    result = benchmark.pedantic(execute, setup=chained_operation, rounds=5)
+    assert len(result) > 0
+    workflow.close()
+
+
+@pytest.mark.parametrize('num_ops', [5, 50])
+def test_sql_chain_builder(benchmark, num_ops, tmp_path):
+    workflow = client_workflow('sql', str(tmp_path))
+    source = client_artifact(workflow, 'source', generate_table(10, column_dict=BENCHMARK_SCHEMA,
+                                                                seed=BENCHMARK_SEED))
+    op_list = list(itertools.islice(itertools.cycle(_OP_LISTS['rowwise'][:2] + [{'op': 'sample',
+                                                                                'args': {'frac': 0.9}}]), num_ops))
+
+    def build_chain():
+        operation = source.operation_class(sources=[source])
+        for op_dict in op_list:
+            operation.chain_operation(op_dict['op'], op_dict['args'])
+        return operation.code
+
+    assert benchmark(build_chain).count('FROM') >= num_ops
+    workflow.close()
+
+
+@pytest.mark.parametrize('client,file_format', [(client, file_format) for client, file_formats in
+                                                 CLIENT_FORMATS.items() for file_format in file_formats])
+def test_serialize(benchmark, client, file_format, source_df, tmp_path):
+    workflow = client_workflow(client, str(tmp_path))
+    source = client_artifact(workflow, 'source', source_df, file_format=file_format)
+    # Serialize to another file, the chunked client's artifacts already live in their own file
+    benchmark.pedantic(source.serialize, args=(f'{workflow.artifact_dir}/serialized.{file_format}',), rounds=5)
+    workflow.close()
+
+
+@pytest.mark.parametrize('client,file_format', [(client, file_format) for client, file_formats in
+                                                 CLIENT_FORMATS.items() for file_format in file_formats])
+def test_deserialize(benchmark, client, file_format, source_df, tmp_path):
+    workflow = client_workflow(client, str(tmp_path))
+    client_artifact(workflow, 'source', source_df, file_format=file_format).serialize()
+    artifact = workflow.initialize_new_artifact(label='loaded', filename=f'{workflow.artifact_dir}/source.{file_format}',
+                                                schema_map=BENCHMARK_SCHEMA)
+    artifact.file_format = file_format
+    benchmark.pedantic(artifact.deserialize, rounds=5)
+    assert len(artifact) == len(source_df.index)
+    workflow.close()
@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.conftest import BENCHMARK_SCHEMA, BENCHMARK_SEED
+from fuzzydata.clients import DataFrameWorkflow
+from fuzzydata.clients.pandas import DataFrameArtifact
+from fuzzydata.core.generator import WIDE_TABLE_COLUMNS, generate_schema, generate_table
+
+
+@pytest.mark.parametrize('num_cols', [10, 100, 1000])
+def test_generate_schema(benchmark, num_cols):
+    schema = benchmark(generate_schema, num_cols)
+    assert len(schema) == num_cols
+
+
+@pytest.mark.parametrize('num_rows,num_cols', [(1000, 6), (10000, 6), (100, 100)])
+def test_generate_table(benchmark, num_rows, num_cols):
+    schema = BENCHMARK_SCHEMA if num_cols == len(BENCHMARK_SCHEMA) else generate_schema(num_cols)
+    table = benchmark.pedantic(generate_table, args=(num_rows,), kwargs={'column_dict': schema, 'seed': BENCHMARK_SEED},
+                               rounds=3)
+    assert table.shape == (num_rows, num_cols)
+
+
+def test_generate_wide_table(benchmark):
+    schema = generate_schema(WIDE_TABLE_COLUMNS)
+    table = benchmark.pedantic(generate_table, args=(1000,), kwargs={'column_dict': schema, 'seed': BENCHMARK_SEED},
+                               rounds=3)
+    assert len(table.columns) == WIDE_TABLE_COLUMNS
+
+
+@pytest.mark.parametrize('num_artifacts', [10, 100, 1000])
+def test_select_random_artifact(benchmark, num_artifacts, tmp_path):
+    workflow = DataFrameWorkflow(name='bench_select', out_directory=str(tmp_path))
+    df = generate_table(10, column_dict=BENCHMARK_SCHEMA, seed=BENCHMARK_SEED)
+    for i in range(num_artifacts):
+        workflow.add_artifact(DataFrameArtifact(f'artifact_{i}', from_df=df, schema_map=BENCHMARK_SCHEMA))
+    artifact = benchmark(workflow.select_random_artifact, bfactor=1.0, exclude=[])
+    assert artifact.label in workflow.artifact_dict
@@ -19,8 +19,8 @@ import json
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Clients are imported lazily on lookup, so listing them in --help does not import any dataframe library
 from fuzzydata.clients import supported_workflows
-from fuzzydata.core.generator import generate_workflow
 
 _LOG_LEVELS = {
     'critical': logging.CRITICAL,
@@ -92,22 +92,189 @@ def setup_arguments(args):
                         help='JSON-encoded list of ops to exclude e.g. ["pivot"]',
                         type=str)
 
+    parser.add_argument("--column_dist",
+                        help='JSON-encoded column spec options applied to the group by and merge key columns of the '
+                             'base artifact, e.g. {"cardinality": 100, "distribution": "zipf", "zipf_a": 1.2, '
+                             '"hot_fraction": 0.1}',
+                        type=str)
+    parser.add_argument("--null_rate",
+                        help='Fraction of null values in every column of the base artifact (default no nulls)',
+                        type=float)
+    parser.add_argument("--star_schema",
+                        help='JSON-encoded star schema options, generates the base artifact as the fact table of a star '
+                             'schema with dimension artifacts, e.g. {"num_dimensions": 3, "dimension_rows": 100}',
+                        type=str)
+    parser.add_argument("--schema_budget",
+                        help='JSON-encoded generation budget of the base artifact schema, e.g. '
+                             '{"min_rows_per_sec": 5000, "max_bytes_per_row": 300, "cost_table": "costs.json"} '
+                             'with a cost table written by fuzzydata profile (default the shipped cost table)',
+                        type=str)
+    parser.add_argument("--selectivity",
+                        help='Target fraction of rows kept by the generated selects (default random)',
+                        type=float)
+    parser.add_argument("--op_budget",
+                        help='JSON-encoded size limits of every generated operation result, operations estimated to '
+                             'exceed them are not generated, e.g. {"max_rows": 1000000, "max_columns": 500, '
+                             '"max_bytes": 1e9}',
+                        type=str)
+    parser.add_argument("--history_db",
+                        help='SQLite benchmark history database to append the performance records of this run to, '
+                             'compare runs with fuzzydata compare',
+                        type=str)
     parser.add_argument("--scale_artifact",
                         help='JSON-encoded dict of {artifact_label: new_size} to be scaled up '
                              'e.g. {"artifact_0" : 1000000}',
                         type=str)
+    parser.add_argument("--scale_mode",
+                        help='How --scale_artifact scales artifacts: regenerate them with faker (default) or upsample '
+                             'the pre-generated artifacts by replicating and resampling their rows',
+                        choices=['regenerate', 'upsample'], default='regenerate', type=str)
+    parser.add_argument("--scale_options",
+                        help='JSON-encoded options of the upsample scale mode, e.g. {"perturb": 0.1, '
+                             '"expand_keys": true, "chunk_rows": 1000000, "seed": 0}',
+                        type=str)
 
     options = parser.parse_args(args)
 
     return options
 
 
+def setup_profile_arguments(args):
+    """Processes the arguments of the profile command using argparse library
+
+    :param args: list of command line arguments after the command name
+    :return: options object containing the options listed in args or their defaults.
+    """
+    parser = argparse.ArgumentParser(prog='fuzzydata profile',
+                                     description='Measure the rows/sec and bytes/row of the faker providers and '
+                                                 'write them to a cost table for --schema_budget')
+    parser.add_argument("--output",
+                        help="Cost table JSON file to be written",
+                        type=str, default='provider_costs.json')
+    parser.add_argument("--samples",
+                        help="Number of values to generate per provider",
+                        type=int, default=1000)
+    parser.add_argument("--providers",
+                        help='JSON-encoded list of providers to profile (default all providers)',
+                        type=str)
+    parser.add_argument("--log",
+                        help="Set Logging Level",
+                        type=str, default='info')
+    return parser.parse_args(args)
+
+
+def profile(args):
+    """ Entry point of the fuzzydata profile command
+
+    :param args: command line arguments after the command name
+    :return: None
+    """
+    options = setup_profile_arguments(args)
+    logging.basicConfig(level=_LOG_LEVELS[options.log.lower()], format=_LOG_FORMAT)
+    logger = logging.getLogger(__name__)
+
+    from fuzzydata.core.profiler import profile_providers, write_cost_table
+    cost_table = profile_providers(json.loads(options.providers) if options.providers else None,
+                                   num_samples=options.samples)
+    write_cost_table(cost_table, options.output)
+
+    rows_per_sec = {provider: costs['rows_per_sec'] for provider, costs in cost_table.items()}
+    slowest = sorted(rows_per_sec, key=rows_per_sec.get)[:5]
+    logger.info(f'Slowest providers (rows/sec): {", ".join(f"{p} ({rows_per_sec[p]:.0f})" for p in slowest)}')
+    logger.info(f'Cost table of {len(cost_table)} providers written to {options.output}')
+
+
+def setup_compare_arguments(args):
+    """Processes the arguments of the compare command using argparse library
+
+    :param args: list of command line arguments after the command name
+    :return: options object containing the options listed in args or their defaults.
+    """
+    parser = argparse.ArgumentParser(prog='fuzzydata compare',
+                                     description='Compare the operation timings of two runs (or groups of runs) in a '
+                                                 'benchmark history database written with --history_db, and report '
+                                                 'significant speedups and regressions')
+    parser.add_argument("--history",
+                        help="Benchmark history database",
+                        type=str, required=True)
+    parser.add_argument("--baseline",
+                        help='Baseline runs: comma-separated run ids or key=value filters on name, fingerprint, '
+                             'client, scale, file_format, revision (prefix) and host, e.g. '
+                             '"client=pandas,revision=1a2b3c"',
+                        type=str, required=True)
+    parser.add_argument("--candidate",
+                        help="Candidate runs, in the format of --baseline",
+                        type=str, required=True)
+    parser.add_argument("--by",
+                        help="Compare every operation of the workflow (dst, samples are repeated runs) or every kind "
+                             "of operation (op)",
+                        choices=['dst', 'op'], default='dst', type=str)
+    parser.add_argument("--alpha",
+                        help="Significance level of the permutation tests",
+                        type=float, default=0.05)
+    parser.add_argument("--threshold",
+                        help="Minimum relative change of the median time to report a speedup or regression",
+                        type=float, default=0.05)
+    parser.add_argument("--output",
+                        help="CSV file to write the comparison report to",
+                        type=str)
+    parser.add_argument("--fail_on_regression",
+                        help="Exit with status 1 if any operation is significantly slower",
+                        action='store_true')
+    parser.add_argument("--log",
+                        help="Set Logging Level",
+                        type=str, default='info')
+    return parser.parse_args(args)
+
+
+def compare(args):
+    """ Entry point of the fuzzydata compare command
+
+    :param args: command line arguments after the command name
+    :return: Dataframe of the comparison report
+    """
+    options = setup_compare_arguments(args)
+    logging.basicConfig(level=_LOG_LEVELS[options.log.lower()], format=_LOG_FORMAT)
+    logger = logging.getLogger(__name__)
+
+    from fuzzydata.core.history import HistoryStore, compare_runs
+    history = HistoryStore(options.history)
+    baseline_runs, candidate_runs = history.runs(options.baseline), history.runs(options.candidate)
+    for side, runs in (('baseline', baseline_runs), ('candidate', candidate_runs)):
+        if runs.empty:
+            logger.error(f'No {side} runs in {options.history} match {getattr(options, side)}')
+            sys.exit(1)
+    if len(set(baseline_runs['fingerprint']) | set(candidate_runs['fingerprint'])) > 1:
+        logger.warning('The compared runs belong to different workflows (fingerprints), timings may not be comparable')
+
+    report = compare_runs(history.records(baseline_runs['run_id'].tolist()),
+                          history.records(candidate_runs['run_id'].tolist()),
+                          by=options.by, alpha=options.alpha, threshold=options.threshold)
+    logger.info(f"Baseline runs {baseline_runs['run_id'].tolist()} vs candidate runs "
+                f"{candidate_runs['run_id'].tolist()}:\n{report.to_string(index=False)}")
+    counts = report['status'].value_counts()
+    logger.info(f"{counts.get('faster', 0)} faster, {counts.get('slower', 0)} slower, "
+                f"{counts.get('unchanged', 0)} unchanged")
+    if options.output:
+        report.to_csv(options.output, index=False)
+        logger.info(f'Comparison report written to {options.output}')
+    if options.fail_on_regression and counts.get('slower', 0):
+        sys.exit(1)
+    return report
+
+
+_COMMANDS = {'profile': profile, 'compare': compare}
+
+
 def main(args):
     """ Main entry point into fuzzydata CLI
 
-    :param args: command line arguments
+    :param args: command line arguments, optionally starting with a command name (profile, compare)
     :return: None
     """
+    if args and args[0] in _COMMANDS:
+        return _COMMANDS[args[0]](args[1:])
+
     options = setup_arguments(args)
 
     # Set log level first
@@ -131,6 +298,9 @@ def main(args):
     if options.wf_options:
         wf_options = json.loads(options.wf_options)
 
+    if options.history_db:
+        wf_options['history_db'] = options.history_db
+
     if options.exclude_ops:
         exclude_ops = json.loads(options.exclude_ops)
 
@@ -143,25 +313,40 @@ def main(args):
         scale_artifact = {}
         if options.scale_artifact:
             scale_artifact = json.loads(options.scale_artifact)
+        scale_options = json.loads(options.scale_options) if options.scale_options else {}
         logger.info(f'Replaying Previous Workflow from directory {options.replay_dir}')
         workflow = supported_workflows[options.wf_client].load_workflow(input_dir=options.replay_dir,
                                                                         out_directory=options.output_dir,
                                                                         name=options.wf_name,
                                                                         replay=True,
                                                                         wf_options=wf_options,
-                                                                        scale_artifact=scale_artifact)
+                                                                        scale_artifact=scale_artifact,
+                                                                        scale_mode=options.scale_mode,
+                                                                        scale_options=scale_options)
+        if workflow is None:
+            logger.error(f'Could not replay the workflow in {options.replay_dir}')
+            sys.exit(1)
         workflow.serialize_workflow()
 
     else:
+        from fuzzydata.core.generator import generate_workflow
         workflow = generate_workflow(workflow_class=supported_workflows[options.wf_client],
                                      name=options.wf_name, num_versions=options.versions,
                                      base_shape=(options.columns, options.rows),
                                      out_directory=options.output_dir, bfactor=options.bfactor,
                                      wf_options=wf_options,
-                                     exclude_ops=exclude_ops, matfreq=options.matfreq)
+                                     exclude_ops=exclude_ops, matfreq=options.matfreq,
+                                     column_dist=json.loads(options.column_dist) if options.column_dist else None,
+                                     star_schema=json.loads(options.star_schema) if options.star_schema else None,
+                                     null_rate=options.null_rate,
+                                     schema_budget=json.loads(options.schema_budget) if options.schema_budget else None,
+                                     selectivity=options.selectivity,
+                                     op_budget=json.loads(options.op_budget) if options.op_budget else None)
 
         # Generate Workflow calls serialize at the end.
 
+    workflow.close()
+
     logger.info(f'Workflow generation completed and written to directory: {workflow.out_dir}')
     logger.info(f'To rerun this workflow in the future, use the following command:\n\nfuzzydata --replay_dir={workflow.out_dir}\n\n')
 
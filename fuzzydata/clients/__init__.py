@@ -1,17 +1,82 @@
 import importlib
-from copy import deepcopy
+import importlib.util
+from collections.abc import Mapping
+from typing import Dict, Tuple
 
-from fuzzydata.clients.pandas import DataFrameWorkflow
-from fuzzydata.clients.sqlite import SQLWorkflow
+# Entry point group under which third-party packages can register workflow clients, e.g. in setup.py:
+# entry_points={'fuzzydata.clients': ['myclient = mypackage.client:MyWorkflow']}
+ENTRY_POINT_GROUP = 'fuzzydata.clients'
 
-travis_workflows = {
-    'pandas': DataFrameWorkflow,
-    'sql': SQLWorkflow
+# Built-in clients: name -> (module, workflow class, package the client requires or None)
+_builtin_clients: Dict[str, Tuple[str, str, str]] = {
+    'pandas': ('fuzzydata.clients.pandas', 'DataFrameWorkflow', None),
+    'sql': ('fuzzydata.clients.sqlite', 'SQLWorkflow', None),
+    'chunked': ('fuzzydata.clients.chunked', 'ChunkedWorkflow', None),
+    'modin': ('fuzzydata.clients.modin', 'ModinWorkflow', 'modin'),
+    'duckdb': ('fuzzydata.clients.duckdb', 'DuckDBWorkflow', 'duckdb'),
+    'polars': ('fuzzydata.clients.polars', 'PolarsWorkflow', 'polars'),
+    'dask': ('fuzzydata.clients.dask', 'DaskWorkflow', 'distributed'),
 }
 
-supported_workflows = deepcopy(travis_workflows)
 
-modin_spec = importlib.util.find_spec('modin')
-if modin_spec:
-    from fuzzydata.clients.modin import ModinWorkflow
-    supported_workflows['modin'] = ModinWorkflow
+def _client_entry_points() -> dict:
+    from importlib.metadata import entry_points
+    eps = entry_points()
+    eps = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, 'select') else eps.get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep for ep in eps}
+
+
+class WorkflowRegistry(Mapping):
+    """
+    Mapping of client name -> Workflow class that only imports a client's module when its class is looked up, so
+    that e.g. running the SQL client does not pay for importing modin or dask. Clients whose required package is not
+    installed are left out.
+    """
+    def __init__(self, clients, entry_points=False):
+        """
+        :param clients: Names of the built-in clients in this registry
+        :param entry_points: Also include third-party clients registered under the fuzzydata.clients entry point group
+        """
+        self._targets = {name: _builtin_clients[name] for name in clients
+                         if _builtin_clients[name][2] is None or importlib.util.find_spec(_builtin_clients[name][2])}
+        self._scan_entry_points = entry_points
+        self._plugins = None
+        self._loaded = {}
+
+    @property
+    def targets(self) -> dict:
+        """ Import targets (module, class, requirement tuples or entry points) of the clients, built-ins first """
+        if self._scan_entry_points and self._plugins is None:
+            self._plugins = {name: ep for name, ep in _client_entry_points().items() if name not in self._targets}
+        return {**self._targets, **(self._plugins or {})}
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            target = self.targets[name]
+            if isinstance(target, tuple):
+                self._loaded[name] = getattr(importlib.import_module(target[0]), target[1])
+            else:
+                self._loaded[name] = target.load()
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({list(self)})'
+
+
+travis_workflows = WorkflowRegistry(['pandas', 'sql', 'chunked'])
+
+supported_workflows = WorkflowRegistry(_builtin_clients.keys(), entry_points=True)
+
+
+def __getattr__(name):
+    """ Lazily import workflow classes accessed as attributes, e.g. from fuzzydata.clients import SQLWorkflow """
+    for module, class_name, _ in _builtin_clients.values():
+        if class_name == name:
+            return getattr(importlib.import_module(module), class_name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
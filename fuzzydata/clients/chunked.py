@@ -0,0 +1,292 @@
+import ast
+import logging
+import math
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas
+from pandas.api.types import is_numeric_dtype
+
+from fuzzydata.clients.pandas import DataFrameOperation, DataFrameWorkflow
+from fuzzydata.core.artifact import Artifact
+from fuzzydata.core.generator import column_value_pools, csv_read_options, generate_table, nullable_dtypes
+from fuzzydata.core.statistics import compute_chunk_statistics
+
+logger = logging.getLogger(__name__)
+
+
+def _key_hash(chunk: pandas.DataFrame, key_col) -> np.ndarray:
+    """ Hash of the merge key of every row, numeric keys are hashed as floats so that e.g. 1 and 1.0 match """
+    keys = chunk[[key_col] if isinstance(key_col, str) else list(key_col)]
+    keys = keys.apply(lambda col: col.astype('float64') if is_numeric_dtype(col.dtype) else col.astype(object))
+    return pandas.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def _hash_partition(chunks: Iterable[pandas.DataFrame], key_col, num_partitions: int, prefix: str) -> List[str]:
+    """
+    Write the rows of chunks to num_partitions files by the hash of their merge key, keeping their dtypes
+    :return: List of the partition files, None for empty partitions
+    """
+    files = [None] * num_partitions
+    for chunk in chunks:
+        partitions = _key_hash(chunk, key_col) % num_partitions
+        for ix, partition in chunk.groupby(partitions, sort=False):
+            files[ix] = f'{prefix}_{ix}.pkl'
+            with open(files[ix], 'ab') as outfile:
+                pickle.dump(partition, outfile)
+    return files
+
+
+def _read_partition(filename: str) -> Iterator[pandas.DataFrame]:
+    """ Iterate over the chunks of a partition written by _hash_partition """
+    with open(filename, 'rb') as infile:
+        while True:
+            try:
+                yield pickle.load(infile)
+            except EOFError:
+                return
+
+
+class ChunkedArtifact(Artifact):
+    """
+    Out-of-core dataframe artifact: the table lives in a CSV file on disk and is only ever streamed through
+    memory in batches of chunk_size rows.
+    """
+    def __init__(self, *args, **kwargs):
+        self.chunk_size = kwargs.pop("chunk_size", 100000)
+        from_df = kwargs.pop("from_df", None)
+        from_chunks = kwargs.pop("from_chunks", None)
+        super(ChunkedArtifact, self).__init__(*args, **kwargs)
+        self.pd = pandas
+        self.operation_class = ChunkedOperation
+        self.data_file = None  # CSV file currently backing this artifact
+        self.owns_data_file = False  # Only files written by this artifact and not serialized are removed on destroy
+        self._num_rows = None
+
+        if from_chunks is not None:
+            self.from_chunks(from_chunks)
+        elif from_df is not None:
+            self.from_df(from_df)
+
+    def _target_file(self):
+        if not self.filename:
+            self.filename = f"{tempfile.mkdtemp(prefix='fuzzydata_')}/{self.label}.csv"
+        return str(self.filename)
+
+    def from_chunks(self, chunks: Iterable[pandas.DataFrame]) -> None:
+        """ Stream dataframe chunks into this artifact's CSV file, holding at most one chunk in memory """
+        self.fingerprint = None
+        filename = self._target_file()
+        num_rows = 0
+        header_written = False
+        for chunk in chunks:
+            chunk.to_csv(filename, mode='a' if header_written else 'w', header=not header_written, index=False)
+            header_written = True
+            num_rows += len(chunk.index)
+        if not header_written:
+            open(filename, 'w').close()
+        self.data_file = filename
+        self.owns_data_file = True
+        self._num_rows = num_rows
+        self.in_memory = False
+
+    def iter_chunks(self) -> Iterator[pandas.DataFrame]:
+        """ Iterate over the artifact in dataframes of at most chunk_size rows """
+        if not os.path.getsize(self.data_file):
+            return iter([])
+        chunks = self.pd.read_csv(self.data_file, chunksize=self.chunk_size, **csv_read_options(self.schema_map))
+        return (nullable_dtypes(chunk, self.schema_map) for chunk in chunks)
+
+    def generate(self, num_rows, schema):
+        self.schema_map = schema
+        value_pools = column_value_pools(schema, num_rows)  # Shared by all chunks to keep column cardinalities
+        self.from_chunks(generate_table(min(self.chunk_size, num_rows - start), column_dict=schema,
+                                        value_pools=value_pools)
+                         for start in range(0, num_rows, self.chunk_size))
+
+    def from_df(self, df):
+        self.from_chunks(df.iloc[start:start + self.chunk_size] for start in range(0, max(len(df.index), 1),
+                                                                                   self.chunk_size))
+
+    def deserialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        # Stream directly from the serialized file instead of copying it
+        self.fingerprint = None
+        self.data_file = str(filename)
+        self.owns_data_file = False
+        self._num_rows = None
+
+    def serialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        if os.path.abspath(str(filename)) != os.path.abspath(self.data_file):
+            shutil.copyfile(self.data_file, str(filename))
+        else:
+            self.owns_data_file = False  # The data file is now the serialized artifact
+
+    def destroy(self):
+        if self.owns_data_file and os.path.exists(self.data_file):
+            os.remove(self.data_file)
+        self.data_file = None
+        self.owns_data_file = False
+        self._num_rows = None
+
+    def to_df(self) -> pandas.DataFrame:
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return self.pd.DataFrame(columns=list(self.schema_map.keys()) if self.schema_map else None)
+        return self.pd.concat(chunks, ignore_index=True)
+
+    def statistics(self, key_columns: Iterable[str] = ()) -> Dict:
+        """ Override to compute the statistics chunk by chunk """
+        return compute_chunk_statistics(self.iter_chunks(), key_columns=key_columns)
+
+    def __len__(self):
+        if self._num_rows is None:
+            self._num_rows = sum(len(chunk.index) for chunk in self.iter_chunks())
+        return self._num_rows
+
+
+class ChunkedOperation(DataFrameOperation):
+    """
+    Executes the chained op list over the chunks of the source artifact. Row-wise ops are applied per chunk,
+    groupby and pivot are computed as partial aggregates per chunk that are combined incrementally, and merges
+    broadcast the right artifact to every chunk of the left one if it fits in a chunk, or else hash partition both
+    artifacts on disk by their key and join them partition by partition. The chained pandas code is still generated
+    for the exported workflow script.
+    """
+    # How partial aggregates of each aggregate function are combined across chunks
+    combine_functions = {
+        'min': 'min',
+        'max': 'max',
+        'sum': 'sum',
+        'count': 'sum',
+    }
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('artifact_class', ChunkedArtifact)
+        self.artifact_dir = kwargs.pop('artifact_dir', None)  # Directory of the results, default a temp directory
+        super(ChunkedOperation, self).__init__(*args, **kwargs)
+
+    def _chunk_function(self, op: str, args: Dict) -> Callable[[pandas.DataFrame], pandas.DataFrame]:
+        """ Return a function applying a row-wise op to a single chunk """
+        if op == 'sample':
+            return lambda chunk: chunk.sample(frac=args['frac'])
+        if op == 'project':
+            return lambda chunk: chunk[args['output_cols']]
+        if op == 'select':
+            return lambda chunk: chunk.query(args['condition'])
+        if op == 'apply':
+            new_col_name = f"{args['numeric_col']}__{args['a']}x_{args['b']}"
+            return lambda chunk: chunk.assign(**{new_col_name: chunk[args['numeric_col']] * args['a'] + args['b']})
+        if op == 'fill':
+            old_value, new_value = [ast.literal_eval(v) if isinstance(v, str) else v
+                                    for v in (args['old_value'], args['new_value'])]
+            return lambda chunk: chunk.replace({args['col_name']: old_value}, new_value)
+        raise NotImplementedError(f'{op} cannot be applied chunk by chunk')
+
+    def _aggregate(self, chunks: Iterable[pandas.DataFrame], group_columns: List[str], agg_columns: List[str],
+                   agg_function: str) -> pandas.DataFrame:
+        """ Aggregate over all chunks, folding each chunk's partial aggregate into a running result """
+        partial_functions = ['sum', 'count'] if agg_function == 'mean' else [agg_function]
+        result = None
+        for chunk in chunks:
+            partial = chunk.groupby(group_columns)[agg_columns].agg(partial_functions)
+            if result is not None:
+                partial = pandas.concat([result, partial]).groupby(level=list(range(len(group_columns))))\
+                    .agg({c: self.combine_functions[c[1]] for c in partial.columns})
+            result = partial
+        if result is None:
+            return pandas.DataFrame(columns=group_columns + agg_columns)
+        if agg_function == 'mean':
+            # Groups without any non-null values have a null mean (rather than 0/0, a NaN that nullable dtypes keep)
+            result = pandas.concat({c: result[(c, 'sum')] / result[(c, 'count')].where(result[(c, 'count')] > 0)
+                                    for c in agg_columns}, axis=1)
+        else:
+            result.columns = result.columns.droplevel(1)
+        return result.reset_index()
+
+    def _right_chunks(self, args: Dict) -> Iterator[pandas.DataFrame]:
+        chunks = self.sources[1].iter_chunks()
+        if args.get('right_cols') is not None:
+            return (chunk[args['right_cols']] for chunk in chunks)
+        return chunks
+
+    def _merge(self, chunks: Iterable[pandas.DataFrame], args: Dict) -> Iterator[pandas.DataFrame]:
+        """ Merge the chunks with the right source artifact, holding at most about two chunks in memory """
+        num_partitions = math.ceil(len(self.sources[1]) / self.sources[1].chunk_size)
+        if num_partitions <= 1:
+            right_chunks = list(self._right_chunks(args))
+            right_df = pandas.concat(right_chunks, ignore_index=True) if right_chunks else self.sources[1].to_df()
+            yield from (chunk.merge(right_df, on=args['key_col']) for chunk in chunks)
+            return
+
+        directory = tempfile.mkdtemp(prefix='fuzzydata_merge_')
+        try:
+            left_files = _hash_partition(chunks, args['key_col'], num_partitions, f'{directory}/left')
+            right_files = _hash_partition(self._right_chunks(args), args['key_col'], num_partitions,
+                                          f'{directory}/right')
+            for left_file, right_file in zip(left_files, right_files):
+                if left_file is None or right_file is None:
+                    continue
+                right_df = pandas.concat(_read_partition(right_file), ignore_index=True)
+                yield from (chunk.merge(right_df, on=args['key_col']) for chunk in _read_partition(left_file))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _execute_op_list(self, op_list: List[Dict]) -> Iterator[pandas.DataFrame]:
+        """ Build a lazy chunk pipeline for op_list over the first source artifact """
+        chunks = self.sources[0].iter_chunks()
+        for op_dict in op_list:
+            op, args = op_dict['op'], op_dict['args']
+            if op == 'groupby':
+                chunks = iter([self._aggregate(chunks, args['group_columns'], args['agg_columns'],
+                                               args['agg_function'])])
+            elif op == 'pivot':
+                aggregated = self._aggregate(chunks, args['index_cols'] + args['columns'], args['value_col'],
+                                             args['agg_func'])
+                pivoted = aggregated.pivot_table(index=args['index_cols'], columns=args['columns'],
+                                                 values=args['value_col'], aggfunc='first')
+                pivoted.columns = ['_'.join(str(x) for x in c) for c in pivoted.columns]
+                chunks = iter([pivoted.reset_index()])
+            elif op == 'merge':
+                chunks = self._merge(chunks, args)
+            else:
+                chunks = map(self._chunk_function(op, args), chunks)
+        return chunks
+
+    def materialize(self, new_label):
+        op_list = self.plan_op_list if self.plan_op_list is not None else self.op_list
+        chunks = self._execute_op_list(op_list)
+        super(DataFrameOperation, self).materialize(new_label)
+        return self.artifact_class(label=self.new_label,
+                                   filename=f"{self.artifact_dir}/{self.new_label}.csv" if self.artifact_dir else None,
+                                   chunk_size=self.sources[0].chunk_size,
+                                   from_chunks=chunks,
+                                   schema_map=self.current_schema_map)
+
+
+class ChunkedWorkflow(DataFrameWorkflow):
+    def __init__(self, *args, **kwargs):
+        self.chunk_size = kwargs.pop('chunk_size', 100000)
+        super(ChunkedWorkflow, self).__init__(*args, **kwargs)
+        self.artifact_class = ChunkedArtifact
+        self.operator_class = ChunkedOperation
+
+    def initialize_operation(self, artifacts: List[Artifact]) -> ChunkedOperation:
+        """ Override to write the results of operations to the artifact directory of this workflow """
+        operation = super(ChunkedWorkflow, self).initialize_operation(artifacts)
+        operation.artifact_dir = self.artifact_dir
+        return operation
+
+    def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
+        if not filename:
+            filename = f"{self.artifact_dir}/{label}.csv"
+        return ChunkedArtifact(label, filename=filename, chunk_size=self.chunk_size, schema_map=schema_map)
@@ -0,0 +1,149 @@
+import logging
+from functools import reduce
+from typing import Dict, Iterable, List
+
+import dask.dataframe as dd
+import pandas
+
+from fuzzydata.clients.engine import engine_manager, engine_options, start_engine, stop_engine
+from fuzzydata.clients.pandas import DataFrameOperation, DataFrameWorkflow, eval_chain
+from fuzzydata.core.artifact import Artifact
+from fuzzydata.core.generator import csv_read_options, generate_table
+from fuzzydata.core.operation import T
+from fuzzydata.core.statistics import combine_statistics, finalize_statistics, partial_statistics
+
+logger = logging.getLogger(__name__)
+
+
+class DaskArtifact(Artifact):
+    """
+    Artifact backed by a partitioned Dask DataFrame. partition_size is the number of rows per partition for tables
+    created from in-memory dataframes.
+    """
+    def __init__(self, *args, **kwargs):
+        self.partition_size = kwargs.pop("partition_size", 100000)
+        from_df = kwargs.pop("from_df", None)
+        super(DaskArtifact, self).__init__(*args, **kwargs)
+        self.pd = dd
+        self._deserialization_function = {
+            'csv': dd.read_csv,
+            'parquet': dd.read_parquet
+        }
+
+        self.operation_class = DaskOperation
+        self.table = None
+        self.in_memory = False
+
+        if from_df is not None:
+            self.from_df(from_df)
+
+    def generate(self, num_rows, schema):
+        self.from_df(generate_table(num_rows, column_dict=schema))
+        self.schema_map = schema
+
+    def from_df(self, df):
+        if isinstance(df, pandas.DataFrame):
+            df = dd.from_pandas(df, chunksize=self.partition_size)
+        self.fingerprint = None
+        self.table = df
+        self.in_memory = True
+
+    def deserialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        self.fingerprint = None
+        if self.file_format == 'csv':
+            self.table = dd.read_csv(str(filename), **csv_read_options(self.schema_map))
+        else:
+            # Only read schema columns, skipping any index column written out by other clients
+            columns = list(self.schema_map.keys()) if self.schema_map else None
+            self.table = dd.read_parquet(filename, columns=columns)
+        self.in_memory = True
+
+    def serialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        if self.in_memory:
+            if self.file_format == 'csv':
+                self.table.to_csv(str(filename), single_file=True, index=False)
+            else:
+                # One parquet file per partition under the filename directory
+                self.table.to_parquet(str(filename), write_index=False)
+
+    def destroy(self):
+        del self.table
+        self.in_memory = False
+
+    def to_df(self) -> dd.DataFrame:
+        """ Return the lazy Dask DataFrame of this artifact, see to_pandas to compute it """
+        return self.table
+
+    def statistics(self, key_columns: Iterable[str] = ()) -> Dict:
+        """ Override to compute partial statistics of every partition on the cluster """
+        import dask
+        partials = dask.compute(*[dask.delayed(partial_statistics)(partition, list(key_columns), ix)
+                                  for ix, partition in enumerate(self.table.to_delayed())])
+        return finalize_statistics(reduce(combine_statistics, partials, None))
+
+    def __len__(self):
+        if self.in_memory:
+            return len(self.table)
+
+
+class DaskOperation(DataFrameOperation):
+    """
+    Chains operations onto a lazy Dask DataFrame graph, which is only computed (and persisted on the cluster) at
+    materialization.
+    """
+    # Aggregate functions supported by dask's pivot_table
+    pivot_agg_functions = ['mean', 'sum', 'count']
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('artifact_class', DaskArtifact)
+        super(DaskOperation, self).__init__(*args, **kwargs)
+
+    def pivot(self, index_cols: List[str], columns: List[str], value_col: List[str], agg_func: str) -> T:
+        if agg_func not in self.pivot_agg_functions:
+            raise NotImplementedError(f'Dask pivot_table does not support aggregate function {agg_func}')
+        super(DataFrameOperation, self).pivot(index_cols, columns, value_col, agg_func)
+        # Dask needs the pivot columns as a categorical with known categories to infer the output columns
+        return f'.categorize(columns={columns}).pivot_table(index="{index_cols[0]}", columns="{columns[0]}", ' \
+               f'values="{value_col[0]}", aggfunc="{agg_func}").rename(columns=str).reset_index()'
+
+    def materialize(self, new_label):
+        new_df = eval_chain(self.code, self).persist()
+        super(DataFrameOperation, self).materialize(new_label)
+        return self.artifact_class(label=self.new_label,
+                                   from_df=new_df,
+                                   file_format=self.sources[0].file_format,
+                                   partition_size=self.sources[0].partition_size,
+                                   schema_map=self.current_schema_map)
+
+
+class DaskWorkflow(DataFrameWorkflow):
+    def __init__(self, *args, **kwargs):
+        self.file_format = kwargs.pop('file_format', 'parquet')
+        self.partition_size = kwargs.pop('partition_size', 100000)
+        options = {k: kwargs.pop(k) for k in engine_options if k in kwargs}
+        options.pop('npartitions', None)  # modin only
+        super(DaskWorkflow, self).__init__(*args, **kwargs)
+        self.artifact_class = DaskArtifact
+        self.operator_class = DaskOperation
+
+        # The cluster is shared by all workflows in this process and only started by the first one
+        start_engine(self, 'dask', **options)
+        self.client = engine_manager.client
+
+        cluster_options = ', '.join(f'{k}={v!r}' for k, v in options.items())
+        self.wf_code_export = "import dask.dataframe as dd\nfrom dask.distributed import Client, LocalCluster\n" \
+                              f"client = Client(LocalCluster({cluster_options}))\n"
+        self.code_export_reader = f"dd.read_{self.file_format}"
+
+    def close(self):
+        stop_engine(self)
+
+    def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
+        return DaskArtifact(label, filename=filename, file_format=self.file_format,
+                            partition_size=self.partition_size, schema_map=schema_map)
@@ -0,0 +1,188 @@
+from typing import List
+
+import duckdb
+import pandas
+import logging
+
+from fuzzydata.core.artifact import Artifact
+from fuzzydata.core.generator import generate_table
+from fuzzydata.core.operation import Operation, T, sql_literal
+from fuzzydata.core.workflow import Workflow
+
+logger = logging.getLogger(__name__)
+
+
+class DuckDBArtifact(Artifact):
+
+    def __init__(self, *args, **kwargs):
+        self.connection = kwargs.pop("connection")
+        self.from_sql = kwargs.pop("from_sql", None)
+        from_df = kwargs.pop("from_df", None)
+
+        super(DuckDBArtifact, self).__init__(*args, **kwargs)
+
+        self.operation_class = DuckDBOperation
+        self.pd = pandas
+        self.table = None  # Dataframe registered with DuckDB, kept alive for zero-copy scans
+
+        self._deserialization_function = {
+            'csv': 'read_csv_auto',
+            'parquet': 'read_parquet'
+        }
+        self._serialization_function = {
+            'csv': 'FORMAT CSV, HEADER',
+            'parquet': 'FORMAT PARQUET'
+        }
+
+        if self.from_sql:
+            self.connection.execute(self.from_sql)
+        elif from_df is not None:
+            self.from_df(from_df)
+
+    def _drop_relation(self):
+        """ Drop the table, view or registered dataframe currently stored under this artifact's label """
+        if self.table is not None:
+            self.connection.unregister(self.label)
+            self.table = None
+        relation_type = self.connection.execute('SELECT table_type FROM information_schema.tables '
+                                                'WHERE table_name = ?', [self.label]).fetchone()
+        if relation_type:
+            kind = 'VIEW' if relation_type[0] == 'VIEW' else 'TABLE'
+            self.connection.execute(f'DROP {kind} IF EXISTS "{self.label}"')
+
+    def generate(self, num_rows, schema):
+        self.from_df(generate_table(num_rows, column_dict=schema))
+        self.schema_map = schema
+
+    def from_df(self, df):
+        """ Register the dataframe with DuckDB so that it is scanned in place instead of being copied """
+        self._drop_relation()
+        self.fingerprint = None
+        self.table = df
+        self.connection.register(self.label, self.table)
+
+    def deserialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        self._drop_relation()
+        self.fingerprint = None
+        # Only read schema columns, skipping any index column written out by other clients
+        columns = ', '.join([f'"{c}"' for c in self.schema_map]) if self.schema_map else '*'
+        reader = self._deserialization_function[self.file_format]
+        self.connection.execute(f'CREATE TABLE "{self.label}" AS SELECT {columns} FROM {reader}(\'{filename}\')')
+
+    def serialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        self.connection.execute(f'COPY (SELECT * FROM "{self.label}") TO \'{filename}\' '
+                                f'({self._serialization_function[self.file_format]})')
+
+    def destroy(self):
+        self._drop_relation()
+
+    def to_df(self):
+        return self.connection.execute(f'SELECT * FROM "{self.label}"').df()
+
+    def __len__(self):
+        return self.connection.execute(f'SELECT COUNT(*) FROM "{self.label}"').fetchone()[0]
+
+
+class DuckDBOperation(Operation['DuckDBArtifact']):
+
+    def __init__(self, *args, **kwargs):
+        self.artifact_class = kwargs.pop('artifact_class', DuckDBArtifact)
+        super(DuckDBOperation, self).__init__(*args, **kwargs)
+        self.agg_function_dict = {
+            'mean': 'AVG'
+        }
+        self.code = f'SELECT * FROM "{self.sources[0].label}"'
+
+    def sample(self, frac: float) -> DuckDBArtifact:
+        super(DuckDBOperation, self).sample(frac)
+        return f"SELECT * FROM {{source}} USING SAMPLE {frac * 100} PERCENT (reservoir)"
+
+    def apply(self, numeric_col: str, a: float, b: float) -> DuckDBArtifact:
+        super(DuckDBOperation, self).apply(numeric_col, a, b)
+        new_col_name = f"{numeric_col}__{a}x_{b}"
+        return f'SELECT *, ("{numeric_col}" * {a}) + {b} AS "{new_col_name}" FROM {{source}}'
+
+    def groupby(self, group_columns: List[str], agg_columns: List[str], agg_function: str) -> DuckDBArtifact:
+        super(DuckDBOperation, self).groupby(group_columns, agg_columns, agg_function)
+        group_cols_str = ', '.join([f'"{x}"' for x in group_columns])
+
+        # Translate the aggregate function string if required
+        if agg_function in self.agg_function_dict:
+            agg_function = self.agg_function_dict[agg_function]
+
+        agg_cols_str = ', '.join([f'{agg_function}("{x}") AS "{x}"' for x in agg_columns])
+        return f"SELECT {group_cols_str}, {agg_cols_str} FROM {{source}} GROUP BY {group_cols_str}"
+
+    def project(self, output_cols: List[str]) -> T:
+        super(DuckDBOperation, self).project(output_cols)
+        project_predicate = ', '.join([f'"{x}"' for x in output_cols])
+        return f"SELECT {project_predicate} FROM {{source}}"
+
+    def select(self, condition: str) -> T:
+        super(DuckDBOperation, self).select(condition)
+        # Conditions use pandas/SQLite style backtick quoting for column labels
+        return f"SELECT * FROM {{source}} WHERE {condition.replace('`', chr(34))}"
+
+    def merge(self, key_col: List[str], right_cols: List[str] = None) -> T:
+        super(DuckDBOperation, self).merge(key_col, right_cols)
+        right_source = f'"{self.sources[1].label}"'
+        if right_cols is not None:
+            right_predicate = ', '.join([f'"{x}"' for x in right_cols])
+            right_source = f"(SELECT {right_predicate} FROM {right_source}) AS {right_source}"
+        return f'SELECT * FROM {{source}} INNER JOIN {right_source} USING ("{key_col}")'
+
+    def pivot(self, index_cols: List[str], columns: List[str], value_col: List[str], agg_func: str) -> T:
+        super(DuckDBOperation, self).pivot(index_cols, columns, value_col, agg_func)
+        if agg_func in self.agg_function_dict:
+            agg_func = self.agg_function_dict[agg_func]
+
+        # The pivot values are extracted from the data when the chain is materialized, see materialize
+        index_cols_str = ', '.join([f'"{x}"' for x in index_cols])
+        return f'PIVOT {{source}} ON "{columns[0]}" USING {agg_func}("{value_col[0]}") GROUP BY {index_cols_str}'
+
+    def fill(self, col_name: str, old_value, new_value):
+        super(DuckDBOperation, self).fill(col_name, old_value, new_value)
+        return f'SELECT * REPLACE (CASE WHEN "{col_name}" = {sql_literal(old_value)} ' \
+               f'THEN {sql_literal(new_value)} ELSE "{col_name}" END AS "{col_name}") FROM {{source}}'
+
+    def chain_operation(self, op, args):
+        new_code = getattr(self, op)(**args)
+        logger.debug(f'Code before chaining: {self.code}')
+        self.code = new_code.replace('{source}', f'({self.code})')
+        logger.debug(f'Code after chaining: {self.code}')
+        super(DuckDBOperation, self).chain_operation(op, args)
+
+    def materialize(self, new_label):
+        super(DuckDBOperation, self).materialize(new_label)
+        logger.debug(f'Executing SQL code: {self.code}')
+        # Views cannot hold a PIVOT whose values are extracted from the data, so pivot results are stored as tables
+        relation = 'TABLE' if any(op_dict['op'] == 'pivot' for op_dict in self.op_list) else 'VIEW'
+        self.code = f'CREATE OR REPLACE {relation} "{self.new_label}" AS {self.code}'
+        return self.artifact_class(label=self.new_label,
+                                   connection=self.sources[0].connection,
+                                   file_format=self.sources[0].file_format,
+                                   from_sql=self.code,
+                                   schema_map=self.current_schema_map)
+
+
+class DuckDBWorkflow(Workflow):
+    def __init__(self, *args, **kwargs):
+        database = kwargs.pop('database', None)
+        duckdb_config = kwargs.pop('duckdb_config', {})
+        self.file_format = kwargs.pop('file_format', 'csv')
+        super(DuckDBWorkflow, self).__init__(*args, **kwargs)
+        self.artifact_class = DuckDBArtifact
+        self.operator_class = DuckDBOperation
+        if not database:
+            database = f"{self.out_dir}/{self.name}.duckdb"
+        self.connection = duckdb.connect(database, config=duckdb_config)
+
+    def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
+        return DuckDBArtifact(label, filename=filename, connection=self.connection, file_format=self.file_format,
+                              schema_map=schema_map)
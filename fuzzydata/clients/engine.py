@@ -0,0 +1,155 @@
+import atexit
+import logging
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Workflow options (wf_options) that configure the engine
+engine_options = ('n_workers', 'threads_per_worker', 'memory_limit', 'processes', 'npartitions')
+
+
+class EngineManager:
+    """
+    Owns the distributed engine (a Dask LocalCluster or a Ray instance) of this process, so that it is started once
+    and shared by every modin and dask workflow instead of each workflow starting its own cluster.
+    """
+    def __init__(self):
+        self.engine = None
+        self.client = None
+        self.cluster = None
+        self.owned = False  # False if an engine started outside fuzzydata was adopted
+        self.config = {}
+        self.workflows = weakref.WeakSet()  # Open workflows using the engine, see start_engine and stop_engine
+
+    @property
+    def running(self):
+        return self.engine is not None
+
+    def start(self, engine='dask', n_workers=None, threads_per_worker=None, memory_limit=None, processes=True,
+              npartitions=None) -> bool:
+        """
+        Start the engine, or reuse it if it is already running
+        :param engine: 'dask' or 'ray'
+        :param n_workers: Number of workers (number of CPUs for ray), default decided by the engine
+        :param threads_per_worker: Threads per dask worker, default decided by the engine
+        :param memory_limit: Memory limit per dask worker (e.g. '4GB'), or object store size in bytes for ray
+        :param processes: Use processes rather than threads for dask workers (default True)
+        :param npartitions: Number of partitions modin splits dataframes into (default modin's NPartitions)
+        :return: True if the engine was started, False if an already running engine is reused
+        """
+        if npartitions is not None:
+            from modin.config import NPartitions
+            NPartitions.put(npartitions)
+
+        config = {'n_workers': n_workers, 'threads_per_worker': threads_per_worker, 'memory_limit': memory_limit,
+                  'processes': processes}
+        if self.engine == engine:
+            if not {k: v for k, v in config.items() if v is not None}.items() <= self.config.items():
+                logger.warning(f'Reusing running {engine} engine, ignoring new engine options {config}')
+            return False
+        if self.running:
+            self.stop()
+
+        if engine == 'dask':
+            from dask.distributed import Client, LocalCluster, default_client
+            try:
+                self.client = default_client()
+                logger.info(f'Adopting running dask client {self.client}')
+            except ValueError:
+                cluster_options = {k: v for k, v in config.items() if v is not None}
+                self.cluster = LocalCluster(**cluster_options)
+                self.client = Client(self.cluster)
+                self.owned = True
+                logger.info(f'Started dask cluster, dashboard: {self.client.dashboard_link}')
+        elif engine == 'ray':
+            import ray
+            if ray.is_initialized():
+                logger.info('Adopting running ray instance')
+            else:
+                ray.init(num_cpus=n_workers, object_store_memory=memory_limit)
+                self.owned = True
+                logger.info('Started ray')
+        else:
+            raise ValueError(f'Unknown engine {engine}, expected dask or ray')
+
+        self.engine = engine
+        self.config = config
+        return self.owned
+
+    def stop(self) -> bool:
+        """
+        Shut down the engine if it was started by this manager
+        :return: True if an engine was shut down
+        """
+        if not self.running:
+            return False
+        stopped = self.owned
+        if self.owned:
+            if self.engine == 'dask':
+                self.client.close()
+                self.cluster.close()
+            else:
+                import ray
+                ray.shutdown()
+            logger.info(f'Stopped {self.engine} engine')
+        self.engine, self.client, self.cluster, self.owned, self.config = None, None, None, False, {}
+        self.workflows.clear()
+        return stopped
+
+
+def timed_engine_call(method, *args, **kwargs) -> pd.DataFrame:
+    """
+    Start or stop the engine through method (engine_manager.start or engine_manager.stop)
+    :return: Performance record of the call for the workflow perf table, or None if nothing was started or stopped
+    """
+    start_time = time.perf_counter()
+    engine = kwargs.get('engine', engine_manager.engine)
+    changed = method(*args, **kwargs)
+    end_time = time.perf_counter()
+    if not changed:
+        return None
+    return pd.Series({
+        'src': np.nan,
+        'dst': np.nan,
+        'op': f'engine_{method.__name__}',
+        'args': engine,
+        'start_time': start_time,
+        'end_time': end_time,
+        'elapsed_time': end_time - start_time
+    }).to_frame().T
+
+
+def start_engine(workflow, engine: str, **options) -> None:
+    """
+    Start the shared engine for an engine-backed (modin or dask) workflow, or reuse it if it is already running
+    :param workflow: Workflow to record the engine start in
+    :param engine: 'dask' or 'ray'
+    :param options: Engine options, see engine_options
+    """
+    perf_record = timed_engine_call(engine_manager.start, engine=engine, **options)
+    if perf_record is not None:
+        workflow.perf_records.append(perf_record)
+    engine_manager.workflows.add(workflow)
+
+
+def stop_engine(workflow) -> None:
+    """
+    Stop the shared engine when the last open engine-backed workflow is closed, recording the shutdown in its perf
+    table. Engines of workflows that are never closed are stopped at exit.
+    :param workflow: Workflow being closed
+    """
+    engine_manager.workflows.discard(workflow)
+    if engine_manager.workflows:
+        return
+    perf_record = timed_engine_call(engine_manager.stop)
+    if perf_record is not None:
+        workflow.perf_records.append(perf_record)
+        workflow.write_perf()
+
+
+engine_manager = EngineManager()
+atexit.register(engine_manager.stop)
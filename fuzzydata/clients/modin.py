@@ -1,46 +1,222 @@
+import json
+import os
+from functools import reduce
+from typing import Dict, Iterable
+
 import modin.pandas as mpd
-from modin.config import Engine
+import numpy as np
+import pandas
+from modin.config import Engine, NPartitions
+from modin.core.execution.dispatching.factories.dispatcher import FactoryDispatcher
+from modin.distributed.dataframe.pandas import from_partitions, unwrap_partitions
 
+from fuzzydata.clients.engine import engine_options, start_engine, stop_engine
 from fuzzydata.clients.pandas import DataFrameArtifact, DataFrameOperation, DataFrameWorkflow
+from fuzzydata.core.generator import column_value_pools, generate_table
+from fuzzydata.core.operation import T
+from fuzzydata.core.statistics import combine_statistics, compute_statistics, finalize_statistics, \
+    partial_statistics
 from fuzzydata.core.workflow import Workflow
 
 
+def _engine_map(function, *iterables) -> list:
+    """
+    Run function over the zipped iterables in parallel on the modin engine's workers
+    :return: List of futures (dask) or object refs (ray) of the results, or None if the engine is not distributed
+    """
+    FactoryDispatcher.get_factory()  # Make sure the engine (and its cluster) is initialized
+    engine = Engine.get()
+    if engine == 'Dask':
+        from distributed import default_client
+        return default_client().map(function, *iterables)
+    if engine == 'Ray':
+        import ray
+        remote_function = ray.remote(function)
+        return [remote_function.remote(*args) for args in zip(*iterables)]
+    return None
+
+
+def _engine_gather(futures) -> list:
+    """ Wait for and collect the results of _engine_map """
+    if Engine.get() == 'Dask':
+        from distributed import default_client
+        return default_client().gather(futures)
+    import ray
+    return ray.get(futures)
+
+
+def _generate_partition(num_rows, column_dict, seed, value_pools):
+    return generate_table(num_rows, column_dict=column_dict, seed=seed, value_pools=value_pools)
+
+
+def _write_partition(partition: pandas.DataFrame, filename: str) -> int:
+    partition.to_parquet(filename, index=False)
+    return len(partition.index)
+
+
+def _read_partition(filename: str, columns) -> pandas.DataFrame:
+    return pandas.read_parquet(filename, columns=columns)
+
+
+def generate_partitioned_table(num_rows, column_dict, num_partitions=None, seed=None) -> mpd.DataFrame:
+    """
+    Generate a table in place on the modin engine's workers, each worker generating one row partition from its own
+    seed, and assemble the partitions into a modin dataframe without going through the driver.
+    :param num_rows: Number of rows desired in the table
+    :param column_dict: Schema Mapping (column_label->faker_provider) as a Dict
+    :param num_partitions: Number of row partitions to generate (default modin's NPartitions)
+    :param seed: Base seed, partition i is generated from seed + i (default drawn from numpy's global RNG)
+    :return: Modin dataframe with generated table according to spec.
+    """
+    if num_partitions is None:
+        num_partitions = NPartitions.get()
+    num_partitions = max(1, min(num_partitions, num_rows))
+    if seed is None:
+        seed = int(np.random.randint(2**31))
+    row_lengths = [num_rows // num_partitions + (1 if i < num_rows % num_partitions else 0)
+                   for i in range(num_partitions)]
+    # Values of columns with a cardinality or distribution are drawn from pools shared by all partitions
+    value_pools = column_value_pools(column_dict, num_rows, seed=seed)
+
+    partitions = _engine_map(_generate_partition, row_lengths, [column_dict] * num_partitions,
+                             [seed + i for i in range(num_partitions)], [value_pools] * num_partitions)
+    if partitions is None:
+        return generate_table(num_rows, column_dict=column_dict, pd=mpd, seed=seed, value_pools=value_pools)
+
+    return from_partitions(partitions, axis=0, index=pandas.RangeIndex(num_rows),
+                           columns=pandas.Index(list(column_dict.keys())), row_lengths=row_lengths,
+                           column_widths=[len(column_dict)])
+
+
 class ModinArtifact(DataFrameArtifact):
+    """
+    Modin dataframe artifact. Parquet artifacts are written as a directory with one file per row partition plus a
+    manifest of the partition row counts and schema, and are read back one partition per worker.
+    """
+    manifest_file = '_manifest.json'  # Leading underscore, so parquet readers skip it when reading the directory
 
     def __init__(self, *args, **kwargs):
         kwargs.update({'pd': mpd})  # Force loading of the modin pandas library
         super(ModinArtifact, self).__init__(*args, **kwargs)
         self._deserialization_function = {
-            'csv': self.pd.read_csv
+            'csv': self._read_csv,
+            'parquet': self._read_partitioned_parquet
         }
         self._serialization_function = {
-            'csv': 'to_csv'
+            'csv': '_write_csv',
+            'parquet': '_write_partitioned_parquet'
         }
 
-        self.operation_class = DataFrameOperation
+        self.operation_class = ModinOperation
+
+    def generate(self, num_rows, schema):
+        self.fingerprint = None
+        self.table = generate_partitioned_table(num_rows, schema)
+        self.schema_map = schema
+        self.in_memory = True
+        self._apply_typed_storage()
+
+    def serialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        if self.in_memory:
+            getattr(self, self._serialization_function[self.file_format])(str(filename))
+
+    def statistics(self, key_columns: Iterable[str] = ()) -> Dict:
+        """ Override to compute partial statistics of every row partition on the engine's workers """
+        if Engine.get() not in ('Dask', 'Ray'):
+            return compute_statistics(self.table._to_pandas(), key_columns=key_columns)
+        partitions = unwrap_partitions(self.table, axis=0)
+        partials = _engine_map(partial_statistics, partitions, [list(key_columns)] * len(partitions),
+                               range(len(partitions)))
+        return finalize_statistics(reduce(combine_statistics, _engine_gather(partials), None))
+
+    def _write_csv(self, filename):
+        # Only write out meaningful (named) indexes, e.g. of pivot results
+        self.table.to_csv(filename, index=any(name is not None for name in self.table.index.names))
+
+    def _write_partitioned_parquet(self, directory):
+        table = self.table
+        if any(name is not None for name in table.index.names):  # e.g. pivot results, keep the index as columns
+            table = table.reset_index()
+        table = table.set_axis(['_'.join(str(x) for x in c) if isinstance(c, tuple) else str(c)
+                                for c in table.columns], axis=1)
+
+        # Write one file per partition of the engine's partitioning, so reading does not repartition
+        partitions = unwrap_partitions(table, axis=0)
+        if len(partitions) != NPartitions.get() and len(table.index) >= NPartitions.get():
+            partitions = unwrap_partitions(table._repartition(axis=0), axis=0)
+
+        os.makedirs(directory, exist_ok=True)
+        part_files = [f'part.{i:05d}.parquet' for i in range(len(partitions))]
+        row_counts = _engine_gather(_engine_map(_write_partition, partitions,
+                                                [f'{directory}/{f}' for f in part_files]))
+        with open(f'{directory}/{self.manifest_file}', 'w') as outfile:
+            json.dump({'num_rows': sum(row_counts),
+                       'columns': {str(c): str(t) for c, t in table.dtypes.items()},
+                       'partitions': [{'file': f, 'num_rows': n} for f, n in zip(part_files, row_counts)]},
+                      outfile, indent=2)
+
+    def _read_partitioned_parquet(self, directory):
+        manifest_path = f'{directory}/{self.manifest_file}'
+        # Only read schema columns
+        columns = list(self.schema_map.keys()) if self.schema_map else None
+        if not os.path.exists(manifest_path):  # written by another client
+            return self.pd.read_parquet(directory, columns=columns)
+
+        with open(manifest_path) as infile:
+            manifest = json.load(infile)
+        if columns is None:
+            columns = list(manifest['columns'].keys())
+        part_files = [f"{directory}/{p['file']}" for p in manifest['partitions']]
+        partitions = _engine_map(_read_partition, part_files, [columns] * len(part_files))
+        if partitions is None:
+            return self.pd.read_parquet(directory, columns=columns)
+        return from_partitions(partitions, axis=0, index=pandas.RangeIndex(manifest['num_rows']),
+                               columns=pandas.Index(columns),
+                               row_lengths=[p['num_rows'] for p in manifest['partitions']],
+                               column_widths=[len(columns)])
+
+
+class ModinOperation(DataFrameOperation):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('artifact_class', ModinArtifact)
+        super(ModinOperation, self).__init__(*args, **kwargs)
+
+    def select(self, condition: str) -> T:
+        super(DataFrameOperation, self).select(condition)
+        # Modin's row-wise query path cannot parse backticked column labels, evaluate the mask instead
+        return f'.loc[lambda x: x.eval("{condition}")]'
 
 
 class ModinWorkflow(DataFrameWorkflow):
     def __init__(self, *args, **kwargs):
         self.modin_engine = kwargs.pop('modin_engine', 'dask')
+        self.file_format = kwargs.pop('file_format', 'parquet')
+        options = {k: kwargs.pop(k) for k in engine_options if k in kwargs}
         super(ModinWorkflow, self).__init__(*args, **kwargs)
         self.artifact_class = ModinArtifact
-        self.operator_class = DataFrameOperation
+        self.operator_class = ModinOperation
 
         self.wf_code_export = self.wf_code_export.replace("import pandas as pd", "import modin.pandas as pd")
+        self.code_export_reader = f"pd.read_{self.file_format}"
+
+        # The engine is shared by all workflows in this process and only started by the first one
+        start_engine(self, self.modin_engine, **options)
 
         if self.modin_engine == 'dask':
-            from dask.distributed import Client
-            processes = kwargs.pop('processes', True)
-            Client(processes=processes)
-            dask_code=f"\nfrom dask.distributed import Client\nClient(processes={processes})"
+            cluster_options = ', '.join(f'{k}={v!r}' for k, v in options.items() if k != 'npartitions')
+            dask_code = f"\nfrom dask.distributed import Client\nClient({cluster_options})\n"
             self.wf_code_export += dask_code
         else:
-            import ray
-            ray.init(ignore_reinit_error=True)
-            ray_code=f"\nimport ray\nray.init(ignore_reinit_error=True)"
+            ray_code = f"\nimport ray\nray.init(ignore_reinit_error=True)\n"
             self.wf_code_export += ray_code
         Engine.put(self.modin_engine)
 
+    def close(self):
+        stop_engine(self)
+
     def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
-        return ModinArtifact(label, filename=filename, schema_map=schema_map)
+        return ModinArtifact(label, filename=filename, file_format=self.file_format, typed_storage=self.typed_storage,
+                             csv_engine=self.csv_engine, schema_map=schema_map)
@@ -1,24 +1,78 @@
+import ast
 import logging
-from typing import List
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 import pandas
 
 from fuzzydata.core.artifact import Artifact
-from fuzzydata.core.generator import generate_table
+from fuzzydata.core.generator import apply_schema_dtypes, generate_table, read_schema_csv
 from fuzzydata.core.operation import Operation, T
 from fuzzydata.core.workflow import Workflow
 
 logger = logging.getLogger(__name__)
 
+# String and number literals of a chained expression, i.e. the column labels and arguments of its operations
+_chain_literal = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|(?<![\w.])\d+(?:\.\d*)?(?:[eE][-+]?\d+)?""")
+
+
+@lru_cache(maxsize=4096)
+def _literal_value(literal: str):
+    return ast.literal_eval(literal)
+
+
+def normalize_chain(code: str) -> Tuple[str, List]:
+    """
+    Replace the literals of a chained dataframe expression by references to an _args list, so chains of the same
+    operations on different columns and with different arguments normalize to the same code.
+    :param code: Chained expression as generated by DataFrameOperation
+    :return: Tuple of the normalized code and the list of its literal values
+    """
+    args = []
+
+    def parameterize(match):
+        args.append(_literal_value(match.group()))
+        return f'_args[{len(args) - 1}]'
+
+    return _chain_literal.sub(parameterize, code), args
+
+
+@lru_cache(maxsize=1024)
+def compile_chain(code: str):
+    """
+    Compile a normalized chained dataframe expression (see normalize_chain) into a code object, which is shared by
+    all chains that normalize to the same code.
+    :param code: Normalized chained expression
+    :return: Code object that can be evaluated with the operation bound to "self" and the literal values to "_args"
+    """
+    return compile(code, '<fuzzydata-chain>', 'eval')
+
+
+def eval_chain(code: str, operation: Operation, global_vars: Dict = None):
+    """
+    Evaluate a chained dataframe expression from its cached compiled code.
+    :param code: Chained expression as generated by DataFrameOperation
+    :param operation: Operation bound to "self" in the expression
+    :param global_vars: Extra global names used by the expression (e.g. the polars module)
+    :return: Result of the expression
+    """
+    normalized_code, args = normalize_chain(code)
+    # _args is a global so that it is also visible inside the lambdas of the expression
+    return eval(compile_chain(normalized_code), {**(global_vars or {}), '_args': args}, {'self': operation})
+
 
 class DataFrameArtifact(Artifact):
 
     def __init__(self, *args, **kwargs):
         self.pd = kwargs.pop("pd", pandas)
         from_df = kwargs.pop("from_df", None)
+        # Store columns with category/arrow string dtypes derived from the schema map instead of python objects
+        self.typed_storage = kwargs.pop("typed_storage", False)
+        self.csv_engine = kwargs.pop("csv_engine", None)
         super(DataFrameArtifact, self).__init__(*args, **kwargs)
         self._deserialization_function = {
-            'csv': self.pd.read_csv
+            'csv': self._read_csv
         }
         self._serialization_function = {
             'csv': 'to_csv'
@@ -31,21 +85,35 @@ class DataFrameArtifact(Artifact):
         if from_df is not None:
             self.from_df(from_df)
 
+    def _apply_typed_storage(self):
+        if self.typed_storage and self.schema_map:
+            self.table = apply_schema_dtypes(self.table, self.schema_map)
+
     def generate(self, num_rows, schema):
+        self.fingerprint = None
         self.table = generate_table(num_rows, column_dict=schema, pd=self.pd)
         self.schema_map = schema
         self.in_memory = True
+        self._apply_typed_storage()
 
     def from_df(self, df):
+        self.fingerprint = None
         self.table = self.pd.DataFrame(df)
         self.in_memory = True
+        self._apply_typed_storage()
 
     def deserialize(self, filename=None):
         if not filename:
             filename = self.filename
 
+        self.fingerprint = None
         self.table = self._deserialization_function[self.file_format](filename)
         self.in_memory = True
+        self._apply_typed_storage()  # CSV files do not keep dtypes
+
+    def _read_csv(self, filename):
+        return read_schema_csv(filename, self.schema_map, typed_storage=self.typed_storage, engine=self.csv_engine,
+                               pd=self.pd)
 
     def serialize(self, filename=None):
         if not filename:
@@ -53,7 +121,8 @@ class DataFrameArtifact(Artifact):
 
         if self.in_memory:
             serialization_method = getattr(self.table, self._serialization_function[self.file_format])
-            serialization_method(filename)
+            # Only write out meaningful (named) indexes, e.g. of pivot results
+            serialization_method(filename, index=any(name is not None for name in self.table.index.names))
 
     def destroy(self):
         del self.table
@@ -84,7 +153,7 @@ class DataFrameOperation(Operation['DataFrameArtifact']):
     def groupby(self, group_columns: List[str], agg_columns: List[str], agg_function: str) -> T:
         super(DataFrameOperation, self).groupby(group_columns, agg_columns, agg_function)
         logger.debug(f"Groupby on {self.sources[0].label} : {group_columns}/{agg_columns}")
-        return f'[{group_columns+agg_columns}].groupby({group_columns}).{agg_function}().reset_index()'
+        return f'[{group_columns+agg_columns}].groupby({group_columns}, observed=True).{agg_function}().reset_index()'
 
     def project(self, output_cols: List[str]) -> T:
         super(DataFrameOperation, self).project(output_cols)
@@ -94,13 +163,16 @@ class DataFrameOperation(Operation['DataFrameArtifact']):
         super(DataFrameOperation, self).select(condition)
         return f'.query("{condition}")'
 
-    def merge(self, key_col: List[str]) -> T:
-        super(DataFrameOperation, self).merge(key_col)
+    def merge(self, key_col: List[str], right_cols: List[str] = None) -> T:
+        super(DataFrameOperation, self).merge(key_col, right_cols)
+        if right_cols is not None:
+            return f'.merge(self.sources[1].table[{right_cols}], on="{key_col}")'
         return f'.merge(self.sources[1].table, on="{key_col}")'
 
     def pivot(self, index_cols: List[str], columns: List[str], value_col: List[str], agg_func: str) -> T:
         super(DataFrameOperation, self).pivot(index_cols, columns, value_col, agg_func)
-        return f'.pivot_table(index={index_cols}, columns={columns},values={value_col},aggfunc="{agg_func}")'
+        return f'.pivot_table(index={index_cols}, columns={columns},values={value_col},aggfunc="{agg_func}", ' \
+               f'observed=True)'
 
     def fill(self, col_name: str, old_value, new_value):
         super(DataFrameOperation, self).fill(col_name, old_value, new_value)
@@ -111,10 +183,13 @@ class DataFrameOperation(Operation['DataFrameArtifact']):
         super(DataFrameOperation, self).chain_operation(op, args)
 
     def materialize(self, new_label):
-        new_df = eval(self.code)
+        new_df = eval_chain(self.code, self)
         super(DataFrameOperation, self).materialize(new_label)
         return self.artifact_class(label=self.new_label,
                                    from_df=new_df,
+                                   file_format=self.sources[0].file_format,
+                                   typed_storage=self.sources[0].typed_storage,
+                                   csv_engine=self.sources[0].csv_engine,
                                    schema_map=self.current_schema_map)
     
     @property
@@ -127,13 +202,17 @@ class DataFrameOperation(Operation['DataFrameArtifact']):
 
 class DataFrameWorkflow(Workflow):
     def __init__(self, *args, **kwargs):
+        self.typed_storage = kwargs.pop('typed_storage', False)
+        self.csv_engine = kwargs.pop('csv_engine', None)
         super(DataFrameWorkflow, self).__init__(*args, **kwargs)
         self.artifact_class = DataFrameArtifact
         self.operator_class = DataFrameOperation
         self.wf_code_export = "import pandas as pd\n"
+        self.code_export_reader = "pd.read_csv"
 
     def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
-        return DataFrameArtifact(label, filename=filename, schema_map=schema_map)
+        return DataFrameArtifact(label, filename=filename, typed_storage=self.typed_storage, csv_engine=self.csv_engine,
+                                 schema_map=schema_map)
     
 
     def add_artifact(self, artifact: Artifact,
@@ -143,7 +222,8 @@ class DataFrameWorkflow(Workflow):
         if from_artifacts:
             self.wf_code_export += f"{self.artifact_list[-1]} = {operation.export_code}\n"
         else:
-            self.wf_code_export += f"{artifact.label} = pd.read_csv('artifacts/{artifact.label}.{artifact.file_format}')\n"
+            self.wf_code_export += f"{artifact.label} = {self.code_export_reader}" \
+                                   f"('artifacts/{artifact.label}.{artifact.file_format}')\n"
 
     def serialize_workflow(self, output_dir: str = None) -> None:
         """ Override to add code export to workflow."""
@@ -0,0 +1,162 @@
+import logging
+from typing import List
+
+import pandas
+import polars as pl
+
+from fuzzydata.clients.pandas import DataFrameOperation, DataFrameWorkflow, eval_chain
+from fuzzydata.core.artifact import Artifact
+from fuzzydata.core.generator import generate_table
+from fuzzydata.core.operation import T
+
+logger = logging.getLogger(__name__)
+
+
+class PolarsArtifact(Artifact):
+
+    def __init__(self, *args, **kwargs):
+        from_df = kwargs.pop("from_df", None)
+        super(PolarsArtifact, self).__init__(*args, **kwargs)
+        self.pd = pl
+        self._deserialization_function = {
+            'csv': pl.scan_csv,
+            'parquet': pl.scan_parquet
+        }
+        self._serialization_function = {
+            'csv': 'sink_csv',
+            'parquet': 'sink_parquet'
+        }
+
+        self.operation_class = PolarsOperation
+        self.table = None
+        self.in_memory = False
+
+        if from_df is not None:
+            self.from_df(from_df)
+
+    def generate(self, num_rows, schema):
+        self.from_df(generate_table(num_rows, column_dict=schema))
+        self.schema_map = schema
+
+    def from_df(self, df):
+        if isinstance(df, pandas.DataFrame):
+            df = pl.from_pandas(df)
+        self.fingerprint = None
+        self.table = df
+        self.in_memory = True
+
+    def deserialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        lazy_table = self._deserialization_function[self.file_format](str(filename))
+        if self.schema_map:
+            # Only read schema columns, skipping any index column written out by other clients
+            lazy_table = lazy_table.select(list(self.schema_map.keys()))
+        self.fingerprint = None
+        self.table = lazy_table.collect()
+        self.in_memory = True
+
+    def serialize(self, filename=None):
+        if not filename:
+            filename = self.filename
+
+        if self.in_memory:
+            serialization_method = getattr(self.table.lazy(), self._serialization_function[self.file_format])
+            serialization_method(str(filename))
+
+    def destroy(self):
+        del self.table
+        self.in_memory = False
+
+    def to_df(self) -> pandas.DataFrame:
+        return self.table.to_pandas()
+
+    def __len__(self):
+        if self.in_memory:
+            return self.table.height
+
+
+class PolarsOperation(DataFrameOperation):
+    """
+    Chains operations onto a polars LazyFrame, so the whole chain is planned and optimized by polars and only
+    collected once at materialization.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('artifact_class', PolarsArtifact)
+        super(PolarsOperation, self).__init__(*args, **kwargs)
+        self.code = 'self.sources[0].table.lazy()'  # Starting point for chained code generation.
+        self.pivot_agg_dict = {
+            'count': 'len'
+        }
+
+    def apply(self, numeric_col: str, a: float, b: float) -> PolarsArtifact:
+        super(DataFrameOperation, self).apply(numeric_col, a, b)
+        new_col_name = f"{numeric_col}__{a}x_{b}"
+        return f'.with_columns((pl.col("{numeric_col}")*{a}+{b}).alias("{new_col_name}"))'
+
+    def sample(self, frac: float) -> PolarsArtifact:
+        super(DataFrameOperation, self).sample(frac)
+        # LazyFrames cannot be sampled directly, keep a random permutation's first frac of rows instead
+        return f'.filter(pl.int_range(pl.len()).shuffle() < (pl.len() * {frac}).ceil())'
+
+    def groupby(self, group_columns: List[str], agg_columns: List[str], agg_function: str) -> T:
+        super(DataFrameOperation, self).groupby(group_columns, agg_columns, agg_function)
+        return f'.group_by({group_columns}).agg(pl.col({agg_columns}).{agg_function}())'
+
+    def project(self, output_cols: List[str]) -> T:
+        super(DataFrameOperation, self).project(output_cols)
+        # polars does not allow selecting the same column twice
+        return f'.select({list(dict.fromkeys(output_cols))})'
+
+    def select(self, condition: str) -> T:
+        super(DataFrameOperation, self).select(condition)
+        # Conditions use pandas/SQLite style backtick quoting for column labels
+        return f'.filter(pl.sql_expr({condition.replace("`", chr(34))!r}))'
+
+    def merge(self, key_col: List[str], right_cols: List[str] = None) -> T:
+        super(DataFrameOperation, self).merge(key_col, right_cols)
+        if right_cols is not None:
+            return f'.join(self.sources[1].table.lazy().select({right_cols}), on="{key_col}")'
+        return f'.join(self.sources[1].table.lazy(), on="{key_col}")'
+
+    def pivot(self, index_cols: List[str], columns: List[str], value_col: List[str], agg_func: str) -> T:
+        super(DataFrameOperation, self).pivot(index_cols, columns, value_col, agg_func)
+        agg_func = self.pivot_agg_dict.get(agg_func, agg_func)
+        # Pivot output columns depend on the data, so the chain is collected before pivoting
+        return f'.collect().pivot(on={columns}, index={index_cols}, values={value_col}, ' \
+               f'aggregate_function="{agg_func}")'
+
+    def fill(self, col_name: str, old_value, new_value):
+        super(DataFrameOperation, self).fill(col_name, old_value, new_value)
+        return f'.with_columns(pl.col("{col_name}").replace({old_value}, {new_value}))'
+
+    def materialize(self, new_label):
+        new_df = eval_chain(self.code, self, {'pl': pl})
+        if isinstance(new_df, pl.LazyFrame):
+            new_df = new_df.collect()
+        super(DataFrameOperation, self).materialize(new_label)
+        return self.artifact_class(label=self.new_label,
+                                   from_df=new_df,
+                                   file_format=self.sources[0].file_format,
+                                   schema_map=self.current_schema_map)
+
+    @property
+    def export_code(self):
+        code = super(PolarsOperation, self).export_code
+        if '.collect()' not in code:
+            code += '.collect()'
+        return code
+
+
+class PolarsWorkflow(DataFrameWorkflow):
+    def __init__(self, *args, **kwargs):
+        self.file_format = kwargs.pop('file_format', 'csv')
+        super(PolarsWorkflow, self).__init__(*args, **kwargs)
+        self.artifact_class = PolarsArtifact
+        self.operator_class = PolarsOperation
+        self.wf_code_export = "import polars as pl\n"
+        self.code_export_reader = f"pl.read_{self.file_format}"
+
+    def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
+        return PolarsArtifact(label, filename=filename, file_format=self.file_format, schema_map=schema_map)
@@ -1,23 +1,149 @@
 import math
-from typing import List
+import re
+import time
+from typing import Dict, Iterable, List, Tuple
 
+import networkx as nx
+import numpy as np
 import pandas
 import sqlalchemy
 import logging
 
 from fuzzydata.core.artifact import Artifact
-from fuzzydata.core.generator import generate_table
-from fuzzydata.core.operation import Operation, T
+from fuzzydata.core.generator import generate_table, read_schema_csv
+from fuzzydata.core.operation import Operation, T, sql_literal
+from fuzzydata.core.statistics import QUANTILE_POINTS
 from fuzzydata.core.workflow import Workflow
 
 logger = logging.getLogger(__name__)
 
+_IDENTIFIER_PATTERN = re.compile(r'`([^`]+)`')  # Quoted column labels in selection predicates
+
+
+class SQLStatisticsCatalog:
+    """
+    Per-workflow cache of the row counts and column statistics (see compute_statistics) of SQL artifacts, computed
+    with aggregate queries in the database. Row counts are collected on their first use, column statistics when the
+    generator first asks for them. Both are kept until the artifact or one of the artifacts it is derived from is
+    rewritten, so that repeated row counts do not re-evaluate whole view chains.
+    """
+    # Keep the number of aggregate expressions per statement well below SQLite's result column limit
+    _COLUMNS_PER_SCAN = 200
+
+    def __init__(self, sql_engine, graph=None):
+        """
+        :param sql_engine: SQLAlchemy engine of the workflow
+        :param graph: Workflow graph, used to invalidate the views derived from a rewritten artifact
+        """
+        self.sql_engine = sql_engine
+        self.graph = graph
+        self._catalog = {}
+
+    def collect(self, label: str) -> Dict:
+        """
+        Compute and cache the row count for the table or view "label"
+        :param label: Label of the artifact to collect statistics for
+        :return: Dict with 'num_rows' and the 'columns' statistics, None until they are collected
+        """
+        with self.sql_engine.connect() as conn:
+            num_rows = conn.execute(sqlalchemy.text(f'SELECT COUNT(*) FROM `{label}`')).first()[0]
+
+        self._catalog[label] = {'num_rows': num_rows, 'columns': None}
+        logger.debug(f'Collected statistics for {label}: {num_rows} rows')
+        return self._catalog[label]
+
+    def get(self, label: str) -> Dict:
+        """ Return the cached statistics for "label", collecting the row count on a miss """
+        if label not in self._catalog:
+            return self.collect(label)
+        return self._catalog[label]
+
+    def num_rows(self, label: str) -> int:
+        return self.get(label)['num_rows']
+
+    def statistics(self, label: str, key_columns: Iterable[str] = (), top_k: int = 10) -> Dict:
+        """
+        Return the column statistics of "label" in the format of compute_statistics, collecting them on a miss with
+        one scan for the distinct, null, min and max counts of all columns and one query per column for its top-k
+        values and quantiles. Quantiles of numeric columns are interpolated like pandas', those of string columns are
+        exact rather than sketched.
+        :param label: Label of the artifact
+        :param key_columns: Columns whose distinct values are kept as well, e.g. merge keys
+        :param top_k: Number of most frequent values to keep per column (default 10)
+        :return: Statistics dict
+        """
+        entry = self.get(label)
+        if entry['columns'] is None:
+            entry['columns'] = self._collect_columns(label, entry['num_rows'], top_k)
+        with self.sql_engine.connect() as conn:
+            for col in key_columns:
+                if col in entry['columns'] and 'values' not in entry['columns'][col]:
+                    values = conn.execute(sqlalchemy.text(f'SELECT DISTINCT `{col}` FROM `{label}` '
+                                                          f'WHERE `{col}` IS NOT NULL')).scalars().all()
+                    entry['columns'][col]['values'] = np.array(values, dtype=object)
+        return entry
+
+    def _collect_columns(self, label: str, num_rows: int, top_k: int) -> Dict:
+        columns = {}
+        with self.sql_engine.connect() as conn:
+            labels = list(conn.execute(sqlalchemy.text(f'SELECT * FROM `{label}` LIMIT 0')).keys())
+            for ix in range(0, len(labels), self._COLUMNS_PER_SCAN):
+                chunk = labels[ix:ix + self._COLUMNS_PER_SCAN]
+                aggregates = ', '.join([f'COUNT(DISTINCT `{c}`), COUNT(`{c}`), MIN(`{c}`), MAX(`{c}`)' for c in chunk])
+                row = conn.execute(sqlalchemy.text(f'SELECT {aggregates} FROM `{label}`')).first()
+                for jx, c in enumerate(chunk):
+                    columns[c] = {'distinct': row[4*jx], 'nulls': num_rows - row[4*jx+1], 'min': None, 'max': None,
+                                  'quantiles': None, 'top_k': [], '_min': row[4*jx+2]}
+
+            for c, column_stats in columns.items():
+                column_stats['top_k'] = [(value, count) for value, count in conn.execute(sqlalchemy.text(
+                    f'SELECT `{c}`, COUNT(*) AS n FROM `{label}` WHERE `{c}` IS NOT NULL GROUP BY `{c}` '
+                    f'ORDER BY n DESC LIMIT {int(top_k)}'))]
+                min_value = column_stats.pop('_min')
+                non_null = num_rows - column_stats['nulls']
+                if not non_null or isinstance(min_value, bool) or not isinstance(min_value, (int, float, str)):
+                    continue
+                # Values at the positions of the quantile points in the sorted column, see compute_statistics. The
+                # row count comes from the same query, as views of sampled artifacts differ on every evaluation
+                points = ', '.join(f'({p!r})' for p in QUANTILE_POINTS.tolist())
+                rows = conn.execute(sqlalchemy.text(
+                    f'WITH sorted AS (SELECT `{c}` AS value, ROW_NUMBER() OVER (ORDER BY `{c}`) - 1 AS rn, '
+                    f'COUNT(*) OVER () - 1 AS last FROM `{label}` WHERE `{c}` IS NOT NULL), points(p) AS '
+                    f'(VALUES {points}) SELECT DISTINCT rn, last, value FROM sorted JOIN points '
+                    f'ON rn BETWEEN CAST(p * last AS INTEGER) AND CAST(p * last AS INTEGER) + 1')).all()
+                if not rows:
+                    continue
+                values = {rn: value for rn, _, value in rows}
+                positions = QUANTILE_POINTS * rows[0][1]
+                if isinstance(min_value, str):
+                    quantiles = [values[int(p)] for p in np.round(positions)]
+                else:
+                    quantiles = [float(values[int(np.floor(p))] + (p - np.floor(p)) *
+                                       (values[int(np.ceil(p))] - values[int(np.floor(p))])) for p in positions]
+                column_stats['quantiles'] = quantiles
+                column_stats['min'], column_stats['max'] = quantiles[0], quantiles[-1]
+        logger.debug(f'Collected column statistics for {label}')
+        return columns
+
+    def invalidate(self, label: str) -> None:
+        """ Drop cached statistics for "label" and the artifacts derived from it, e.g. after it has been rewritten """
+        self._catalog.pop(label, None)
+        if self.graph is not None and label in self.graph:
+            for descendant in nx.descendants(self.graph, label):
+                self._catalog.pop(descendant, None)
+
+    def __contains__(self, label):
+        return label in self._catalog
+
+
 class SQLArtifact(Artifact):
 
     def __init__(self, *args, **kwargs):
         self.sql_engine = kwargs.pop("sql_engine")
+        self.stats_catalog = kwargs.pop("stats_catalog", None)
         self.from_sql = kwargs.pop("from_sql", None)
         self.sync_df = kwargs.pop("sync_df", False)
+        self.csv_engine = kwargs.pop("csv_engine", None)
         from_df = kwargs.pop("from_df", None)
 
         super(SQLArtifact, self).__init__(*args, **kwargs)
@@ -26,7 +152,7 @@ class SQLArtifact(Artifact):
         self.pd = pandas
 
         self._deserialization_function = {
-            'csv': self.pd.read_csv
+            'csv': self._read_csv
         }
         self._serialization_function = {
             'csv': 'to_csv'
@@ -48,15 +174,23 @@ class SQLArtifact(Artifact):
         with self.sql_engine.connect() as conn:
             return conn.execute(sql_code)
 
+    def invalidate_statistics(self):
+        """ Discard any cached statistics and the fingerprint of this artifact once its contents are rewritten """
+        self.fingerprint = None
+        if self.stats_catalog is not None:
+            self.stats_catalog.invalidate(self.label)
+
     def generate(self, num_rows, schema):
+        self.invalidate_statistics()
         df = generate_table(num_rows, column_dict=schema)
-        df.to_sql(self.label, con=self.sql_engine, if_exists='replace')
+        df.to_sql(self.label, con=self.sql_engine, if_exists='replace', index=False)
         self.schema_map = schema
         if self.sync_df:
             self.table = df
         # self.in_memory = True
 
     def from_df(self, df):
+        self.invalidate_statistics()
         df.to_sql(self.label, con=self.sql_engine, if_exists='replace', index=False)
         if self.sync_df:
             self.table = df
@@ -65,29 +199,42 @@ class SQLArtifact(Artifact):
         if not filename:
             filename = self.filename
 
+        self.invalidate_statistics()
         df = self._deserialization_function[self.file_format](filename)
-        df.to_sql(self.label, con=self.sql_engine, if_exists='replace')
+        df.to_sql(self.label, con=self.sql_engine, if_exists='replace', index=False)
         if self.sync_df:
             self.table = df
         # self.in_memory = True
 
+    def _read_csv(self, filename):
+        return read_schema_csv(filename, self.schema_map, engine=self.csv_engine)
+
     def serialize(self, filename=None):
         if not filename:
             filename = self.filename
 
         df = self.pd.read_sql(self._get_table, con=self.sql_engine)
         serialization_method = getattr(df, self._serialization_function[self.file_format])
-        serialization_method(filename)
+        serialization_method(filename, index=False)
 
     def destroy(self):
         if self.sync_df:
             del self.table
+        self.invalidate_statistics()
         self.execute_sql(self._del_table)
 
     def to_df(self):
         return self.pd.read_sql(self._get_table, con=self.sql_engine)
 
+    def statistics(self, key_columns: Iterable[str] = ()) -> Dict:
+        """ Override to compute the statistics with aggregate queries, kept in the statistics catalog """
+        if self.stats_catalog is not None:
+            return self.stats_catalog.statistics(self.label, key_columns=key_columns)
+        return SQLStatisticsCatalog(self.sql_engine).statistics(self.label, key_columns=key_columns)
+
     def __len__(self):
+        if self.stats_catalog is not None:
+            return self.stats_catalog.num_rows(self.label)
         return self.execute_sql(self._num_rows).first()[0]
 
 
@@ -144,10 +291,14 @@ class SQLOperation(Operation['SQLArtifact']):
                           f"WHERE {condition}"
         return sql_select_stmt
 
-    def merge(self, key_col: List[str]) -> T:
-        super(SQLOperation, self).merge(key_col)
+    def merge(self, key_col: List[str], right_cols: List[str] = None) -> T:
+        super(SQLOperation, self).merge(key_col, right_cols)
+        right_source = f"`{self.sources[1].label}`"
+        if right_cols is not None:
+            right_predicate = ','.join([f"`{x}`" for x in right_cols])
+            right_source = f"(SELECT {right_predicate} FROM {right_source}) AS {right_source}"
         sql_select_stmt = f"SELECT * FROM {{source}} " \
-                          f"INNER JOIN `{self.sources[1].label}` " \
+                          f"INNER JOIN {right_source} " \
                           f"USING (`{key_col}`)"
         return sql_select_stmt
 
@@ -156,10 +307,10 @@ class SQLOperation(Operation['SQLArtifact']):
 
     def fill(self, col_name: str, old_value, new_value):
         super(SQLOperation, self).fill(col_name, old_value, new_value)
-        other_columns = ','.join([f"`{x}`" for x in list(set(self.current_schema_map.keys()) - set(col_name))])
-        sql_fill_stmt = f"SELECT {other_columns}, " \
-                        f"CASE WHEN `{col_name}` = '{old_value}' THEN '{new_value}' ELSE `{col_name}` END " \
-                        f"AS `{col_name}` FROM {{source}}"
+        columns = ', '.join([f"CASE WHEN `{x}` = {sql_literal(old_value)} THEN {sql_literal(new_value)} "
+                             f"ELSE `{x}` END AS `{x}`" if x == col_name else f"`{x}`"
+                             for x in self.current_schema_map.keys()])
+        sql_fill_stmt = f"SELECT {columns} FROM {{source}}"
         return sql_fill_stmt
 
     def chain_operation(self, op, args):
@@ -167,6 +318,7 @@ class SQLOperation(Operation['SQLArtifact']):
         logger.debug(f'Code before chaining: {self.code}')
         self.code = new_code.replace('{source}', f'({self.code})')
         logger.debug(f'Code after chaining: {self.code}')
+        super(SQLOperation, self).chain_operation(op, args)
 
     def materialize(self, new_label):
         super(SQLOperation, self).materialize(new_label)
@@ -174,6 +326,7 @@ class SQLOperation(Operation['SQLArtifact']):
         self.code = f'CREATE VIEW `{self.new_label}` AS {self.code}'
         return self.artifact_class(label=self.new_label,
                                    sql_engine=self.sources[0].sql_engine,
+                                   stats_catalog=self.sources[0].stats_catalog,
                                    from_sql=self.code,
                                    schema_map=self.current_schema_map)
 
@@ -181,12 +334,90 @@ class SQLOperation(Operation['SQLArtifact']):
 class SQLWorkflow(Workflow):
     def __init__(self, *args, **kwargs):
         sql_string = kwargs.pop('sql_string', None)
+        self.auto_index = kwargs.pop('auto_index', False)
+        self.csv_engine = kwargs.pop('csv_engine', None)
         super(SQLWorkflow, self).__init__(*args, **kwargs)
         self.artifact_class = SQLArtifact
         self.operator_class = SQLOperation
         if not sql_string:
             sql_string = f"sqlite:///{self.out_dir}/{self.name}.db"
         self.sql_engine = sqlalchemy.create_engine(sql_string)
+        self.stats_catalog = SQLStatisticsCatalog(self.sql_engine, self.graph)
 
     def initialize_new_artifact(self, label=None, filename=None, schema_map=None):
-        return SQLArtifact(label, filename=filename, sql_engine=self.sql_engine, schema_map=schema_map)
+        return SQLArtifact(label, filename=filename, sql_engine=self.sql_engine, stats_catalog=self.stats_catalog,
+                           csv_engine=self.csv_engine, schema_map=schema_map)
+
+    def advise_indexes(self, operation: SQLOperation) -> List[Tuple[str, str]]:
+        """
+        Inspect the pending op list of "operation" and recommend indexes for its join keys, group columns and
+        the backticked columns of its selection predicates. Views cannot be indexed, so columns of view-backed
+        artifacts are traced back through the workflow graph to the table-backed artifacts that contain them.
+        :param operation: The operation about to be executed
+        :return: List of (table, column) index candidates that do not exist yet
+        """
+        columns = []
+        for op_dict in operation.op_list:
+            op, args = op_dict['op'], op_dict['args']
+            if op == 'merge':
+                columns.extend((s.label, args['key_col']) for s in operation.sources)
+            elif op == 'groupby':
+                columns.extend((s.label, c) for s in operation.sources for c in args['group_columns'])
+            elif op == 'select':
+                columns.extend((s.label, c) for s in operation.sources
+                               for c in dict.fromkeys(_IDENTIFIER_PATTERN.findall(args['condition'])))
+
+        inspector = sqlalchemy.inspect(self.sql_engine)
+        table_columns = {t: {c['name'] for c in inspector.get_columns(t)} for t in inspector.get_table_names()}
+        existing = {(t, ix['column_names'][0]) for t in table_columns for ix in inspector.get_indexes(t)
+                    if len(ix['column_names']) == 1}
+
+        candidates = []
+        for label, column in columns:
+            for table in self._resolve_index_tables(label, column, table_columns):
+                if (table, column) not in existing and (table, column) not in candidates:
+                    candidates.append((table, column))
+
+        logger.debug(f'Index candidates for {operation.op_list}: {candidates}')
+        return candidates
+
+    def _resolve_index_tables(self, label, column, table_columns) -> List[str]:
+        """ Walk up the lineage of artifact "label" until reaching tables that contain "column" """
+        if label in table_columns:
+            return [label] if column in table_columns[label] else []
+        if label not in self.graph:
+            return []
+        tables = []
+        for parent in self.graph.predecessors(label):
+            tables.extend(self._resolve_index_tables(parent, column, table_columns))
+        return tables
+
+    def create_indexes(self, candidates: List[Tuple[str, str]]) -> None:
+        """
+        Create an index for each (table, column) candidate, recording the cost of each as a separate perf record
+        :param candidates: List of (table, column) tuples from advise_indexes
+        """
+        for table, column in candidates:
+            start_time = time.perf_counter()
+            with self.sql_engine.begin() as conn:
+                conn.execute(sqlalchemy.text(f'CREATE INDEX IF NOT EXISTS `ix_{table}_{column}` '
+                                             f'ON `{table}` (`{column}`)'))
+            end_time = time.perf_counter()
+            logger.info(f'Created index on {table}({column})')
+
+            self.perf_records.append(pandas.Series({
+                'src': table,
+                'dst': np.nan,
+                'op': 'index',
+                'args': column,
+                'start_time': start_time,
+                'end_time': end_time,
+                'elapsed_time': end_time - start_time
+            }).to_frame().T)
+
+    def execute_current_operation(self, new_label) -> SQLArtifact:
+        """ Override to create advised indexes before executing the operation, if auto_index is enabled """
+        self.validate_current_operation()
+        if self.auto_index:
+            self.create_indexes(self.advise_indexes(self.current_operation))
+        return super(SQLWorkflow, self).execute_current_operation(new_label)
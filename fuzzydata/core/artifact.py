@@ -9,13 +9,25 @@ This module contains the Artifact abstract base class definition for clients to
 """
 
 from abc import abstractmethod, ABC
+from typing import Dict, Iterable
 
 import pandas as pd
 import logging
 
+from fuzzydata.core.statistics import compute_statistics
+
 logger = logging.getLogger(__name__)
 
 
+def to_pandas(df) -> pd.DataFrame:
+    """ Convert the dataframe of an artifact of any client (see Artifact.to_df) to pandas """
+    if hasattr(df, '_to_pandas'):  # modin dataframes
+        return df._to_pandas()
+    if hasattr(df, 'compute'):  # dask dataframes
+        return df.compute()
+    return df
+
+
 class Artifact(ABC):
     """
     Generic Artifact representation
@@ -34,6 +46,7 @@ class Artifact(ABC):
         self.in_memory = in_memory
         self.file_format = file_format
         self.schema_map = schema_map
+        self.fingerprint = None  # Content fingerprint, set by the result cache and reset when the contents change
 
         logger.debug(f'New Artifact: {label}')
 
@@ -69,8 +82,17 @@ class Artifact(ABC):
     @abstractmethod
     def to_df(self) -> pd.DataFrame:
         """ Return a dataframe representation of this artifact
-        :return Dataframe representation of this artifact.
+        :return Dataframe representation of this artifact, a DataFrame of the client's dataframe library (self.pd)
+                if it has one, see to_pandas.
+        """
+
+    def statistics(self, key_columns: Iterable[str] = ()) -> Dict:
+        """ Column statistics of this artifact, see compute_statistics. Clients whose tables do not live in driver
+        memory override this to compute them in chunks, on their engine or in their database.
+        :param key_columns: Columns whose distinct values are kept as well, e.g. merge keys
+        :return Statistics dict
         """
+        return compute_statistics(to_pandas(self.to_df()), key_columns=key_columns)
 
     def __len__(self):
         """ Abstract representation: should return the number of rows in this artifact"""
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.cache
+~~~~~~~~~~~~
+This module contains an on-disk cache of deterministic operation results, shared across runs and clients
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import glob
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+from typing import Dict, List
+
+import pandas as pd
+
+from fuzzydata.core.artifact import Artifact, to_pandas
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Cache of operation results keyed by a content fingerprint of the source artifacts plus the normalized op list.
+    Results are stored as Parquet files in cache_dir, and the least recently used results are evicted once the
+    cache grows beyond max_bytes.
+    """
+    # Ops whose output is not a function of their inputs and arguments alone
+    non_deterministic_ops = {'sample'}
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2**30):
+        """
+        :param cache_dir: Directory to store cached results in
+        :param max_bytes: Size cap of the cache directory in bytes (default 1GiB)
+        """
+        if not importlib.util.find_spec('pyarrow'):
+            raise ImportError('The result cache requires pyarrow, install it with: pip install fuzzydata[cache]')
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(artifact: Artifact) -> str:
+        """
+        Content fingerprint of an artifact. Artifacts produced through the cache already carry the fingerprint of
+        their lineage, other artifacts are hashed once and the result is kept on the artifact.
+        :param artifact: Artifact to fingerprint
+        :return: Hex digest identifying the contents of the artifact
+        """
+        if artifact.fingerprint is None:
+            df = to_pandas(artifact.to_df())
+            digest = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+            digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+            artifact.fingerprint = digest.hexdigest()
+        return artifact.fingerprint
+
+    def is_cacheable(self, op_list: List[Dict]) -> bool:
+        """ Only chains made up entirely of deterministic ops can be cached """
+        return bool(op_list) and not any(op_dict['op'] in self.non_deterministic_ops for op_dict in op_list)
+
+    def key(self, sources: List[Artifact], op_list: List[Dict]) -> str:
+        """
+        Build the cache key for applying op_list on sources
+        :param sources: Source artifacts of the operation
+        :param op_list: List of {op, args} dicts chained on the operation
+        :return: Hex digest to be used as the cache key
+        """
+        normalized = json.dumps({'sources': [self.fingerprint(s) for s in sources], 'op_list': op_list},
+                                sort_keys=True, default=str)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return f"{self.cache_dir}/{key}.parquet"
+
+    def get(self, key: str):
+        """
+        Look up a cached result, marking it as recently used
+        :param key: Cache key from key()
+        :return: Cached dataframe, or None on a miss
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        logger.debug(f'Result cache hit: {key}')
+        return pd.read_parquet(path)
+
+    def put(self, key: str, df: pd.DataFrame) -> bool:
+        """
+        Store a result in the cache and evict least recently used results beyond the size cap
+        :param key: Cache key from key()
+        :param df: Result dataframe of the operation
+        :return: True if the result could be stored
+        """
+        df = to_pandas(df)
+        try:
+            df.to_parquet(self._path(key))
+        except (ValueError, TypeError, NotImplementedError) as e:
+            # e.g. pivot results with multi-level column labels
+            logger.info(f'Could not cache result {key}: {e}')
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+            return False
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """ Remove least recently used results until the cache fits within max_bytes """
+        entries = sorted(glob.glob(f"{self.cache_dir}/*.parquet"), key=os.path.getmtime)
+        total_bytes = sum(os.path.getsize(e) for e in entries)
+        while entries and total_bytes > self.max_bytes:
+            oldest = entries.pop(0)
+            total_bytes -= os.path.getsize(oldest)
+            os.remove(oldest)
+            logger.debug(f'Evicted {oldest} from result cache')
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def __len__(self):
+        return len(glob.glob(f"{self.cache_dir}/*.parquet"))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.estimator
+~~~~~~~~~~~~
+This module estimates the output size (rows, columns and bytes) of operations before they are executed, from the
+schema maps and the column statistics of their sources
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from fuzzydata.core.generator import column_provider, provider_costs
+from fuzzydata.core.statistics import estimate_selectivity, parse_condition, propagate_op
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_BYTES = 8.0  # Bytes per value of derived numeric columns (aggregates, pivot cells, applied columns)
+
+
+def table_estimate(schema_map: Dict, num_rows: int, statistics: Dict = None, cost_table=None) -> Dict:
+    """
+    Size estimate of a table, the input of estimate_op
+    :param schema_map: Schema map of the table
+    :param num_rows: Number of rows of the table
+    :param statistics: Column statistics of the table, see fuzzydata.core.statistics (optional)
+    :param cost_table: Cost table of the providers' bytes per value, see provider_costs (default the shipped one)
+    :return: Dict with num_rows, column_bytes (column label -> bytes per value), pivot_columns (number of unnamed
+             numeric columns), schema_map and statistics
+    """
+    schema_map = schema_map or {}
+    providers = {col: column_provider(spec) for col, spec in schema_map.items()}
+    costs = provider_costs(list(providers.values()), cost_table=cost_table)['bytes_per_row']
+    return {'num_rows': num_rows,
+            'column_bytes': {col: float(costs[provider]) for col, provider in providers.items()},
+            'pivot_columns': 0,
+            'schema_map': schema_map,
+            'statistics': statistics}
+
+
+def estimated_size(table: Dict) -> Dict[str, float]:
+    """
+    Rows, columns and bytes of a table estimate
+    :param table: Table estimate, see table_estimate
+    :return: Dict with rows, columns and bytes
+    """
+    row_bytes = sum(table['column_bytes'].values()) + table['pivot_columns'] * NUMERIC_BYTES
+    return {'rows': table['num_rows'],
+            'columns': len(table['column_bytes']) + table['pivot_columns'],
+            'bytes': table['num_rows'] * row_bytes}
+
+
+def within_budget(size: Dict[str, float], budget: Dict[str, float]) -> bool:
+    """
+    Check an estimated size against a budget
+    :param size: Estimated size, see estimated_size
+    :param budget: Dict with (any of) max_rows, max_columns and max_bytes
+    :return: True if no limit of the budget is exceeded
+    """
+    return all(size[measure] <= budget[f'max_{measure}'] for measure in ('rows', 'columns', 'bytes')
+               if budget.get(f'max_{measure}') is not None)
+
+
+def _distinct(table: Dict, col: str) -> int:
+    """ Estimated number of distinct values of a column, at most the number of rows """
+    num_rows = max(1, int(round(table['num_rows'])))
+    statistics = table['statistics']
+    if statistics is not None and col in statistics['columns']:
+        return max(1, min(statistics['columns'][col]['distinct'], num_rows))
+    spec = table['schema_map'].get(col)
+    if isinstance(spec, dict) and spec.get('cardinality'):
+        return max(1, min(spec['cardinality'], num_rows))
+    return num_rows  # Unknown cardinality: assume unique values, the largest possible output
+
+
+def _non_null_rows(table: Dict, col: str) -> float:
+    statistics = table['statistics']
+    if statistics is not None and col in statistics['columns']:
+        return max(0.0, table['num_rows'] - statistics['columns'][col]['nulls'])
+    return table['num_rows']
+
+
+def _groups(table: Dict, columns: List[str]) -> int:
+    """ Estimated number of groups of columns: the product of their distinct counts, at most the number of rows """
+    return int(min(np.prod([float(_distinct(table, col)) for col in columns]), max(1, table['num_rows'])))
+
+
+def estimate_op(table: Dict, op: str, args: Dict, right_table: Dict = None) -> Dict:
+    """
+    Estimate the size of the result of op
+    :param table: Table estimate of the (left) source, see table_estimate
+    :param op: Operation name
+    :param args: Operation arguments
+    :param right_table: Table estimate of the right source of a merge. Without it, the right source is assumed
+                        to be a PK-FK join table generated for the merge (see generate_pkfk_join_table), with one row
+                        per key and at most as many columns as the left source.
+    :return: Table estimate of the result
+    """
+    num_rows, column_bytes = table['num_rows'], table['column_bytes']
+    schema_map, statistics = table['schema_map'], table['statistics']
+    result = dict(table, statistics=None)
+    if statistics is not None:
+        result['statistics'] = propagate_op(statistics, op, args,
+                                            right_statistics=right_table['statistics'] if right_table else None)
+
+    if op == 'sample':
+        result['num_rows'] = num_rows * args['frac']
+    elif op == 'select':
+        parsed = parse_condition(args['condition'])
+        selectivity = None
+        if statistics is not None and parsed is not None and parsed[0] in statistics['columns']:
+            selectivity = estimate_selectivity(statistics['columns'][parsed[0]], statistics['num_rows'],
+                                               parsed[1], parsed[2])
+        result['num_rows'] = num_rows * (selectivity if selectivity is not None else 1.0)
+    elif op == 'project':
+        result['column_bytes'] = {col: size for col, size in column_bytes.items() if col in args['output_cols']}
+        result['schema_map'] = {col: spec for col, spec in schema_map.items() if col in args['output_cols']}
+    elif op == 'apply':
+        new_col = f"{args['numeric_col']}__{args['a']}x_{args['b']}"
+        result['column_bytes'] = {**column_bytes, new_col: NUMERIC_BYTES}
+    elif op == 'groupby':
+        result['num_rows'] = _groups(table, args['group_columns'])
+        result['column_bytes'] = {col: column_bytes.get(col, NUMERIC_BYTES) for col in args['group_columns']}
+        result['column_bytes'].update({col: NUMERIC_BYTES for col in args['agg_columns']})
+        result['schema_map'] = {col: spec for col, spec in schema_map.items() if col in args['group_columns']}
+    elif op == 'pivot':
+        result['num_rows'] = _groups(table, args['index_cols'])
+        result['column_bytes'] = {col: column_bytes.get(col, NUMERIC_BYTES) for col in args['index_cols']}
+        result['pivot_columns'] = _groups(table, args['columns']) * len(args['value_col'])
+        result['schema_map'] = {}
+    elif op == 'merge':
+        key_col = args['key_col']
+        if right_table is None:
+            # Generated PK-FK join table: every non-null key matches exactly one right row
+            result['num_rows'] = _non_null_rows(table, key_col)
+            mean_bytes = np.mean(list(column_bytes.values())) if column_bytes else NUMERIC_BYTES
+            result['column_bytes'] = {**column_bytes,
+                                      **{f'_right_{i}': mean_bytes for i in range(max(2, len(column_bytes)))}}
+        else:
+            # Textbook equi-join estimate: |L| * |R| / max(distinct keys of L, distinct keys of R)
+            result['num_rows'] = _non_null_rows(table, key_col) * _non_null_rows(right_table, key_col) / \
+                max(_distinct(table, key_col), _distinct(right_table, key_col))
+            right_cols = args.get('right_cols')
+            result['column_bytes'] = {**column_bytes,
+                                      **{col: size for col, size in right_table['column_bytes'].items()
+                                         if right_cols is None or col in right_cols}}
+            result['schema_map'] = {**schema_map,
+                                    **{col: spec for col, spec in right_table['schema_map'].items()
+                                       if right_cols is None or col in right_cols}}
+    elif op != 'fill':
+        logger.warning(f'Cannot estimate the output size of {op}, assuming the size of its input')
+    return result
+
+
+def estimate_op_list(tables: List[Dict], op_list: List[Dict]) -> Dict:
+    """
+    Estimate the size of the result of an op list, see estimate_op
+    :param tables: Table estimates of the source artifacts of the operation, in order
+    :param op_list: List of {op, args} dicts
+    :return: Table estimate of the result
+    """
+    table = tables[0]
+    right_table = tables[1] if len(tables) > 1 else None
+    for op_dict in op_list:
+        table = estimate_op(table, op_dict['op'], op_dict['args'], right_table=right_table)
+    return table
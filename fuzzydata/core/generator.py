@@ -1,4 +1,6 @@
+import importlib.util
 import itertools
+import json
 import os
 import string
 from collections import defaultdict
@@ -7,13 +9,15 @@ import pandas
 import numpy as np
 import logging
 
-from functools import partial
-from typing import Callable, Dict, List
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterable, List
 
 import pandas as pd
-from faker import Faker
 from itertools import chain
 
+from fuzzydata.core.artifact import to_pandas
+from fuzzydata.core.statistics import fill_values, select_condition
+
 
 logging.getLogger('faker').setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -21,6 +25,8 @@ logger = logging.getLogger(__name__)
 
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 _UNIQUE_DICTIONARY = string.ascii_letters+string.digits
+WIDE_TABLE_COLUMNS = 1000  # generate_table switches to generate_wide_table at this many columns
+DEFAULT_COST_TABLE = _THIS_DIR + '/config/provider_costs.json'
 
 
 def load_function_dict(directory=_THIS_DIR+'/config/'):
@@ -40,26 +46,206 @@ def generate_inverse_function_dict(function_dict):
     return inv_functions
 
 
+@lru_cache(maxsize=None)
+def load_cost_table(filename: str = DEFAULT_COST_TABLE) -> Dict[str, Dict[str, float]]:
+    """ Load a provider cost table (provider -> {rows_per_sec, bytes_per_row}) written by fuzzydata profile """
+    with open(filename) as infile:
+        return json.load(infile)
+
+
 _gen_functions = load_function_dict()
 logger.debug(_gen_functions)
-_faker_cols = list(set(chain(*_gen_functions.values())))
+_faker_cols = sorted(set(chain(*_gen_functions.values())))  # Sorted, so random choices do not depend on str hashes
 _inv_gen_functions = generate_inverse_function_dict(_gen_functions)
 
 
-def generate_prefix(symbol_dict: str, size: int=5) -> str:
-    return ''.join(np.random.choice(list(symbol_dict), size))
+def generate_prefix(symbol_dict: str, size: int=5, random_state=None) -> str:
+    return ''.join((np.random if random_state is None else random_state).choice(list(symbol_dict), size))
+
+
+def unique_column_label(provider: str, taken: Iterable[str],
+                        unique_prefix: Callable = partial(generate_prefix, _UNIQUE_DICTIONARY, size=5)) -> str:
+    """ Column label <prefix>__<provider>, drawing prefixes until the label is not one of the taken labels """
+    label = f'{unique_prefix()}__{provider}'
+    while label in taken:
+        label = f'{unique_prefix()}__{provider}'
+    return label
+
+
+def column_provider(spec) -> str:
+    """
+    Faker provider of a schema map entry, which is either the provider name or a column spec dict with the keys:
+    provider, cardinality (number of distinct values), distribution ('uniform' or 'zipf'), zipf_a (Zipf exponent,
+    default 1.0) and hot_fraction (fraction of rows that take the most frequent value, default 0.0).
+    """
+    return spec['provider'] if isinstance(spec, dict) else spec
+
+
+def column_null_rate(spec) -> float:
+    """ Fraction of null values of a schema map entry, set by the null_rate key of a column spec (default 0.0) """
+    return spec.get('null_rate', 0.0) if isinstance(spec, dict) else 0.0
+
+
+def inject_nulls(series, null_rate: float, rng: np.random.Generator = None):
+    """
+    Set a random fraction of the values of series to null with a single vectorized mask. Numeric and boolean columns
+    are converted to pandas' nullable dtypes first, so that integers stay integers.
+    :param series: pandas or modin Series
+    :param null_rate: Probability of each value to be set to null
+    :param rng: numpy random Generator (default a new unseeded one)
+    :return: Series with nulls
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    mask = rng.random(len(series.index)) < null_rate
+    return series.convert_dtypes(convert_string=False).mask(mask)
+
+
+def sample_value_indices(num_rows: int, cardinality: int, distribution: str = 'uniform', zipf_a: float = 1.0,
+                         hot_fraction: float = 0.0, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Draw the value index (into a pool of cardinality distinct values) of every row of a column
+    :param num_rows: Number of rows to draw
+    :param cardinality: Number of distinct values to draw from
+    :param distribution: 'uniform', or 'zipf' where the k-th value is drawn with probability proportional to 1/k^zipf_a
+    :param zipf_a: Zipf exponent, higher values are more skewed (default 1.0)
+    :param hot_fraction: Fraction of rows set to the first (hot) value on top of the distribution (default 0.0)
+    :param rng: numpy random Generator (default a new unseeded one)
+    :return: Integer array of num_rows value indices
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if distribution == 'uniform':
+        indices = rng.integers(0, cardinality, size=num_rows)
+    elif distribution == 'zipf':
+        weights = 1.0 / np.arange(1, cardinality + 1) ** zipf_a
+        indices = rng.choice(cardinality, size=num_rows, p=weights / weights.sum())
+    else:
+        raise ValueError(f'Unknown distribution {distribution}, expected uniform or zipf')
+    if hot_fraction:
+        indices[rng.random(num_rows) < hot_fraction] = 0
+    return indices
 
 
-def generate_table(num_rows: int=100, column_dict: Dict=None, pd=pandas, key_series=None) -> pandas.DataFrame:
+def column_value_pools(column_dict: Dict, num_rows: int, seed: int = None, max_rounds: int = 10) -> Dict[str, np.ndarray]:
+    """
+    Generate the pools of distinct values that the columns with a cardinality or a skewed distribution in their
+    column spec are sampled from. The pools of a table have to be shared by all its partitions or chunks to keep the
+    column cardinalities.
+    :param column_dict: Schema Mapping (column_label->faker_provider or column spec) as a Dict
+    :param num_rows: Number of rows of the table, the cardinality of specs without one
+    :param seed: Seed for the faker instance (optional)
+    :param max_rounds: Rounds of drawing values before giving up on providers with fewer distinct values, drawing
+                       also stops after a round without new values
+    :return: Dict of column label -> array of distinct values
+    """
+    from faker import Faker
+    faker = Faker()
+    if seed is not None:
+        faker.seed_instance(seed)
+
+    value_pools = {}
+    for label, spec in column_dict.items():
+        if not isinstance(spec, dict) or not ('cardinality' in spec or spec.get('hot_fraction')
+                                              or spec.get('distribution', 'uniform') != 'uniform'):
+            continue
+        cardinality = max(1, min(spec.get('cardinality', num_rows), num_rows))
+        pool = {}
+        for _ in range(max_rounds):
+            if len(pool) >= cardinality:
+                break
+            num_distinct = len(pool)
+            pool.update(dict.fromkeys(faker.format(spec['provider']) for _ in range(2 * (cardinality - len(pool)))))
+            if len(pool) == num_distinct:
+                break  # The provider is out of distinct values, e.g. booleans or centuries
+        if len(pool) < cardinality:
+            logger.info(f'Provider {spec["provider"]} of column {label} only generated {len(pool)} of '
+                           f'{cardinality} distinct values')
+        value_pools[label] = pandas.Series(list(pool)[:cardinality]).to_numpy()  # Infers native dtypes
+    return value_pools
+
+
+def generate_wide_table(num_rows: int, column_dict: Dict, pd=pandas, seed: int = None,
+                        value_pools: Dict[str, np.ndarray] = None, pool_size: int = 1000) -> pandas.DataFrame:
+    """
+    Generate a table with thousands of columns. Faker is only called for one pool of pool_size distinct values per
+    provider, shared by all columns of that provider without a pool of their own, and the columns of the same dtype
+    are sampled into one contiguous 2-D block, so that the DataFrame is built with a single block per dtype instead
+    of concatenating one Series per column.
+    :param num_rows: Number of rows desired in the table
+    :param column_dict: Schema Mapping (column_label->faker_provider or column spec) as a Dict
+    :param pd: pandas library to be used to generated (default pandas), you can also use modin.pandas
+    :param seed: Seed for the value pools, the sampling and the null masks (optional)
+    :param value_pools: Value pools of the column specs, see column_value_pools (default generated for this table)
+    :param pool_size: Number of distinct values of the shared provider pools, i.e. the cardinality of plain columns
+    :return: Dataframe with generated table according to spec.
+    """
+    logger.info(f'Generating wide df with {num_rows} rows and {len(column_dict.keys())} columns')
+    if value_pools is None:
+        value_pools = column_value_pools(column_dict, num_rows, seed=seed)
+    provider_pools = column_value_pools({provider: {'provider': provider, 'cardinality': pool_size}
+                                         for provider in {column_provider(spec) for label, spec in column_dict.items()
+                                                          if label not in value_pools}},
+                                        num_rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    null_rng = np.random.default_rng(None if seed is None else [seed, 1])
+
+    def sample_column(label, spec):
+        pool = value_pools[label] if label in value_pools else provider_pools[column_provider(spec)]
+        options = spec if isinstance(spec, dict) and label in value_pools else {}
+        return pool[sample_value_indices(num_rows, len(pool), distribution=options.get('distribution', 'uniform'),
+                                         zipf_a=options.get('zipf_a', 1.0),
+                                         hot_fraction=options.get('hot_fraction', 0.0), rng=rng)]
+
+    labels_by_dtype = defaultdict(list)
+    nullable_columns = {}
+    for label, spec in column_dict.items():
+        if column_null_rate(spec):
+            # Nullable columns change dtype, so they are kept out of the blocks
+            nullable_columns[label] = inject_nulls(pandas.Series(sample_column(label, spec)), column_null_rate(spec),
+                                                   rng=null_rng)
+        else:
+            pool = value_pools[label] if label in value_pools else provider_pools[column_provider(spec)]
+            labels_by_dtype[pool.dtype].append(label)
+
+    frames = [pandas.DataFrame(nullable_columns)]
+    for dtype, labels in labels_by_dtype.items():
+        # Filled one column per row, so that the transposed view is the column-major block pandas stores
+        block = np.empty((len(labels), num_rows), dtype=dtype)
+        for i, label in enumerate(labels):
+            block[i] = sample_column(label, column_dict[label])
+        frames.append(pandas.DataFrame(block.T, columns=labels, copy=False))
+    df = pandas.concat(frames, axis=1)[list(column_dict)]
+    return df if pd is pandas else pd.DataFrame(df)
+
+
+def generate_table(num_rows: int=100, column_dict: Dict=None, pd=pandas, key_series=None,
+                   seed: int = None, value_pools: Dict[str, np.ndarray] = None, wide: bool = None) -> pandas.DataFrame:
     """
     Generate a table with a given schema and number of rows
     :param num_rows: Number of rows desired in the table
-    :param column_dict: Schema Mapping (column_label->faker_provider) as a Dict
+    :param column_dict: Schema Mapping (column_label->faker_provider or column spec) as a Dict
     :param pd: pandas library to be used to generated (default pandas), you can also use modin.pandas
     :param key_series: A pd.Series object that contains a key column to be left-appended to the df. Overrides num_rows.
+    :param seed: Seed for the faker instance and the null masks, the same seed and schema generate the same table
+                 apart from providers relative to the current time such as unix_time (optional)
+    :param value_pools: Value pools of the column specs, see column_value_pools (default generated for this table)
+    :param wide: Generate with generate_wide_table (default for WIDE_TABLE_COLUMNS or more columns without key_series)
     :return: Dataframe with generated table according to spec.
     """
+    if wide is None:
+        wide = key_series is None and len(column_dict) >= WIDE_TABLE_COLUMNS
+    if wide:
+        return generate_wide_table(num_rows, column_dict, pd=pd, seed=seed, value_pools=value_pools)
+
+    from faker import Faker  # Deferred, importing faker takes a noticeable part of startup time
     faker = Faker()
+    if seed is not None:
+        faker.seed_instance(seed)
+    if value_pools is None:
+        value_pools = column_value_pools(column_dict, num_rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    null_rng = np.random.default_rng(None if seed is None else [seed, 1])  # Null masks only depend on the seed
 
     series_list = []
     label_list = []
@@ -71,46 +257,206 @@ def generate_table(num_rows: int=100, column_dict: Dict=None, pd=pandas, key_ser
     else:
         logger.info(f'Generating base df with {num_rows} rows and {len(column_dict.keys())} columns')
 
-    for label, column in column_dict.items():
-        series_list.append(pd.Series((faker.format(column) for _ in range(num_rows))))
+    for label, spec in column_dict.items():
+        if label in value_pools:
+            # Vectorized sampling from the column's distinct values
+            pool = value_pools[label]
+            indices = sample_value_indices(num_rows, len(pool), distribution=spec.get('distribution', 'uniform'),
+                                           zipf_a=spec.get('zipf_a', 1.0), hot_fraction=spec.get('hot_fraction', 0.0),
+                                           rng=rng)
+            series_list.append(pd.Series(pool[indices]))
+        else:
+            provider = column_provider(spec)
+            series_list.append(pd.Series((faker.format(provider) for _ in range(num_rows))))
+        if column_null_rate(spec):
+            series_list[-1] = inject_nulls(series_list[-1], column_null_rate(spec), rng=null_rng)
         label_list.append(label)
 
     logger.debug(f'Column list: {label_list}')
     return pd.concat(series_list, axis=1, keys=label_list)
 
 
-def generate_schema(num_cols: int, unique_prefix: Callable = partial(generate_prefix, _UNIQUE_DICTIONARY, size=5)) -> Dict[str, str]:
+def provider_costs(providers: List[str], cost_table=None) -> pandas.DataFrame:
+    """
+    Generation cost per row of faker providers. Providers missing from the cost table get the median cost.
+    :param providers: Faker provider names
+    :param cost_table: Dict of provider -> {rows_per_sec, bytes_per_row}, or the JSON file of one written by
+                       fuzzydata profile (default the cost table shipped with fuzzydata)
+    :return: Dataframe indexed by provider with the columns seconds_per_row and bytes_per_row
+    """
+    if not isinstance(cost_table, dict):
+        cost_table = load_cost_table(cost_table or DEFAULT_COST_TABLE)
+    costs = pandas.DataFrame.from_dict(cost_table, orient='index', columns=['rows_per_sec', 'bytes_per_row'])
+    costs = costs.reindex(list(dict.fromkeys(providers)))
+    costs = costs.fillna(costs.median()).fillna(1.0)
+    return pandas.DataFrame({'seconds_per_row': 1.0 / costs['rows_per_sec'], 'bytes_per_row': costs['bytes_per_row']})
+
+
+def fit_schema_budget(selection: List[str], pools: List[List[str]], budgets: Dict[str, float],
+                      costs: pandas.DataFrame) -> List[str]:
+    """
+    Replace the most expensive providers of a selection with the cheapest provider of the same pool (i.e. column
+    type) until the total cost per row is within every budget
+    :param selection: Selected provider of every column
+    :param pools: Providers every column may be replaced with
+    :param budgets: Dict of cost measure (a column of costs) -> maximum total cost per row
+    :param costs: Provider costs, see provider_costs
+    :return: New selection of providers
+    """
+    selection = list(selection)
+    for measure, budget in budgets.items():
+        for i in np.argsort(-costs.loc[selection, measure].to_numpy(), kind='stable'):
+            if costs.loc[selection, measure].sum() <= budget:
+                break
+            cheapest = costs.loc[pools[i], measure].idxmin()
+            if costs.loc[cheapest, measure] < costs.loc[selection[i], measure]:
+                selection[i] = cheapest
+    for measure, budget in budgets.items():
+        if costs.loc[selection, measure].sum() > budget:
+            logger.warning(f'Schema exceeds the {measure} budget of {budget:.4g} with its cheapest providers: '
+                           f'{costs.loc[selection, measure].sum():.4g}')
+    return selection
+
+
+def generate_schema(num_cols: int, unique_prefix: Callable = None,
+                    column_dist: Dict = None, null_rate: float = None,
+                    reserved_labels: Iterable[str] = (), min_rows_per_sec: float = None,
+                    max_bytes_per_row: float = None, cost_table=None, random_state=None) -> Dict[str, str]:
     """
     Generates a randomized schema given number of columns.
     :param num_cols: Number of columns to generate.
-    :param unique_prefix: A function that generates a unique column prefix (default is 5 char random string).
-    :return: Dict of column_label->faker provider as per spec.
+    :param unique_prefix: A function that generates a column prefix (default is 5 char random string), it is called
+                          again when a label collides with another label of the schema or with reserved_labels
+    :param column_dist: Column spec options (cardinality, distribution, zipf_a, hot_fraction) applied to the groupable
+                        and joinable columns, i.e. the group by and merge keys (optional)
+    :param null_rate: Fraction of null values of every column, unless set by column_dist (optional)
+    :param reserved_labels: Labels the schema must not use, e.g. the columns of the table it is merged with
+    :param min_rows_per_sec: Throughput budget, the rows per second the schema's providers should generate at least
+    :param max_bytes_per_row: Size budget, the CSV bytes per row the schema's providers should generate at most
+    :param cost_table: Provider costs for the budgets, a Dict or a JSON file written by fuzzydata profile (default
+                       the cost table shipped with fuzzydata). With a budget, providers are chosen with probability
+                       inversely proportional to their cost, and the most expensive ones are then replaced by the
+                       cheapest of the same column type until the schema is within budget.
+    :param random_state: numpy RandomState to draw the providers and column prefixes from, for reproducible schemas
+                         (default the global numpy random state)
+    :return: Dict of column_label->faker provider (or column spec) as per spec.
     """
+    state = np.random if random_state is None else random_state
+    if unique_prefix is None:
+        unique_prefix = partial(generate_prefix, _UNIQUE_DICTIONARY, size=5, random_state=random_state)
+    budgets = {measure: budget for measure, budget in [('seconds_per_row', min_rows_per_sec and 1.0 / min_rows_per_sec),
+                                                        ('bytes_per_row', max_bytes_per_row)] if budget}
+    costs = provider_costs(_faker_cols, cost_table) if budgets else None
+
+    def choose(providers, size):
+        if not budgets:
+            return state.choice(providers, size=size)
+        weights = 1.0 / costs.loc[providers, list(budgets)].prod(axis=1).to_numpy()
+        return state.choice(providers, size=size, p=weights / weights.sum())
+
     column_dict = {}
     num_col_types = len(_gen_functions.keys())
     if num_cols < num_col_types:
-        random_selection = np.random.choice(_faker_cols, size=num_cols)
+        random_selection = choose(_faker_cols, num_cols)
+        pools = [_faker_cols] * num_cols
     else:
         # Better randomization of columns to ensure at least one of each type are generated
         random_selection = []
+        pools = []
         num_array = np.ones(num_col_types, dtype=int)
         while sum(num_array) < num_cols:
-            ix = np.random.randint(0, 4)
+            ix = state.randint(0, 4)
             num_array[ix] += 1
         for ix, col_type in enumerate(_gen_functions.keys()):
-            random_selection.extend(np.random.choice(_gen_functions[col_type], size=num_array[ix]))
+            random_selection.extend(choose(_gen_functions[col_type], num_array[ix]))
+            pools.extend([_gen_functions[col_type]] * num_array[ix])
+    if budgets:
+        random_selection = fit_schema_budget(random_selection, pools, budgets, costs)
 
     logger.debug(random_selection)
-    column_dict.update({f'{unique_prefix()}__{r}': r for r in random_selection})
+    reserved_labels = set(reserved_labels)
+    for r in random_selection:
+        column_dict[unique_column_label(r, column_dict.keys() | reserved_labels, unique_prefix=unique_prefix)] = r
+    if column_dist:
+        column_dict = {label: dict(provider=provider, **column_dist)
+                       if {'groupable', 'joinable'} & set(_inv_gen_functions[provider]) else provider
+                       for label, provider in column_dict.items()}
+    if null_rate:
+        column_dict = {label: {'provider': column_provider(spec), 'null_rate': null_rate,
+                               **(spec if isinstance(spec, dict) else {})}
+                       for label, spec in column_dict.items()}
     logger.debug(f'Selected columns for this schema: {column_dict.values()}')
     return column_dict
 
 
+def generate_star_schema(num_rows: int, num_cols: int = 5, num_dimensions: int = 3, dimension_rows: int = 100,
+                         dimension_cols: int = 3, measure_cardinality: int = 1000, denormalize: bool = True,
+                         column_dist: Dict = None, null_rate: float = None, schema_budget: Dict = None,
+                         seed: int = None):
+    """
+    Generate a normalized star schema: small dimension tables with a distinct key column and attribute columns that
+    are functionally dependent on the key (e.g. company -> HQ city), and a fact table of num_rows that references
+    every dimension through a foreign key. Foreign keys are drawn by vectorized index sampling and the fact table is
+    denormalized by gathering the referenced dimension rows, so only the dimension tables are generated with Faker.
+    :param num_rows: Number of rows of the fact table
+    :param num_cols: Number of numeric measure columns of the fact table, on top of the dimension columns
+    :param num_dimensions: Number of dimension tables, at most the number of joinable providers
+    :param dimension_rows: Number of rows (distinct keys) of each dimension table
+    :param dimension_cols: Number of attribute columns of each dimension table
+    :param measure_cardinality: Number of distinct values of each measure column
+    :param denormalize: Join the dimension attributes into the fact table, otherwise it only has the foreign keys
+    :param column_dist: Distribution options (distribution, zipf_a, hot_fraction) of the foreign keys (default uniform)
+    :param null_rate: Fraction of null values of the dimension attribute and measure columns, the keys have no nulls
+    :param schema_budget: Budget options of the dimension attribute schemas, see generate_schema
+    :param seed: Seed for the schemas, the dimension tables and the foreign keys (optional)
+    :return: Tuple of (fact table, fact schema map, list of (dimension table, dimension schema map, key column))
+    """
+    rng = np.random.default_rng(seed)
+    schema_state = None if seed is None else np.random.RandomState(seed)
+    unique_prefix = partial(generate_prefix, _UNIQUE_DICTIONARY, size=5, random_state=schema_state)
+    column_dist = column_dist or {}
+    key_providers = rng.choice(_gen_functions['joinable'], size=num_dimensions, replace=False)
+
+    dimensions = []
+    fact_columns = []
+    fact_schema = {}
+    for i, key_provider in enumerate(key_providers):
+        key_col = unique_column_label(key_provider, fact_schema, unique_prefix=unique_prefix)
+        key_spec = {'provider': key_provider, 'cardinality': dimension_rows}
+        dimension_seed = None if seed is None else seed + i
+        keys = column_value_pools({key_col: key_spec}, dimension_rows, seed=dimension_seed)[key_col]
+        attribute_schema = generate_schema(dimension_cols, reserved_labels=set(fact_schema) | {key_col},
+                                           null_rate=null_rate, random_state=schema_state, **(schema_budget or {}))
+        dimension_df = generate_table(len(keys), column_dict=attribute_schema,
+                                      key_series=pandas.Series(keys, name=key_col), seed=dimension_seed)
+        dimension_schema = {key_col: key_spec, **attribute_schema}
+        dimensions.append((dimension_df, dimension_schema, key_col))
+
+        foreign_keys = sample_value_indices(num_rows, len(keys), distribution=column_dist.get('distribution', 'uniform'),
+                                            zipf_a=column_dist.get('zipf_a', 1.0),
+                                            hot_fraction=column_dist.get('hot_fraction', 0.0), rng=rng)
+        fact_dimension_schema = dimension_schema if denormalize else {key_col: key_spec}
+        fact_columns.append(dimension_df[list(fact_dimension_schema)].take(foreign_keys).reset_index(drop=True))
+        fact_schema.update(fact_dimension_schema)
+
+    measure_schema = {}
+    for provider in rng.choice(_gen_functions['numeric'], size=num_cols):
+        measure_spec = {'provider': provider, 'cardinality': measure_cardinality}
+        if null_rate:
+            measure_spec['null_rate'] = null_rate
+        measure_schema[unique_column_label(provider, fact_schema.keys() | measure_schema.keys(),
+                                           unique_prefix=unique_prefix)] = measure_spec
+    fact_columns.append(generate_table(num_rows, column_dict=measure_schema, seed=seed))
+    fact_schema.update(measure_schema)
+
+    return pandas.concat(fact_columns, axis=1), fact_schema, dimensions
+
+
 def get_schema_type_mapping(column_dict):
     # Do not need inverse schema maps yet...
     schema_type_mapping = defaultdict(list)
-    for col, faker_type in column_dict.items():
-        for col_type in _inv_gen_functions[faker_type]:
+    for col, spec in column_dict.items():
+        for col_type in _inv_gen_functions[column_provider(spec)]:
             schema_type_mapping[col_type].append(col)
 
     logger.debug(f'Inverse ColumnType Mapping: {schema_type_mapping}')
@@ -118,6 +464,118 @@ def get_schema_type_mapping(column_dict):
     return schema_type_mapping
 
 
+# Storage dtypes of the providers that do not generate strings, other numeric providers are stored as floats
+_PROVIDER_DTYPES = {'boolean': 'bool', 'pybool': 'bool',
+                    'pyint': 'int64', 'random_digit': 'int64', 'random_int': 'int64', 'random_number': 'int64',
+                    'randomize_nb_elements': 'int64',
+                    'pyfloat': 'float64', 'unix_time': 'float64'}
+
+
+@lru_cache(maxsize=None)
+def provider_dtype(provider: str) -> str:
+    """
+    Storage dtype for columns of a faker provider in typed storage mode, derived from the provider's type in
+    config/*.txt and the static table of non-string providers: native numeric and boolean dtypes, category for other
+    groupable providers and (arrow backed, if available) strings for everything else.
+    :param provider: Faker provider name
+    :return: pandas dtype string
+    """
+    if provider in _PROVIDER_DTYPES:
+        return _PROVIDER_DTYPES[provider]
+    if 'numeric' in _inv_gen_functions[provider]:
+        return 'float64'
+    if 'groupable' in _inv_gen_functions[provider]:
+        return 'category'
+    return 'string[pyarrow]' if importlib.util.find_spec('pyarrow') else 'string'
+
+
+def schema_dtypes(column_dict: Dict[str, str]) -> Dict[str, str]:
+    """
+    Storage dtypes of all columns in a schema map for typed storage mode, see provider_dtype
+    :param column_dict: Schema Mapping (column_label->faker_provider) as a Dict
+    :return: Dict of column label -> pandas dtype string
+    """
+    providers = {col: column_provider(spec) for col, spec in column_dict.items()}
+    return {col: provider_dtype(provider) for col, provider in providers.items() if provider in _inv_gen_functions}
+
+
+def apply_schema_dtypes(df, column_dict: Dict[str, str]):
+    """
+    Convert the columns of df that pandas could not type natively (object columns) to their typed storage dtypes.
+    Columns that already have a native dtype, e.g. aggregates, are left alone.
+    :param df: pandas or modin dataframe
+    :param column_dict: Schema Mapping (column_label->faker_provider) of df
+    :return: Dataframe with converted columns
+    """
+    dtypes = {col: dtype for col, dtype in schema_dtypes(column_dict).items()
+              if col in df.columns and df[col].dtype == object}
+    return df.astype(dtypes) if dtypes else df
+
+
+def csv_read_options(column_dict: Dict[str, str], typed_storage: bool = False, engine: str = None) -> Dict:
+    """
+    Keyword arguments for read_csv derived from a schema map. Only the schema columns are read, which skips any
+    index column written out with the table, and text columns get an explicit dtype so they are not re-inferred
+    (e.g. zipcodes as integers). Only empty fields are read as nulls, so values such as the country code 'NA'
+    survive a round trip. Numeric columns are left to inference as they may hold aggregates, see nullable_dtypes
+    for schemas with columns with nulls.
+    :param column_dict: Schema Mapping (column_label->faker_provider) of the file, may be empty (e.g. pivot results)
+    :param typed_storage: Read text columns with their typed storage dtypes instead of object (default False)
+    :param engine: read_csv parser engine (default pandas' default), see read_schema_csv for the pyarrow engine
+    :return: Dict of read_csv keyword arguments
+    """
+    options = {'keep_default_na': False, 'na_values': ['']}
+    if engine:
+        options['engine'] = engine
+    if column_dict:
+        options['usecols'] = list(column_dict.keys())
+        options['dtype'] = {col: dtype if typed_storage else object
+                            for col, dtype in schema_dtypes(column_dict).items()
+                            if dtype in ('category', 'string', 'string[pyarrow]')}
+    return options
+
+
+def nullable_dtypes(df, column_dict: Dict[str, str]):
+    """
+    Convert the inferred columns of a table read from CSV to pandas' nullable dtypes if its schema has columns with
+    nulls, so that e.g. integer columns with nulls stay integers
+    :param df: Dataframe (or a chunk of one) read with csv_read_options
+    :param column_dict: Schema Mapping (column_label->faker_provider) of the table
+    :return: Dataframe with nullable dtypes, or df if the schema has no nulls
+    """
+    if column_dict and any(column_null_rate(spec) for spec in column_dict.values()):
+        return df.convert_dtypes(convert_string=False)
+    return df
+
+
+def read_schema_csv(filename, column_dict: Dict[str, str], typed_storage: bool = False, engine: str = None,
+                    pd=pandas):
+    """
+    Read a CSV file with the options of csv_read_options. pandas' pyarrow engine only applies dtypes after pyarrow has
+    inferred the column types, which drops e.g. leading zeros of zipcodes, so with engine='pyarrow' the file is parsed
+    by pyarrow directly with the text columns declared as strings.
+    :param filename: CSV file to read
+    :param column_dict: Schema Mapping (column_label->faker_provider) of the file
+    :param typed_storage: Read text columns with their typed storage dtypes instead of object (default False)
+    :param engine: read_csv parser engine, 'pyarrow' for multi-threaded parsing (default pandas' default)
+    :param pd: Dataframe library to read into (default pandas)
+    :return: Dataframe of the file
+    """
+    options = csv_read_options(column_dict, typed_storage=typed_storage, engine=engine)
+    if engine != 'pyarrow':
+        return nullable_dtypes(pd.read_csv(filename, **options), column_dict)
+
+    import pyarrow
+    from pyarrow import csv
+    dtypes = options.get('dtype', {})
+    convert_options = csv.ConvertOptions(include_columns=options.get('usecols', []),
+                                         column_types={col: pyarrow.string() for col in dtypes},
+                                         null_values=[''], strings_can_be_null=True)
+    df = nullable_dtypes(csv.read_csv(filename, convert_options=convert_options).to_pandas(), column_dict)
+    df = df.astype(dtypes)
+    return df if pd is pandas else pd.DataFrame(df)
+
+
 def select_rand_cols(df_col_types, num, col_type=None):
     """
     Select a random "num" of columns from a given column_name: type mapping
@@ -139,8 +597,8 @@ def select_rand_cols(df_col_types, num, col_type=None):
     return options
 
 
-def select_rand_aggregate():
-    return np.random.choice(['min', 'max', 'sum', 'mean', 'count'], 1)[0]
+def select_rand_aggregate(functions: List[str] = None):
+    return np.random.choice(functions or ['min', 'max', 'sum', 'mean', 'count'], 1)[0]
 
 
 def get_rand_percentage(minimum=0.1, maximum=0.99):
@@ -148,39 +606,64 @@ def get_rand_percentage(minimum=0.1, maximum=0.99):
 
 
 def generate_pkfk_join_table(source_table, source_schema: Dict['str', 'str'],
-                             key_col: str, new_col_size=None, pd=pandas):
+                             key_col: str, new_col_size=None, pd=pandas, key_values=None):
     """
     Generates a randomized PK-FK table (right table) for a merge/join operation, given a source schema and key_column.
-    :param source_table: Source table to be joined.
+    :param source_table: Source table to be joined, not needed if key_values are given.
     :param source_schema: Source Schema.
     :param key_col: Column Label to be used as a key.
     :param new_col_size: Number of columns required for the new table .
     :param pd: pandas library to be used.
+    :param key_values: Distinct non-null values of the key column (optional, e.g. from the artifact statistics)
     :return:
     """
-    key_values = list(set(source_table[key_col].values))
+    # One row per distinct key, so the key distribution (e.g. skew) of the source table carries over to the join
+    # Null keys are left out, they do not join in SQL (but would in pandas)
+    if key_values is None:
+        key_values = source_table[key_col].dropna().unique()
     key_series = pd.Series(data=key_values, name=key_col)
     if not new_col_size:
-        new_col_size = np.random.randint(2, max(3, len(source_table.columns)+1))
+        new_col_size = np.random.randint(2, max(3, len(source_schema)+1))
 
-    new_schema = generate_schema(new_col_size)
+    # The attribute columns get the mean null rate of the source columns, the keys have no nulls
+    null_rate = np.mean([column_null_rate(spec) for spec in source_schema.values()]) if source_schema else 0.0
+    new_schema = generate_schema(new_col_size, reserved_labels=source_schema, null_rate=float(null_rate))
     new_df = generate_table(num_rows=len(key_series.index), column_dict=new_schema, pd=pd, key_series=key_series)
     new_schema[key_col] = source_schema[key_col]
 
     return new_df, new_schema
 
 
-def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[str]=[]) -> Dict[str, Dict]:
+def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[str]=[],
+                         max_key_null_rate: float = 0.5, statistics: Dict = None,
+                         selectivity: float = None, pivot_agg_functions: List[str] = None) -> Dict[str, Dict]:
     """
     Generate the a number of options for the next operation to be performed on a given table with schema and num_rows
     :param schema: Column Map
     :param num_rows: number of rows in the table
+    :param max_key_null_rate: Columns with at least this null rate are not used as group by, pivot or merge keys or
+                              pivot values, as mostly null keys produce (nearly) empty results (default 0.5). The null
+                              rate is the measured one if statistics are given, otherwise the schema's. Chains of
+                              several ops on columns below the limit may still come out empty.
+    :param statistics: Column statistics of the table, see fuzzydata.core.statistics. Select and fill are only
+                       generated with statistics, as their arguments are chosen from the values of the table.
+    :param selectivity: Target fraction of rows kept by selects (default random, see get_rand_percentage)
+    :param pivot_agg_functions: Aggregate functions supported by the client's pivot (default all, see
+                                Operation.pivot_agg_functions)
     :return: Dict of ops: args choices
     """
     # Generates parameters for each op as well.
 
     ops_choices = []
     df_col_types = get_schema_type_mapping(schema)
+    def null_rate(col):
+        if statistics is not None and col in statistics['columns'] and statistics['num_rows']:
+            return statistics['columns'][col]['nulls'] / statistics['num_rows']
+        return column_null_rate(schema[col])
+
+    key_col_types = {col_type: [col for col in cols if null_rate(col) < max_key_null_rate]
+                     for col_type, cols in df_col_types.items()}
+    key_col_types = {col_type: cols for col_type, cols in key_col_types.items() if cols}
 
     logger.debug(f"df_col_types: {df_col_types}")
     '''
@@ -196,9 +679,9 @@ def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[st
     pivot = one index column, one groupable column and one numeric values column.
     '''
 
-    if 'numeric' in df_col_types:
+    if 'numeric' in key_col_types:
         # # assign_numeric option
-        numeric_col = select_rand_cols(df_col_types, 1, 'numeric')[0]
+        numeric_col = select_rand_cols(key_col_types, 1, 'numeric')[0]
         # random_scalar = np.random.randint(1, 100, 2)
         # new_col_name = f"{numeric_col}__{str(random_scalar[0])}x + {str(random_scalar[1])}"
         # ops_choices.append((assign_numeric,
@@ -207,10 +690,10 @@ def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[st
         #                      'new_col_name': new_col_name}
         #                     ))
 
-        if 'groupable' in df_col_types:
+        if 'groupable' in key_col_types:
             # groupby, pivots now possible
-            num_groups = min(np.random.randint(1, 3), len(df_col_types['groupable']))
-            group_cols = select_rand_cols(df_col_types, num_groups, 'groupable')
+            num_groups = min(np.random.randint(1, 3), len(key_col_types['groupable']))
+            group_cols = select_rand_cols(key_col_types, num_groups, 'groupable')
             func = select_rand_aggregate()
             ops_choices.append({'op': 'groupby',
                                 'args': {'group_columns': group_cols,
@@ -219,16 +702,16 @@ def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[st
                                 })
 
             # pivot selections
-            if len(df_col_types['groupable']) >= 2:
-                index, columns = select_rand_cols(df_col_types, 2, 'groupable')
+            if len(key_col_types['groupable']) >= 2:
+                index, columns = select_rand_cols(key_col_types, 2, 'groupable')
                 values = numeric_col
                 ops_choices.append({'op': 'pivot',
                                     'args': {'index_cols': [index], 'columns': [columns], 'value_col': [values],
-                                             'agg_func': select_rand_aggregate()}
+                                             'agg_func': select_rand_aggregate(pivot_agg_functions)}
                                     })
 
-    if 'joinable' in df_col_types:
-        on = select_rand_cols(df_col_types, 1, 'joinable')[0]
+    if 'joinable' in key_col_types:
+        on = select_rand_cols(key_col_types, 1, 'joinable')[0]
         ops_choices.append({'op': 'merge', 'args': {'key_col': on}})
 
     # if 'string' i df_col_types:
@@ -242,6 +725,23 @@ def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[st
         frac = get_rand_percentage()
         ops_choices.append({'op': 'sample', 'args': {'frac': frac}})
 
+    if statistics is not None and num_rows >= 10:
+        columns = [col for col in schema if col in statistics['columns'] and
+                   statistics['columns'][col]['nulls'] < num_rows]
+        np.random.shuffle(columns)
+        for col in columns:
+            condition = select_condition(col, statistics['columns'][col], num_rows,
+                                         selectivity if selectivity is not None else get_rand_percentage())
+            if condition is not None:
+                ops_choices.append({'op': 'select', 'args': {'condition': condition[0]}})
+                break
+        for col in columns:
+            values = fill_values(statistics['columns'][col])
+            if values is not None:
+                ops_choices.append({'op': 'fill', 'args': {'col_name': col, 'old_value': values[0],
+                                                           'new_value': values[1]}})
+                break
+
     if len(schema) > 2:
         num_drop = np.random.randint(1, len(schema)-1, 1)
         ops_choices.append({ 'op': 'project',
@@ -271,7 +771,9 @@ def generate_ops_choices(schema: Dict[str, str], num_rows: int, exclude: List[st
 
 
 def generate_workflow(workflow_class, name='wf', num_versions=10, base_shape=(10, 1000),
-                      out_directory='/tmp/dataset', bfactor=1.0, matfreq=1, wf_options={}, exclude_ops=[]):
+                      out_directory='/tmp/dataset', bfactor=1.0, matfreq=1, wf_options={}, exclude_ops=[],
+                      column_dist=None, star_schema=None, null_rate=None, schema_budget=None, selectivity=None,
+                      op_budget=None):
     """
     Generate a workflow for a given client and parameters
     :param workflow_class: Workflow class to be used (DataFrameWorkflow, ModinWorkflow, or SQLWorkflow)
@@ -283,10 +785,31 @@ def generate_workflow(workflow_class, name='wf', num_versions=10, base_shape=(10
     :param matfreq: Number of operations to perform before materialization (default 1)
     :param wf_options: Workflow class options as a dict (e.g. SQL string or Modin engine)
     :param exclude_ops: List of string operations to be avoided during generation.
+    :param column_dist: Cardinality and distribution options of the base artifact's key columns, see generate_schema
+    :param star_schema: Options of generate_star_schema, if given the base artifact is the fact table of a star schema
+                        and merges on a dimension key merge the dimension artifact (e.g. {'num_dimensions': 3})
+    :param null_rate: Fraction of null values of every column of the base artifact, see generate_schema
+    :param schema_budget: Budget options of the base artifact's schema (min_rows_per_sec, max_bytes_per_row and
+                          cost_table), see generate_schema
+    :param selectivity: Target fraction of rows kept by generated selects (default random)
+    :param op_budget: Size limits of the result of every operation, operations estimated to exceed them (e.g. pivots
+                      on high-cardinality columns) are not generated. Dict with (any of) max_rows, max_columns and
+                      max_bytes, see fuzzydata.core.estimator
     :return: Workflow object of desired type.
     """
+    from fuzzydata.core.estimator import estimate_op, estimated_size, within_budget
     wf = workflow_class(name=name, out_directory=out_directory, **wf_options)
-    wf.generate_base_artifact(num_cols=base_shape[0], num_rows=base_shape[1])
+    if op_budget:
+        wf.record_sizes = True  # Record the actual sizes of the results next to the estimates the budget checked
+    dimension_artifacts = {}
+    if star_schema is not None:
+        _, dimension_artifacts = wf.generate_star_artifacts(num_rows=base_shape[1], num_cols=base_shape[0],
+                                                            column_dist=column_dist, null_rate=null_rate,
+                                                            schema_budget=schema_budget, **star_schema)
+    else:
+        wf.generate_base_artifact(num_rows=base_shape[1],
+                                  column_maps=generate_schema(base_shape[0], column_dist=column_dist,
+                                                              null_rate=null_rate, **(schema_budget or {})))
 
     num_generated = len(wf.artifact_list)
     artifact_exclusions = []
@@ -309,22 +832,60 @@ def generate_workflow(workflow_class, name='wf', num_versions=10, base_shape=(10
                 if num_ops != ops_to_do-1:  # Do not pivot in the middle of an operation chain
                     exclude_ops.append('pivot')
 
+                # Statistics of the result of the ops chained so far (None after e.g. a groupby)
+                statistics = wf.current_statistics()
                 ops_choices = generate_ops_choices(schema=wf.current_operation.current_schema_map,
-                                                   num_rows=len(source_artifact), # TODO: potential num_rows bug
-                                                   exclude=exclude_ops)
+                                                   num_rows=statistics['num_rows'] if statistics is not None
+                                                   else len(source_artifact),
+                                                   exclude=exclude_ops, statistics=statistics,
+                                                   selectivity=selectivity,
+                                                   pivot_agg_functions=wf.current_operation.pivot_agg_functions)
+
+                if ops_choices and op_budget:
+                    current_table = wf.current_estimate()
+                    within = []
+                    for op in ops_choices:
+                        # Merges on a dimension key merge the dimension artifact, other merges a generated PK-FK table
+                        op_dimension = dimension_artifacts.get(op['args'].get('key_col'))
+                        right_table = wf.artifact_estimate(op_dimension) if op['op'] == 'merge' and \
+                            op_dimension is not None else None
+                        size = estimated_size(estimate_op(current_table, op['op'], op['args'], right_table=right_table))
+                        within.append(within_budget(size, op_budget))
+                    if not all(within):
+                        logger.info(f'Ops exceeding the budget: {[op for op, w in zip(ops_choices, within) if not w]}')
+                    ops_choices = [op for op, w in zip(ops_choices, within) if w]
 
                 if ops_choices:
                     logger.debug(f'Ops Choices: {ops_choices}')
                     selected_op = np.random.choice(ops_choices, 1)[0]
                     source_artifacts = [source_artifact]
                     # TODO: Handle Merge Op here - materialize/execute before adding right artifact
-                    if selected_op['op'] == 'merge':
+                    key_col = selected_op['args'].get('key_col')
+                    current_schema_map = wf.current_operation.current_schema_map
+                    dimension = dimension_artifacts.get(key_col)
+                    if selected_op['op'] == 'merge' and dimension is not None and \
+                            set(dimension.schema_map) - set(current_schema_map):
+                        # Merge back the dimension attributes that are no longer in the source (e.g. projected out)
+                        selected_op['args']['right_cols'] = [key_col] + [col for col in dimension.schema_map
+                                                                         if col not in current_schema_map]
+                        wf.current_operation.add_source_artifact(dimension)
+                        source_artifacts.append(dimension)
+                        force_materialize = True
+                    elif selected_op['op'] == 'merge':
                         if num_generated == num_versions - 1:
                             logger.warning('Attempting to do merge as last operation; doing another op')
+                            exclude_ops = exclude_ops + ['merge']  # Do not retry forever if merge is the only op
                             continue
-                        right_df, right_schema = generate_pkfk_join_table(source_table=source_artifact.to_df(),
-                                                                          source_schema=source_artifact.schema_map,
-                                                                          key_col=selected_op['args']['key_col'])
+                        key_stats = statistics['columns'].get(key_col) if statistics is not None else None
+                        if key_stats is not None and 'values' in key_stats:
+                            right_df, right_schema = generate_pkfk_join_table(None, source_artifact.schema_map,
+                                                                              key_col=key_col,
+                                                                              key_values=key_stats['values'])
+                        else:
+                            source_df = to_pandas(source_artifact.to_df())
+                            right_df, right_schema = generate_pkfk_join_table(source_table=source_df,
+                                                                              source_schema=source_artifact.schema_map,
+                                                                              key_col=key_col)
                         right_df_label = wf.generate_next_label()
                         right_artifact = wf.initialize_new_artifact(label=right_df_label,
                                                                     filename=f"{wf.artifact_dir}/{right_df_label}.csv",
@@ -339,6 +900,7 @@ def generate_workflow(workflow_class, name='wf', num_versions=10, base_shape=(10
                         logger.info(f"Chaining Operation: {selected_op['op']}")
                         wf.chain_to_current_operation([selected_op])
                         if force_materialize:
+                            num_ops += 1  # Count the merge, so that the chain is executed
                             break
                     except NotImplementedError as e:
                         logger.warning(f'Attempting an operation that is not implemented for this workflow type:'
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.history
+~~~~~~~~~~~~
+This module contains a persistent SQLite store of the performance records of workflow runs, and the comparison of
+the operation timings of two runs (or groups of runs) with permutation tests
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import logging
+import os
+import sqlite3
+import subprocess
+import time
+from contextlib import closing
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RUN_KEYS = ['name', 'fingerprint', 'client', 'scale', 'file_format', 'revision', 'host']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT, fingerprint TEXT, client TEXT, scale TEXT, file_format TEXT, revision TEXT, host TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    run_id INTEGER REFERENCES runs(run_id),
+    src TEXT, dst TEXT, op TEXT, elapsed_time REAL, rows REAL
+);
+CREATE INDEX IF NOT EXISTS records_run_id ON records(run_id);
+"""
+
+
+def git_revision() -> str:
+    """
+    Git revision of the fuzzydata source tree
+    :return: Commit hash of HEAD, or None if fuzzydata is not run from a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class HistoryStore:
+    """
+    SQLite store of the performance records of workflow runs. Every run is keyed by the fingerprint of its workflow,
+    its client, scale, file format, the git revision of fuzzydata and the host it ran on, so that timings are only
+    compared like for like.
+    """
+
+    def __init__(self, filename: str):
+        """
+        :param filename: SQLite database file, created if it does not exist
+        """
+        self.filename = filename
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.filename)
+
+    @staticmethod
+    def normalize_records(perf_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Records of a workflow performance table as stored in the history: operations are named by their op list and
+        sources are joined into a single string
+        :param perf_df: Performance table of a workflow, see Workflow.write_perf
+        :return: Dataframe with src, dst, op, elapsed_time and rows
+        """
+        def column(label):
+            return perf_df[label] if label in perf_df.columns else pd.Series(np.nan, index=perf_df.index)
+
+        op = column('op')
+        if 'op_list' in perf_df.columns:
+            op = op.where(op.notna(), perf_df['op_list'])
+        src = column('src').map(lambda s: '+'.join(s) if isinstance(s, tuple) else s)
+        return pd.DataFrame({'src': src.where(src.notna(), None).astype(object),
+                             'dst': column('dst').where(column('dst').notna(), None).astype(object),
+                             'op': op.where(op.notna(), None).astype(object),
+                             'elapsed_time': pd.to_numeric(column('elapsed_time'), errors='coerce'),
+                             'rows': pd.to_numeric(column('rows'), errors='coerce')}).reset_index(drop=True)
+
+    def append_run(self, run_info: Dict, perf_df: pd.DataFrame, run_id: int = None) -> int:
+        """
+        Append the performance records of a run
+        :param run_info: Dict with the run keys, see RUN_KEYS and Workflow.run_info
+        :param perf_df: Performance table of the run
+        :param run_id: Id of a run to replace the records of, e.g. when a workflow writes its performance table again.
+                       The keys of the run are kept and run_info is ignored.
+        :return: Id of the run
+        """
+        records = self.normalize_records(perf_df)
+        with closing(self._connect()) as connection, connection:
+            if run_id is None:
+                cursor = connection.execute(
+                    f"INSERT INTO runs ({', '.join(RUN_KEYS)}, created_at) "
+                    f"VALUES ({', '.join('?' * len(RUN_KEYS))}, ?)",
+                    [run_info.get(key) for key in RUN_KEYS] + [time.strftime('%Y-%m-%dT%H:%M:%S')])
+                run_id = cursor.lastrowid
+            else:
+                connection.execute('DELETE FROM records WHERE run_id = ?', (run_id,))
+            connection.executemany('INSERT INTO records (run_id, src, dst, op, elapsed_time, rows) '
+                                   'VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(run_id, r.src, r.dst, r.op,
+                                     None if pd.isna(r.elapsed_time) else float(r.elapsed_time),
+                                     None if pd.isna(r.rows) else float(r.rows))
+                                    for r in records.itertuples(index=False)])
+        logger.info(f'Appended {len(records.index)} performance records as run {run_id} to {self.filename}')
+        return run_id
+
+    def runs(self, selector: str = None) -> pd.DataFrame:
+        """
+        Select runs from the history
+        :param selector: Comma-separated run ids (e.g. "3,4") or key=value filters on the run keys which must all
+                         match (e.g. "client=pandas,revision=1a2b3c"), revisions match by prefix. Default all runs.
+        :return: Dataframe of the selected runs, ordered by run id
+        """
+        run_ids, clauses, params = [], [], []
+        for term in [t.strip() for t in (selector or '').split(',') if t.strip()]:
+            key, sep, value = term.partition('=')
+            if term.isdigit():
+                run_ids.append(int(term))
+            elif not sep or key not in RUN_KEYS:
+                raise ValueError(f'Invalid run selector {term}, expected a run id or key=value with a key in '
+                                 f'{RUN_KEYS}')
+            elif key == 'revision':
+                clauses.append('revision LIKE ?')
+                params.append(f'{value}%')
+            else:
+                clauses.append(f'{key} = ?')
+                params.append(value)
+        if run_ids:
+            clauses.insert(0, f"run_id IN ({', '.join('?' * len(run_ids))})")
+            params = run_ids + params
+        query = 'SELECT * FROM runs' + (f" WHERE {' AND '.join(clauses)}" if clauses else '') + ' ORDER BY run_id'
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(query, connection, params=params)
+
+    def records(self, run_ids: List[int]) -> pd.DataFrame:
+        """
+        Performance records of runs
+        :param run_ids: Ids of the runs
+        :return: Dataframe with run_id, src, dst, op, elapsed_time and rows
+        """
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(f"SELECT * FROM records WHERE run_id IN ({', '.join('?' * len(run_ids))})",
+                                     connection, params=[int(run_id) for run_id in run_ids])
+
+
+def permutation_test(a, b, num_permutations: int = 10000, seed: int = 0) -> float:
+    """
+    Two-sided permutation test of the difference of the medians of two samples
+    :param a: First sample
+    :param b: Second sample
+    :param num_permutations: Number of random permutations
+    :param seed: Seed of the permutations
+    :return: p-value, the probability of a difference of medians at least as large as the observed one if both
+             samples come from the same distribution
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if len(a) == 0 or len(b) == 0:
+        return np.nan
+    observed = abs(np.median(a) - np.median(b))
+    pooled = np.concatenate([a, b])
+    rng = np.random.default_rng(seed)
+    extreme = 0
+    # Permute in batches, so that the permutation matrix stays small for large samples
+    batch_size = max(1, min(num_permutations, 2**22 // len(pooled)))
+    for start in range(0, num_permutations, batch_size):
+        permuted = rng.permuted(np.tile(pooled, (min(batch_size, num_permutations - start), 1)), axis=1)
+        differences = np.abs(np.median(permuted[:, :len(a)], axis=1) - np.median(permuted[:, len(a):], axis=1))
+        extreme += np.count_nonzero(differences >= observed - 1e-12)
+    return (extreme + 1) / (num_permutations + 1)
+
+
+def compare_runs(baseline: pd.DataFrame, candidate: pd.DataFrame, by: str = 'dst', alpha: float = 0.05,
+                 threshold: float = 0.05, num_permutations: int = 10000, seed: int = 0) -> pd.DataFrame:
+    """
+    Compare the operation timings of a candidate and a baseline run (or group of runs)
+    :param baseline: Performance records of the baseline runs, see HistoryStore.records
+    :param candidate: Performance records of the candidate runs
+    :param by: Group the records by 'dst' (every operation of the workflow, samples are the repeated runs) or 'op'
+               (every kind of operation, samples are all operations of that kind)
+    :param alpha: Significance level of the permutation tests
+    :param threshold: Minimum relative change of the median time to report a speedup or regression
+    :param num_permutations: Number of permutations of each test
+    :param seed: Seed of the permutations
+    :return: Dataframe with one row per group: the number of samples and median times of both sides, speedup
+             (baseline / candidate median), p_value and status (faster, slower or unchanged)
+    """
+    if by not in ('dst', 'op'):
+        raise ValueError(f'Cannot compare runs by {by}, expected dst or op')
+    baseline = baseline.dropna(subset=[by, 'elapsed_time'])
+    candidate = candidate.dropna(subset=[by, 'elapsed_time'])
+    baseline_groups = baseline.groupby(by)['elapsed_time']
+    candidate_groups = candidate.groupby(by)['elapsed_time']
+    rows = []
+    for key in sorted(set(baseline_groups.groups) & set(candidate_groups.groups)):
+        a, b = baseline_groups.get_group(key).values, candidate_groups.get_group(key).values
+        baseline_median, candidate_median = np.median(a), np.median(b)
+        speedup = baseline_median / candidate_median if candidate_median > 0 else np.inf
+        p_value = permutation_test(a, b, num_permutations=num_permutations, seed=seed)
+        status = 'unchanged'
+        if p_value <= alpha and abs(speedup - 1) > threshold:
+            status = 'faster' if speedup > 1 else 'slower'
+        rows.append({by: key, 'baseline_n': len(a), 'candidate_n': len(b), 'baseline_median': baseline_median,
+                     'candidate_median': candidate_median, 'speedup': speedup, 'p_value': p_value, 'status': status})
+    missing = set(baseline_groups.groups) ^ set(candidate_groups.groups)
+    if missing:
+        logger.warning(f'{len(missing)} groups only appear in one side of the comparison and are skipped')
+    return pd.DataFrame(rows, columns=[by, 'baseline_n', 'candidate_n', 'baseline_median', 'candidate_median',
+                                       'speedup', 'p_value', 'status'])
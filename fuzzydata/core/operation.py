@@ -8,25 +8,44 @@ This module contains the abstract implementation of an operation in fuzzydata
 :license: MIT, see LICENSE for more details.
 """
 
+import ast
 import logging
 import time
 from abc import ABC, abstractmethod
 from typing import List, TypeVar, Generic, Dict
 
 from fuzzydata.core.artifact import Artifact
+from fuzzydata.core.plan import PlanNode, build_plan, optimize, to_op_list
 
 T = TypeVar('T')
 
 logger = logging.getLogger(__name__)
 
 
+def sql_literal(value) -> str:
+    """ Render an op argument (a python value or a python literal string such as '"Visa"') as a SQL literal """
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+    if isinstance(value, str):
+        escaped = value.replace("'", "''")
+        return f"'{escaped}'"
+    return str(value)
+
+
 class Operation(Generic[T], ABC):
+    # Aggregate functions supported by the pivot of this client, the generator only generates pivots with these
+    pivot_agg_functions = ['min', 'max', 'sum', 'mean', 'count']
 
-    def __init__(self, sources: List[Artifact]):
+    def __init__(self, sources: List[Artifact], optimize_plan: bool = False):
         """Initialize a new operation with a list of source artifacts
         :param sources: List of source artifacts for this operation.
+        :param optimize_plan: Compile the optimized logical plan of the chained operations before execution.
         """
         self.sources = sources
+        self.optimize_plan = optimize_plan
         self.new_label = None
         self.dest_schema_map = None
 
@@ -39,6 +58,8 @@ class Operation(Generic[T], ABC):
         self.current_schema_map = self.sources[0].schema_map
         self.num_operations = 0
         self.op_list = []  # List[Dict] of op names and args to chain together.
+        self.unoptimized_code = None  # Code generated without plan optimization, kept for A/B comparisons
+        self.plan_op_list = None  # Optimized op list the code was generated from, if different from op_list
 
     def add_source_artifact(self, s_artifact: Artifact) -> None:
         """Add a source artifact to this operation. """
@@ -61,7 +82,8 @@ class Operation(Generic[T], ABC):
         :param b: offset
         :return:
         """
-        self.current_schema_map = self.current_schema_map
+        # Copy before adding the column, the map may still be the source artifact's schema map
+        self.current_schema_map = dict(self.current_schema_map)
         self.current_schema_map[f"{numeric_col}__{a}x_{b}"] = self.current_schema_map[numeric_col]
         pass
 
@@ -99,13 +121,17 @@ class Operation(Generic[T], ABC):
         pass
 
     @abstractmethod
-    def merge(self, key_col: List[str]) -> T:
+    def merge(self, key_col: List[str], right_cols: List[str] = None) -> T:
         """
         Merge the source artifacts defined in this operation on key_column
         :param key_col: The common column to be used for the merge.
+        :param right_cols: (optional) Columns of the right artifact to be merged, including key_col (default all)
         :return:
         """
-        self.current_schema_map = {**self.current_schema_map, **self.sources[1].schema_map}
+        right_schema_map = self.sources[1].schema_map
+        if right_cols is not None:
+            right_schema_map = dict(filter(lambda x: x[0] in right_cols, right_schema_map.items()))
+        self.current_schema_map = {**self.current_schema_map, **right_schema_map}
         pass
 
     @abstractmethod
@@ -159,6 +185,28 @@ class Operation(Generic[T], ABC):
         """
         self.new_label = new_label
 
+    def build_plan(self) -> PlanNode:
+        """ Build the logical plan of the operations chained so far """
+        return build_plan(self.op_list, [s.schema_map for s in self.sources])
+
+    def compile_optimized_plan(self) -> None:
+        """
+        Optimize the logical plan of the chained operations and regenerate the code from it, using a fresh instance
+        of this client's operation class as the backend. The recorded op_list is left untouched for replay, and the
+        code generated from the unoptimized plan is kept in unoptimized_code.
+        """
+        optimized_op_list = to_op_list(optimize(self.build_plan()))
+        if optimized_op_list == self.op_list:
+            return
+        logger.debug(f'Optimized op list: {optimized_op_list}')
+        backend = self.__class__(sources=list(self.sources), artifact_class=self.artifact_class)
+        for op_dict in optimized_op_list:
+            backend.chain_operation(op_dict['op'], op_dict['args'])
+        self.unoptimized_code = self.code
+        self.plan_op_list = optimized_op_list
+        self.code = backend.code
+        self.current_schema_map = backend.current_schema_map
+
     def execute(self, new_label) -> T:
         """
         Execute all stacked/chained operations and generate a new artifact with label "new_label"
@@ -166,7 +214,10 @@ class Operation(Generic[T], ABC):
         :param new_label: The new label of the artifact to be produced.
         :return: The new artifact that is produced.
         """
-        logger.debug(f"Before Op: {self.sources[0].to_df().columns}")
+        if self.optimize_plan:
+            self.compile_optimized_plan()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Before Op: {self.sources[0].to_df().columns}")
         logger.debug(f"Operation Code: {self.code}")
         self.start_time = time.perf_counter()
         result = self.materialize(new_label)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.plan
+~~~~~~~~~~~~
+This module contains a client-neutral logical plan representation of an operation chain and the rewrite rules
+used to optimize it before a client compiles it into code.
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PlanNode:
+    """
+    A single node in a logical plan: an op name, its args and the child plans it consumes.
+    Leaf nodes are "scan" nodes that read the source artifact at position args['source'] of the operation.
+    """
+    def __init__(self, op: str, args: Dict = None, children: List['PlanNode'] = None, columns: List[str] = None):
+        """
+        :param op: Name of the operation (as used in op_list dicts) or "scan" for a source artifact
+        :param args: Arguments of the operation
+        :param children: Input plans, the first child is always the chained (left) input
+        :param columns: Output column labels of this node, None if they cannot be determined statically
+        """
+        self.op = op
+        self.args = dict(args) if args else {}
+        self.children = children if children else []
+        self.columns = columns
+
+    @property
+    def child(self) -> 'PlanNode':
+        return self.children[0]
+
+    def __eq__(self, other):
+        return isinstance(other, PlanNode) and (self.op, self.args, self.children) == \
+               (other.op, other.args, other.children)
+
+    def __repr__(self):
+        if self.op == 'scan':
+            return f"scan({self.args['source']})"
+        return f"{self.op}({', '.join(repr(c) for c in self.children)})"
+
+
+def scan(source: int, schema_map: Dict[str, str]) -> PlanNode:
+    return PlanNode('scan', {'source': source}, columns=list(schema_map.keys()) if schema_map is not None else None)
+
+
+def project(child: PlanNode, output_cols: List[str]) -> PlanNode:
+    return PlanNode('project', {'output_cols': list(output_cols)}, [child], columns=list(output_cols))
+
+
+def _output_columns(op: str, args: Dict, children: List[PlanNode]) -> Optional[List[str]]:
+    """ Derive the output columns of an op from its inputs, mirroring the schema evolution in Operation """
+    columns = children[0].columns
+    if op == 'project':
+        return list(args['output_cols'])
+    if op == 'groupby':
+        return list(args['group_columns']) + list(args['agg_columns'])
+    if op == 'pivot' or columns is None:
+        return None
+    if op == 'apply':
+        return columns + [f"{args['numeric_col']}__{args['a']}x_{args['b']}"]
+    if op == 'merge':
+        right_columns = children[1].columns
+        if right_columns is None:
+            return None
+        return columns + [c for c in right_columns if c not in columns]
+    return list(columns)
+
+
+def build_plan(op_list: List[Dict], source_schemas: List[Dict[str, str]]) -> PlanNode:
+    """
+    Build a logical plan from a chained op list
+    :param op_list: List of {op, args} dicts as chained onto an Operation
+    :param source_schemas: Schema maps of the source artifacts of the operation, in order
+    :return: Root node of the logical plan
+    """
+    node = scan(0, source_schemas[0])
+    for op_dict in op_list:
+        op, args = op_dict['op'], dict(op_dict['args'])
+        children = [node]
+        if op == 'merge':
+            right = scan(1, source_schemas[1])
+            right_cols = args.pop('right_cols', None)
+            if right_cols is not None:
+                right = project(right, right_cols)
+            children.append(right)
+        node = PlanNode(op, args, children, columns=_output_columns(op, args, children))
+    return node
+
+
+def to_op_list(plan: PlanNode) -> List[Dict]:
+    """
+    Linearize a logical plan back into an op list that any client can chain. Projections on the right input of a
+    merge are expressed through the 'right_cols' argument of the merge.
+    :param plan: Root node of the logical plan
+    :return: List of {op, args} dicts
+    """
+    if plan.op == 'scan':
+        return []
+    op_list = to_op_list(plan.child)
+    args = dict(plan.args)
+    if plan.op == 'merge' and plan.children[1].op == 'project':
+        args['right_cols'] = plan.children[1].args['output_cols']
+    return op_list + [{'op': plan.op, 'args': args}]
+
+
+def remove_redundant_project(node: PlanNode) -> Optional[PlanNode]:
+    """ project(x) -> x when the projection keeps all columns of x in order """
+    if node.op == 'project' and node.child.columns == node.columns:
+        return node.child
+    return None
+
+
+def fuse_projects(node: PlanNode) -> Optional[PlanNode]:
+    """ project(project(x)) -> project(x) """
+    if node.op == 'project' and node.child.op == 'project':
+        return project(node.child.child, node.args['output_cols'])
+    return None
+
+
+def push_project_below_sample(node: PlanNode) -> Optional[PlanNode]:
+    """ project(sample(x)) -> sample(project(x)) """
+    if node.op == 'project' and node.child.op == 'sample':
+        sample = node.child
+        return PlanNode('sample', sample.args, [project(sample.child, node.args['output_cols'])],
+                        columns=node.columns)
+    return None
+
+
+def push_project_below_merge(node: PlanNode) -> Optional[PlanNode]:
+    """ project(merge(l, r)) -> project(merge(project(l), project(r))), keeping the key column on both sides """
+    if node.op != 'project' or node.child.op != 'merge':
+        return None
+    merge = node.child
+    left, right = merge.children
+    if left.columns is None or right.columns is None:
+        return None
+    key_col = merge.args['key_col']
+    output_cols = node.args['output_cols']
+    left_cols = [c for c in left.columns if c in output_cols or c == key_col]
+    right_cols = [c for c in right.columns if (c in output_cols and c not in left.columns) or c == key_col]
+    if left_cols == left.columns and right_cols == right.columns:
+        return None
+    new_left = project(left, left_cols) if left_cols != left.columns else left
+    new_right = project(right, right_cols) if right_cols != right.columns else right
+    new_merge = PlanNode('merge', merge.args, [new_left, new_right],
+                         columns=_output_columns('merge', merge.args, [new_left, new_right]))
+    return project(new_merge, output_cols)
+
+
+def prune_columns_before_groupby(node: PlanNode) -> Optional[PlanNode]:
+    """ groupby(sample(x)) -> groupby(sample(project(x))), dropping columns the groupby never reads """
+    if node.op != 'groupby' or node.child.op != 'sample' or node.child.columns is None:
+        return None
+    used_cols = list(node.args['group_columns']) + list(node.args['agg_columns'])
+    if set(node.child.columns) <= set(used_cols):
+        return None
+    sample = node.child
+    pruned = PlanNode('sample', sample.args, [project(sample.child, used_cols)], columns=used_cols)
+    return PlanNode('groupby', node.args, [pruned], columns=node.columns)
+
+
+default_rules = [
+    remove_redundant_project,
+    fuse_projects,
+    push_project_below_sample,
+    push_project_below_merge,
+    prune_columns_before_groupby,
+]
+
+
+def _rewrite(node: PlanNode, rules: List[Callable]) -> PlanNode:
+    """ Apply the first matching rule at this node, then rewrite its children """
+    for rule in rules:
+        new_node = rule(node)
+        if new_node is not None:
+            logger.debug(f'Rewrite {rule.__name__}: {node} => {new_node}')
+            node = new_node
+            break
+    return PlanNode(node.op, node.args, [_rewrite(c, rules) for c in node.children], columns=node.columns)
+
+
+def optimize(plan: PlanNode, rules: List[Callable] = None, max_passes: int = 10) -> PlanNode:
+    """
+    Rewrite a logical plan until none of the rules apply anymore
+    :param plan: Root node of the logical plan
+    :param rules: List of rewrite rules (default_rules if not specified)
+    :param max_passes: Upper bound on the number of rewrite passes
+    :return: Optimized logical plan
+    """
+    if rules is None:
+        rules = default_rules
+    for _ in range(max_passes):
+        new_plan = _rewrite(plan, rules)
+        if new_plan == plan:
+            break
+        plan = new_plan
+    return plan
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.profiler
+~~~~~~~~~~~~
+This module measures the generation cost of faker providers, for throughput or size budgeted schemas
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import json
+import logging
+import time
+from typing import Dict, List
+
+from fuzzydata.core.generator import _faker_cols
+
+logger = logging.getLogger(__name__)
+
+
+def profile_provider(faker, provider: str, num_samples: int = 1000) -> Dict[str, float]:
+    """
+    Measure the generation cost of a single faker provider
+    :param faker: Faker instance
+    :param provider: Faker provider name
+    :param num_samples: Number of values to generate
+    :return: Dict with rows_per_sec (values generated per second) and bytes_per_row (mean length of the values
+             as written to CSV)
+    """
+    start_time = time.perf_counter()
+    values = [faker.format(provider) for _ in range(num_samples)]
+    elapsed_time = time.perf_counter() - start_time
+    return {
+        'rows_per_sec': num_samples / max(elapsed_time, 1e-9),
+        'bytes_per_row': sum(len(str(value).encode('utf-8')) for value in values) / num_samples
+    }
+
+
+def profile_providers(providers: List[str] = None, num_samples: int = 1000, seed: int = None) -> Dict[str, Dict]:
+    """
+    Measure the generation cost of faker providers, see profile_provider
+    :param providers: Faker providers to profile (default all providers of the column type configs)
+    :param num_samples: Number of values to generate per provider
+    :param seed: Seed for the faker instance (optional)
+    :return: Cost table as a Dict of provider -> {rows_per_sec, bytes_per_row}
+    """
+    from faker import Faker
+    faker = Faker()
+    if seed is not None:
+        faker.seed_instance(seed)
+
+    cost_table = {}
+    for provider in sorted(providers or _faker_cols):
+        cost_table[provider] = profile_provider(faker, provider, num_samples=num_samples)
+        logger.debug(f'Provider {provider}: {cost_table[provider]}')
+    return cost_table
+
+
+def write_cost_table(cost_table: Dict[str, Dict], filename: str) -> None:
+    """
+    Write a cost table as JSON, in the format read by load_cost_table
+    :param cost_table: Dict of provider -> {rows_per_sec, bytes_per_row}
+    :param filename: JSON file to be written
+    :return: None
+    """
+    with open(filename, 'w') as outfile:
+        outfile.write(json.dumps({provider: {measure: round(value, 1) for measure, value in costs.items()}
+                                  for provider, costs in sorted(cost_table.items())}, indent=2))
@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.statistics
+~~~~~~~~~~~~
+This module contains per-artifact column statistics: their computation, their propagation through operations and
+their use for data-aware operation arguments such as selection predicates with a target selectivity
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import ast
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_numeric_dtype
+
+logger = logging.getLogger(__name__)
+
+QUANTILE_POINTS = np.linspace(0.0, 1.0, 21)
+_SKETCH_SIZE = 10000  # Quantile samples of non-numeric (and chunked) columns and distinct count sketches size
+_UNSAFE_CHARACTERS = re.compile(r"['\"\\\n\r`]")
+_CONDITION_PATTERN = re.compile(r"^`(?P<col>[^`]+)` (?P<cmp><=|==|in) (?P<value>.+)$")
+
+
+def _python_value(value):
+    """ Convert numpy scalars to python values, so that statistics can be rendered as literals and JSON """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def compute_statistics(df: pd.DataFrame, key_columns: Iterable[str] = (), top_k: int = 10,
+                       seed: int = 0) -> Dict:
+    """
+    Compute the statistics of a table in one vectorized pass per column: a hash count of its values gives the
+    distinct and null counts and the top-k values, and numeric columns get exact quantiles. Quantiles of string
+    columns are sketched from a sample of their values.
+    :param df: pandas Dataframe
+    :param key_columns: Columns whose distinct values are kept as well, e.g. merge keys (optional)
+    :param top_k: Number of most frequent values to keep per column (default 10)
+    :param seed: Seed of the quantile sketch samples (default 0)
+    :return: Dict with 'num_rows' and a 'columns' dict of column_label: {distinct, nulls, min, max, quantiles, top_k}
+             and 'values' for the key columns. quantiles are the values at QUANTILE_POINTS, or None for unordered
+             columns, top_k is a list of (value, count) pairs in decreasing count order.
+    """
+    rng = np.random.default_rng(seed)
+    num_rows = len(df.index)
+    key_columns = set(key_columns)
+    columns = {}
+    for col, series in df.items():
+        counts = series.value_counts(dropna=True)
+        column_stats = {
+            'distinct': len(counts.index),
+            'nulls': num_rows - int(counts.sum()),
+            'min': None,
+            'max': None,
+            'quantiles': None,
+            'top_k': [(_python_value(value), int(count)) for value, count in counts.head(top_k).items()]
+        }
+        non_null = series.dropna()
+        if len(non_null.index) and is_numeric_dtype(series.dtype) and not is_bool_dtype(series.dtype):
+            column_stats['quantiles'] = [float(q) for q in non_null.quantile(QUANTILE_POINTS)]
+        elif len(non_null.index) and infer_dtype(series, skipna=True) == 'string' and \
+                not isinstance(series.dtype, pd.CategoricalDtype):
+            sketch = non_null.to_numpy()
+            if len(sketch) > _SKETCH_SIZE:
+                sketch = rng.choice(sketch, size=_SKETCH_SIZE, replace=False)
+            sketch = np.sort(sketch)
+            column_stats['quantiles'] = sketch[np.round(QUANTILE_POINTS * (len(sketch) - 1)).astype(int)].tolist()
+        if column_stats['quantiles'] is not None:
+            column_stats['min'], column_stats['max'] = column_stats['quantiles'][0], column_stats['quantiles'][-1]
+        if col in key_columns:
+            column_stats['values'] = counts.index.to_numpy()
+        columns[col] = column_stats
+    return {'num_rows': num_rows, 'columns': columns}
+
+
+def _column_kind(series: pd.Series) -> Optional[str]:
+    """ 'numeric' or 'string' for columns with quantiles (see compute_statistics), None for unordered columns """
+    if is_numeric_dtype(series.dtype) and not is_bool_dtype(series.dtype):
+        return 'numeric'
+    if not isinstance(series.dtype, pd.CategoricalDtype) and infer_dtype(series, skipna=True) == 'string':
+        return 'string'
+    return None
+
+
+def partial_statistics(df: pd.DataFrame, key_columns: Iterable[str] = (), seed: int = 0) -> Dict:
+    """
+    Mergeable summary of the statistics of one chunk or partition of a table, so that the statistics of tables that
+    do not fit in memory can be computed chunk by chunk or on the workers of a distributed engine. Every column keeps
+    its null count, its exact min and max, the smallest _SKETCH_SIZE hashes of its values (a KMV sketch of the
+    distinct count), a bottom-k sample of its values for the quantiles and the counts of its most frequent values.
+    Key columns keep the counts of all of their values.
+    :param df: pandas Dataframe of the chunk
+    :param key_columns: Columns whose distinct values are kept as well, e.g. merge keys (optional)
+    :param seed: Seed of the value sample, use a different seed for every chunk (default 0)
+    :return: Partial statistics, see combine_statistics and finalize_statistics
+    """
+    rng = np.random.default_rng(seed)
+    key_columns = set(key_columns)
+    columns = {}
+    for col, series in df.items():
+        non_null = series.dropna()
+        kind = _column_kind(series) if len(non_null.index) else None
+        values = non_null.to_numpy(dtype='float64') if kind == 'numeric' else non_null.to_numpy(dtype=object)
+        counts = non_null.value_counts()
+        counts = counts[counts > 0]  # Categoricals count their unobserved categories as well
+        counts.index = counts.index.astype(object)
+        priorities = rng.random(len(values)) if kind is not None else np.empty(0)
+        keep = np.argsort(priorities)[:_SKETCH_SIZE]
+        columns[col] = {
+            'nulls': len(series.index) - len(non_null.index),
+            'kind': kind,
+            'min': values.min() if kind is not None else None,
+            'max': values.max() if kind is not None else None,
+            'hashes': np.unique(pd.util.hash_array(values))[:_SKETCH_SIZE],
+            'sample': values[keep] if kind is not None else values[:0],
+            'priorities': priorities[keep],
+            'counts': counts if col in key_columns else counts.head(_SKETCH_SIZE),
+            'key': col in key_columns
+        }
+    return {'num_rows': len(df.index), 'columns': columns}
+
+
+def combine_statistics(left: Optional[Dict], right: Dict) -> Dict:
+    """
+    Combine the partial statistics of two chunks of a table, see partial_statistics
+    :param left: Partial statistics of the first chunk(s), or None
+    :param right: Partial statistics of the next chunk
+    :return: Partial statistics of both
+    """
+    if left is None:
+        return right
+    columns = {}
+    for col in list(left['columns']) + [c for c in right['columns'] if c not in left['columns']]:
+        a, b = left['columns'].get(col), right['columns'].get(col)
+        if a is None or b is None:
+            columns[col] = a if b is None else b
+            continue
+        kind = a['kind'] if b['kind'] is None or a['kind'] == b['kind'] else b['kind'] if a['kind'] is None else None
+        ordered = [p for p in (a, b) if p['kind'] is not None]
+        priorities = np.concatenate([a['priorities'], b['priorities']])
+        keep = np.argsort(priorities)[:_SKETCH_SIZE]
+        counts = a['counts'].add(b['counts'], fill_value=0).astype(int).sort_values(ascending=False, kind='stable')
+        columns[col] = {
+            'nulls': a['nulls'] + b['nulls'],
+            'kind': kind,
+            'min': min(p['min'] for p in ordered) if kind is not None else None,
+            'max': max(p['max'] for p in ordered) if kind is not None else None,
+            'hashes': np.union1d(a['hashes'], b['hashes'])[:_SKETCH_SIZE],
+            'sample': np.concatenate([a['sample'], b['sample']])[keep] if kind is not None else a['sample'][:0],
+            'priorities': priorities[keep] if kind is not None else priorities[:0],
+            'counts': counts if a['key'] else counts.head(_SKETCH_SIZE),
+            'key': a['key']
+        }
+    return {'num_rows': left['num_rows'] + right['num_rows'], 'columns': columns}
+
+
+def finalize_statistics(partial: Dict, top_k: int = 10) -> Dict:
+    """
+    Statistics of a table from the combined partial statistics of its chunks, in the format of compute_statistics.
+    Distinct counts beyond _SKETCH_SIZE are estimated from the hash sketch, quantiles from the value sample and the
+    top-k values from the most frequent values of every chunk.
+    :param partial: Partial statistics of all chunks of the table, see combine_statistics
+    :param top_k: Number of most frequent values to keep per column (default 10)
+    :return: Statistics dict, see compute_statistics
+    """
+    columns = {}
+    for col, p in partial['columns'].items():
+        hashes = p['hashes']
+        distinct = len(hashes)
+        if distinct >= _SKETCH_SIZE:
+            distinct = max(distinct, int(round((_SKETCH_SIZE - 1) * 2.0 ** 64 / (float(hashes[-1]) + 1))))
+        column_stats = {
+            'distinct': distinct,
+            'nulls': int(p['nulls']),
+            'min': None,
+            'max': None,
+            'quantiles': None,
+            'top_k': [(_python_value(value), int(count)) for value, count in p['counts'].head(top_k).items()]
+        }
+        if p['kind'] == 'numeric':
+            column_stats['quantiles'] = [float(q) for q in np.quantile(p['sample'].astype(float), QUANTILE_POINTS)]
+        elif p['kind'] == 'string':
+            sketch = np.sort(p['sample'])
+            column_stats['quantiles'] = sketch[np.round(QUANTILE_POINTS * (len(sketch) - 1)).astype(int)].tolist()
+        if column_stats['quantiles'] is not None:
+            column_stats['quantiles'][0], column_stats['quantiles'][-1] = _python_value(p['min']), \
+                _python_value(p['max'])
+            column_stats['min'], column_stats['max'] = column_stats['quantiles'][0], column_stats['quantiles'][-1]
+        if p['key']:
+            column_stats['values'] = p['counts'].index.to_numpy()
+        columns[col] = column_stats
+    return {'num_rows': partial['num_rows'], 'columns': columns}
+
+
+def compute_chunk_statistics(chunks: Iterable[pd.DataFrame], key_columns: Iterable[str] = (), top_k: int = 10,
+                             seed: int = 0) -> Dict:
+    """
+    Compute the statistics of a table chunk by chunk, holding only one chunk and the partial statistics in memory
+    :param chunks: Iterable of the pandas Dataframe chunks of the table
+    :param key_columns: Columns whose distinct values are kept as well, e.g. merge keys (optional)
+    :param top_k: Number of most frequent values to keep per column (default 10)
+    :param seed: Seed of the value samples (default 0)
+    :return: Statistics dict, see compute_statistics
+    """
+    key_columns = list(key_columns)
+    partial = None
+    for ix, chunk in enumerate(chunks):
+        partial = combine_statistics(partial, partial_statistics(chunk, key_columns=key_columns, seed=seed + ix))
+    if partial is None:
+        return {'num_rows': 0, 'columns': {}}
+    return finalize_statistics(partial, top_k=top_k)
+
+
+def _scale(column_stats: Dict, num_rows: int, fraction: float) -> Dict:
+    """ Expected statistics of a column after keeping a random fraction of its num_rows rows """
+    fraction = min(1.0, max(0.0, fraction))  # Estimates from rounded counts can be slightly off
+    mean_count = (num_rows - column_stats['nulls']) / max(1, column_stats['distinct'])
+    column_stats = dict(column_stats)
+    column_stats['nulls'] = int(round(column_stats['nulls'] * fraction))
+    column_stats['top_k'] = [(value, int(round(count * fraction))) for value, count in column_stats['top_k']
+                             if round(count * fraction) >= 1]
+    # A value occurring mean_count times is kept with probability 1 - (1 - fraction)^mean_count
+    column_stats['distinct'] = max(len(column_stats['top_k']),
+                                   int(round(column_stats['distinct'] * (1 - (1 - fraction) ** mean_count))))
+    return column_stats
+
+
+def parse_condition(condition: str) -> Optional[Tuple[str, str, List]]:
+    """
+    Parse a selection predicate generated by select_condition
+    :return: Tuple of (column, comparison, values) or None for other predicates, == is returned as in
+    """
+    match = _CONDITION_PATTERN.match(condition)
+    if not match:
+        return None
+    try:
+        value = ast.literal_eval(match.group('value'))
+    except (ValueError, SyntaxError):
+        return None
+    values = list(value) if isinstance(value, tuple) else [value]
+    return match.group('col'), 'in' if match.group('cmp') == '==' else match.group('cmp'), values
+
+
+def estimate_selectivity(column_stats: Dict, num_rows: int, comparison: str, values: List) -> Optional[float]:
+    """
+    Estimate the fraction of rows satisfying `column` <= values[0] or `column` in values from column statistics
+    """
+    if not num_rows:
+        return 0.0
+    estimate = _estimate_selectivity(column_stats, num_rows, comparison, values)
+    return min(1.0, estimate) if estimate is not None else None
+
+
+def _estimate_selectivity(column_stats: Dict, num_rows: int, comparison: str, values: List) -> Optional[float]:
+    non_null = num_rows - column_stats['nulls']
+    top_k_counts = dict(column_stats['top_k'])
+    complete = sum(top_k_counts.values()) >= non_null  # All values of the column are in the top k
+    if comparison == 'in':
+        if complete:
+            return sum(top_k_counts.get(value, 0) for value in values) / num_rows
+        remainder = (non_null - sum(top_k_counts.values())) / max(1, column_stats['distinct'] - len(top_k_counts))
+        return sum(top_k_counts.get(value, remainder) for value in values) / num_rows
+    if complete:
+        try:
+            return sum(count for value, count in top_k_counts.items() if value <= values[0]) / num_rows
+        except TypeError:
+            return None
+    quantiles = column_stats['quantiles']
+    if quantiles is None:
+        return None
+    try:
+        position = np.searchsorted(quantiles, values[0], side='right')
+    except TypeError:
+        return None
+    return (QUANTILE_POINTS[position - 1] if position else 0.0) * non_null / num_rows
+
+
+def _literal(value) -> Optional[str]:
+    """ Python literal of a value, if it can be used in the conditions of every client """
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (int, float)) and np.isfinite(value):
+        return repr(value)
+    if isinstance(value, str) and not _UNSAFE_CHARACTERS.search(value):
+        return repr(value)
+    return None
+
+
+def select_condition(column: str, column_stats: Dict, num_rows: int,
+                     selectivity: float) -> Optional[Tuple[str, float]]:
+    """
+    Generate a selection predicate on column that keeps about a selectivity fraction of the rows: `column` in (...)
+    over the most frequent values when they cover the column, or `column` <= value at the matching quantile
+    :param column: Column label
+    :param column_stats: Statistics of the column, see compute_statistics
+    :param num_rows: Number of rows of the table
+    :param selectivity: Target fraction of rows to keep
+    :return: Tuple of (condition, estimated selectivity), or None if the column does not support such a predicate
+    """
+    non_null = num_rows - column_stats['nulls']
+    if not non_null:
+        return None
+    target = selectivity * num_rows
+    top_k = [(value, count) for value, count in column_stats['top_k'] if _literal(value) is not None]
+    if top_k and sum(count for _, count in top_k) >= non_null:
+        # Grow the set of values (least frequent first) while it gets closer to the target
+        chosen, covered = [], 0
+        for value, count in sorted(top_k, key=lambda x: x[1]):
+            if abs(covered + count - target) > abs(covered - target) and chosen:
+                continue
+            chosen.append(value)
+            covered += count
+        if len(chosen) == 1:  # A parenthesized single value is not a tuple in pandas query
+            return f"`{column}` == {_literal(chosen[0])}", covered / num_rows
+        return f"`{column}` in ({', '.join(_literal(v) for v in chosen)})", covered / num_rows
+
+    quantiles = column_stats['quantiles']
+    if quantiles is None:
+        return None
+    fraction = min(1.0, target / non_null)
+    position = int(np.argmin(np.abs(QUANTILE_POINTS - fraction)))
+    # Quantiles that cannot be written as a literal fall back to the nearest one that can
+    for offset in sorted(range(-position, len(quantiles) - position), key=abs):
+        literal = _literal(quantiles[position + offset])
+        if literal is not None:
+            estimate = estimate_selectivity(column_stats, num_rows, '<=', [quantiles[position + offset]])
+            return f"`{column}` <= {literal}", estimate if estimate is not None else fraction
+    return None
+
+
+def fill_values(column_stats: Dict) -> Optional[Tuple[str, str]]:
+    """
+    Choose the old and new value of a fill edit: the old value is one of the column's most frequent values, the new
+    value another one, so that the edit changes real rows and keeps the column's type
+    :param column_stats: Statistics of the column, see compute_statistics
+    :return: Tuple of (old value, new value) python literals, or None if the column has fewer than two such values
+    """
+    values = [value for value, _ in column_stats['top_k'] if _literal(value) is not None]
+    if len(values) < 2:
+        return None
+    old_value, new_value = np.random.choice(len(values), 2, replace=False)
+    return _literal(values[old_value]), _literal(values[new_value])
+
+
+def propagate_op(statistics: Dict, op: str, args: Dict, right_statistics: Dict = None) -> Optional[Dict]:
+    """
+    Estimate the statistics of the result of op from the statistics of its sources, without scanning the result
+    :param statistics: Statistics of the (left) source
+    :param op: Operation name
+    :param args: Operation arguments
+    :param right_statistics: Statistics of the right source of a merge
+    :return: Estimated statistics, or None for operations that cannot be estimated cheaply (e.g. groupby, pivot)
+    """
+    num_rows, columns = statistics['num_rows'], statistics['columns']
+    if op == 'project':
+        return {'num_rows': num_rows, 'columns': {col: columns[col] for col in args['output_cols'] if col in columns}}
+    if op == 'sample':
+        return {'num_rows': int(round(num_rows * args['frac'])),
+                'columns': {col: _scale(column_stats, num_rows, args['frac']) for col, column_stats in columns.items()}}
+    if op == 'select':
+        parsed = parse_condition(args['condition'])
+        if parsed is None or parsed[0] not in columns:
+            return None
+        col, comparison, values = parsed
+        selectivity = estimate_selectivity(columns[col], num_rows, comparison, values)
+        if selectivity is None:
+            return None
+        fraction = selectivity * num_rows / max(1, num_rows - columns[col]['nulls'])
+        new_columns = {c: _scale(column_stats, num_rows, selectivity) for c, column_stats in columns.items()}
+        selected = dict(columns[col], nulls=0)
+        quantiles = columns[col]['quantiles']
+        if comparison == 'in':
+            selected['top_k'] = [(value, count) for value, count in columns[col]['top_k'] if value in values]
+            selected['distinct'] = len(values)
+            if quantiles is not None:
+                try:
+                    low, high = min(values), max(values)
+                    selected['quantiles'] = [min(max(q, low), high) for q in quantiles]
+                except TypeError:
+                    selected['quantiles'] = None
+        else:
+            selected['top_k'] = [(value, count) for value, count in columns[col]['top_k'] if value <= values[0]]
+            selected['distinct'] = max(len(selected['top_k']), int(round(columns[col]['distinct'] * fraction)))
+            if quantiles is not None:
+                # The kept values are the lower fraction of the column: stretch that part of the quantiles
+                selected['quantiles'] = [min(quantiles[int(round(point * min(1.0, fraction) * (len(quantiles) - 1)))],
+                                             values[0]) for point in QUANTILE_POINTS]
+        if selected['quantiles'] is not None:
+            selected['min'], selected['max'] = selected['quantiles'][0], selected['quantiles'][-1]
+        if 'values' in columns[col]:
+            selected['values'] = columns[col]['values']
+        new_columns[col] = selected
+        return {'num_rows': int(round(selectivity * num_rows)), 'columns': new_columns}
+    if op == 'fill':
+        col = args['col_name']
+        if col not in columns:
+            return statistics
+        old_value, new_value = [ast.literal_eval(v) if isinstance(v, str) else v
+                                for v in (args['old_value'], args['new_value'])]
+        top_k = dict(columns[col]['top_k'])
+        if old_value in top_k:
+            top_k[new_value] = top_k.get(new_value, 0) + top_k.pop(old_value)
+        filled = dict(columns[col], top_k=sorted(top_k.items(), key=lambda x: -x[1]))
+        if 'values' in filled:
+            filled['values'] = np.append(filled['values'], new_value) if new_value not in filled['values'] \
+                else filled['values']
+        return {'num_rows': num_rows, 'columns': {**columns, col: filled}}
+    if op == 'merge' and right_statistics is not None:
+        key_col = args['key_col']
+        right_key = right_statistics['columns'].get(key_col)
+        if key_col not in columns or right_key is None or \
+                right_key['distinct'] + right_key['nulls'] < right_statistics['num_rows']:
+            return None  # Only PK-FK merges (unique right keys) keep the left rows
+        # Each non-null left key is assumed to match exactly one right row
+        fraction = 1.0 - columns[key_col]['nulls'] / max(1, num_rows)
+        right_columns = {col: column_stats for col, column_stats in right_statistics['columns'].items()
+                         if col != key_col and (args.get('right_cols') is None or col in args['right_cols'])}
+        new_columns = {col: _scale(column_stats, num_rows, fraction) for col, column_stats in columns.items()}
+        new_columns[key_col] = dict(columns[key_col], nulls=0)
+        return {'num_rows': int(round(num_rows * fraction)), 'columns': {**new_columns, **right_columns}}
+    return None
+
+
+def propagate_statistics(source_statistics: List[Dict], op_list: List[Dict]) -> Optional[Dict]:
+    """
+    Estimate the statistics of the result of an op list, see propagate_op
+    :param source_statistics: Statistics of the source artifacts of the operation, in order
+    :param op_list: List of {op, args} dicts
+    :return: Estimated statistics, or None if an operation cannot be estimated
+    """
+    statistics = source_statistics[0]
+    right_statistics = source_statistics[1] if len(source_statistics) > 1 else None
+    for op_dict in op_list:
+        if statistics is None:
+            return None
+        statistics = propagate_op(statistics, op_dict['op'], op_dict['args'], right_statistics=right_statistics)
+    return statistics
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+fuzzydata.core.upsample
+~~~~~~~~~~~~
+This module scales up existing artifacts by replicating and resampling their rows instead of generating new ones
+:copyright: (c) Suhail Rehman 2022
+:license: MIT, see LICENSE for more details.
+"""
+
+import logging
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_integer_dtype, is_numeric_dtype
+
+from fuzzydata.core.generator import read_schema_csv
+
+logger = logging.getLogger(__name__)
+
+
+def read_table(filename: str, schema_map: Dict, file_format: str = 'csv') -> pd.DataFrame:
+    """
+    Read a serialized artifact into a pandas Dataframe, independently of the client that wrote it
+    :param filename: File of the artifact
+    :param schema_map: Schema map of the artifact
+    :param file_format: csv (default) or parquet
+    :return: pandas Dataframe
+    """
+    if file_format == 'csv':
+        return read_schema_csv(filename, schema_map)
+    elif file_format == 'parquet':
+        return pd.read_parquet(filename)
+    raise ValueError(f'Cannot read file format {file_format}, expected csv or parquet')
+
+
+def upsample_chunks(df: pd.DataFrame, num_rows: int, key_columns: Iterable[str] = (), expand_keys: bool = False,
+                    perturb: float = 0.0, chunk_rows: int = 1000000, seed: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Scale df up (or down) to num_rows rows, as chunks of at most chunk_rows rows. The output consists of whole
+    replicas of df followed by a random sample of its rows for the remainder, gathered with vectorized indexing.
+    Replica 0 is df itself, the later replicas can be modified:
+    - expand_keys appends the replica number (_r<k>) to the key columns, so that replica k of a table only joins
+      with replica k of another. Tables upsampled with the same factor then keep their PK-FK relationships, e.g. a
+      key that is unique in the original stays unique. Without it, upsampling the FK side of a join keeps every
+      foreign key valid.
+    - perturb scales the values of the numeric non-key columns by a random factor in [1 - perturb, 1 + perturb]
+      and replaces a perturb fraction of the values of the other non-key columns with values of other rows.
+    :param df: pandas Dataframe to be upsampled
+    :param num_rows: Number of rows of the output
+    :param key_columns: Merge key columns, these are never perturbed
+    :param expand_keys: Append the replica number to the key columns with string values (default False)
+    :param perturb: Amount of perturbation of the non-key columns, between 0.0 (default) and 1.0
+    :param chunk_rows: Maximum number of rows per chunk (default 1M)
+    :param seed: Seed for the remainder sample and the perturbations (optional)
+    :return: Iterator of Dataframe chunks
+    """
+    rng = np.random.default_rng(seed)
+    num_source_rows = len(df.index)
+    if num_source_rows == 0:
+        raise ValueError('Cannot upsample an empty table')
+    key_columns = list(key_columns)
+    expanded_columns = []
+    if expand_keys:
+        for col in key_columns:
+            if infer_dtype(df[col], skipna=True) == 'string':
+                expanded_columns.append(col)
+            else:
+                logger.info(f'Key column {col} does not have string values, its keys are not expanded')
+    num_replicas = num_rows // num_source_rows
+    remainder_rows = np.sort(rng.choice(num_source_rows, size=num_rows % num_source_rows, replace=False))
+
+    for start in range(0, num_rows, chunk_rows):
+        positions = np.arange(start, min(start + chunk_rows, num_rows))
+        replicas = positions // num_source_rows
+        rows = positions % num_source_rows
+        tail = replicas >= num_replicas
+        rows[tail] = remainder_rows[positions[tail] - num_replicas * num_source_rows]
+        chunk = df.take(rows).reset_index(drop=True)
+
+        copies = replicas > 0
+        if copies.any():
+            if expanded_columns:
+                suffixes = pd.Series(np.where(copies, np.char.add('_r', replicas.astype(str)), ''))
+                for col in expanded_columns:
+                    chunk[col] = chunk[col].str.cat(suffixes)
+            if perturb:
+                for col in chunk.columns.difference(key_columns, sort=False):
+                    chunk[col] = perturb_column(chunk[col], perturb, copies, rng)
+        yield chunk
+
+
+def perturb_column(column: pd.Series, perturb: float, mask: np.ndarray, rng: np.random.Generator) -> pd.Series:
+    """
+    Perturb the values of column at the rows in mask: numeric values are scaled by a random factor in
+    [1 - perturb, 1 + perturb] (integers stay integers), other values are replaced with the values of random rows
+    with probability perturb.
+    """
+    if is_numeric_dtype(column.dtype) and not is_bool_dtype(column.dtype):
+        factors = np.where(mask, rng.uniform(1 - perturb, 1 + perturb, size=len(column.index)), 1.0)
+        perturbed = column * factors
+        return perturbed.round().astype(column.dtype) if is_integer_dtype(column.dtype) else perturbed
+    replaced = mask & (rng.random(len(column.index)) < perturb)
+    values = column.to_numpy(copy=True)
+    values[replaced] = values[rng.integers(0, len(values), size=replaced.sum())]
+    return pd.Series(values, index=column.index, dtype=column.dtype, name=column.name)
+
+
+def write_chunks(chunks: Iterable[pd.DataFrame], filename: str, file_format: str = 'csv') -> int:
+    """
+    Stream chunks to a single file, without holding more than one chunk in memory
+    :param chunks: Iterable of Dataframes with the same columns
+    :param filename: File to be written
+    :param file_format: csv (default) or parquet
+    :return: Number of rows written
+    """
+    num_rows = 0
+    if file_format == 'csv':
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(filename, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            num_rows += len(chunk.index)
+    elif file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(filename, schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                num_rows += len(chunk.index)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f'Cannot stream chunks in file format {file_format}, expected csv or parquet')
+    return num_rows
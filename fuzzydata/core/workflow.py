@@ -1,21 +1,26 @@
 from __future__ import annotations
 
 import glob
+import hashlib
 import os
+import platform
 import logging
 import json
 import time
 
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-import networkx as nx
 import numpy as np
 import pandas as pd
 
 from fuzzydata.core.artifact import Artifact
-from fuzzydata.core.generator import generate_schema
+from fuzzydata.core.cache import ResultCache
+from fuzzydata.core.estimator import estimate_op_list, estimated_size, table_estimate
+from fuzzydata.core.generator import generate_schema, generate_star_schema, get_schema_type_mapping
 from fuzzydata.core.operation import Operation
+from fuzzydata.core.statistics import propagate_statistics
+from fuzzydata.core.upsample import read_table, upsample_chunks, write_chunks
 
 
 logger = logging.getLogger(__name__)
@@ -26,14 +31,24 @@ class Workflow(ABC):
     Class to represent a workflow in fuzzydata, Extends DiGraph from networkx with additional metadata about
     the workflow as required.
     """
-    def __init__(self, name='wf', out_directory='/tmp/fuzzydata/wf/'):
+    def __init__(self, name='wf', out_directory='/tmp/fuzzydata/wf/', optimize_plan=False,
+                 result_cache=None, result_cache_bytes=2**30, history_db=None, record_sizes=False):
         """
         Create a new workflow with a specified name
         :param name: Name of the workflow
         :param out_directory: Output Directory for this workflow
+        :param optimize_plan: Optimize the logical plan of each operation chain before execution (default False)
+        :param result_cache: (optional) Directory of a result cache for deterministic operations, or a ResultCache
+        :param result_cache_bytes: Size cap of the result cache in bytes, if a directory is given (default 1GiB)
+        :param history_db: (optional) SQLite benchmark history database the performance records are appended to on
+                           every write_perf, see fuzzydata.core.history
+        :param record_sizes: Record the estimated and actual rows and columns of every operation result in the
+                             performance records, e.g. to check the estimator (default False, as counting the rows of
+                             lazy results re-runs them)
         """
 
         self.name = name
+        import networkx as nx  # Deferred to keep import time of the package (and CLI startup) low
         self.graph = nx.DiGraph()
         self.out_dir = out_directory
         self.artifact_dir = f"{self.out_dir}/artifacts/"
@@ -47,8 +62,18 @@ class Workflow(ABC):
         self.operation_list = []
 
         self.perf_records = []
+        self.statistics = {}  # Column statistics per artifact label, see artifact_statistics
 
         self.current_operation = None
+        self.optimize_plan = optimize_plan
+
+        if isinstance(result_cache, str):
+            result_cache = ResultCache(result_cache, max_bytes=result_cache_bytes)
+        self.result_cache = result_cache
+
+        self.record_sizes = record_sizes
+        self.history_db = history_db
+        self.history_run_id = None  # Run of this workflow in the history, replaced when the perf is written again
 
         logger.info(f'Creating new Workflow {self.name}')
 
@@ -83,6 +108,7 @@ class Workflow(ABC):
                                 'filename': artifact.filename
                             })
         v = artifact.label
+        self.statistics.pop(artifact.label, None)
 
         self.artifact_list.append(artifact.label)
         self.artifact_dict[artifact.label] = artifact
@@ -125,6 +151,142 @@ class Workflow(ABC):
 
         return new_artifact
 
+    def generate_star_artifacts(self, num_rows=100, num_cols=5, **star_options) -> Tuple[Artifact, Dict[str, Artifact]]:
+        """
+        Create an artifact per dimension table of a star schema, then a base artifact that is its (denormalized) fact
+        table, see generate_star_schema
+        :param num_rows: number of rows of the fact table
+        :param num_cols: number of measure columns of the fact table
+        :param star_options: further options of generate_star_schema, e.g. num_dimensions or dimension_rows
+        :return: Tuple of (fact artifact, Dict of dimension key column -> dimension artifact)
+        """
+        start_time = time.perf_counter()
+        fact_df, fact_schema, dimensions = generate_star_schema(num_rows, num_cols=num_cols, **star_options)
+
+        dimension_artifacts = {}
+        for dimension_df, dimension_schema, key_col in dimensions:
+            dimension_label = self.generate_next_label()
+            dimension_artifact = self.initialize_new_artifact(label=dimension_label,
+                                                              filename=f"{self.artifact_dir}/{dimension_label}.csv",
+                                                              schema_map=dimension_schema)
+            dimension_artifact.from_df(dimension_df)
+            self.add_artifact(dimension_artifact)
+            dimension_artifacts[key_col] = dimension_artifact
+
+        # The fact table is added last, as the most recent artifact it is the first source of a generated workflow
+        label = self.generate_next_label()
+        fact_artifact = self.initialize_new_artifact(label=label, filename=f"{self.artifact_dir}/{label}.csv",
+                                                     schema_map=fact_schema)
+        fact_artifact.from_df(fact_df)
+        end_time = time.perf_counter()
+        self.add_artifact(fact_artifact)
+
+        self.perf_records.append(pd.Series({
+            'src': np.nan,
+            'dst': label,
+            'op': 'generate_star',
+            'args': np.nan,
+            'start_time': start_time,
+            'end_time': end_time,
+            'elapsed_time': end_time - start_time
+        }).to_frame().T)
+
+        return fact_artifact, dimension_artifacts
+
+    def upsample_artifact(self, label: str, source_dir: str, schema_map: Dict, num_rows: int, expand_keys: bool = False,
+                          perturb: float = 0.0, chunk_rows: int = 1000000, seed: int = None) -> Artifact:
+        """
+        Create an artifact of num_rows rows by replicating and resampling the rows of an existing artifact, streamed to
+        disk in chunks, see upsample_chunks. Much faster than generating the rows again, and the merge keys stay the
+        keys of the original artifact (or its replicas with expand_keys).
+        :param label: Label of the artifact
+        :param source_dir: Directory of the artifact to be upsampled, e.g. the artifact directory of a workflow
+        :param schema_map: Schema map of the artifact
+        :param num_rows: Number of rows of the upsampled artifact
+        :param expand_keys: Append the replica number to the merge keys, for artifacts that are upsampled by the same
+                            factor as the artifacts they are merged with (default False)
+        :param perturb: Amount of perturbation of the non-key columns, between 0.0 (default) and 1.0
+        :param chunk_rows: Maximum number of rows held in memory while writing (default 1M)
+        :param seed: Seed for the resampling and the perturbations (optional)
+        :return: Artifact after upsampling
+        """
+        start_time = time.perf_counter()
+        new_artifact = self.initialize_new_artifact(label=label, schema_map=schema_map)
+        file_format = new_artifact.file_format
+        source_format = self.stored_file_format(source_dir, label, default=file_format)
+        df = read_table(f"{source_dir}/{label}.{source_format}", schema_map, file_format=source_format)
+        new_artifact.filename = f"{self.artifact_dir}/{label}.{file_format}"
+
+        chunks = upsample_chunks(df, num_rows, key_columns=get_schema_type_mapping(schema_map)['joinable'],
+                                 expand_keys=expand_keys, perturb=perturb, chunk_rows=chunk_rows, seed=seed)
+        if hasattr(new_artifact, 'from_chunks'):  # Out-of-core clients stream the chunks themselves
+            new_artifact.from_chunks(chunks)
+        else:
+            write_chunks(chunks, new_artifact.filename, file_format=file_format)
+            new_artifact.deserialize(filename=new_artifact.filename)
+        end_time = time.perf_counter()
+        self.add_artifact(new_artifact)
+
+        self.perf_records.append(pd.Series({
+            'src': label,
+            'dst': label,
+            'op': 'upsample',
+            'args': np.nan,
+            'start_time': start_time,
+            'end_time': end_time,
+            'elapsed_time': end_time - start_time
+        }).to_frame().T)
+
+        return new_artifact
+
+    def artifact_statistics(self, artifact: Artifact) -> Dict:
+        """
+        Column statistics of an artifact (see compute_statistics), computed by the artifact's client on first use
+        unless they were propagated from the statistics of its sources when the artifact was created
+        :param artifact: Artifact of this workflow
+        :return: Statistics dict
+        """
+        if artifact.label not in self.statistics:
+            key_columns = get_schema_type_mapping(artifact.schema_map)['joinable'] if artifact.schema_map else []
+            self.statistics[artifact.label] = artifact.statistics(key_columns=key_columns)
+        return self.statistics[artifact.label]
+
+    def current_statistics(self) -> Optional[Dict]:
+        """
+        Estimated column statistics of the result of the current operation chain, propagated from the statistics of
+        its sources
+        :return: Statistics dict, or None if an operation of the chain cannot be estimated (e.g. groupby)
+        """
+        self.validate_current_operation()
+        return propagate_statistics([self.artifact_statistics(s) for s in self.current_operation.sources],
+                                    self.current_operation.op_list)
+
+    def artifact_estimate(self, artifact: Artifact) -> Dict:
+        """
+        Size estimate of an artifact (see table_estimate), using its cached statistics if there are any
+        :param artifact: Artifact of this workflow
+        :return: Table estimate
+        """
+        statistics = self.statistics.get(artifact.label)
+        num_rows = statistics['num_rows'] if statistics is not None else len(artifact)
+        return table_estimate(artifact.schema_map, num_rows, statistics=statistics)
+
+    @staticmethod
+    def num_columns(artifact: Artifact) -> int:
+        """ Number of columns of an artifact, from its schema map unless it has none (e.g. pivot results) """
+        if artifact.schema_map:
+            return len(artifact.schema_map)
+        return len(artifact.to_df().columns)
+
+    def current_estimate(self) -> Dict:
+        """
+        Size estimate of the result of the current operation chain, see estimate_op_list
+        :return: Table estimate
+        """
+        self.validate_current_operation()
+        return estimate_op_list([self.artifact_estimate(s) for s in self.current_operation.sources],
+                                self.current_operation.op_list)
+
     def validate_current_operation(self):
         """
         Ensure that an operation has been initialized before attempting to chain a new operation
@@ -141,7 +303,8 @@ class Workflow(ABC):
         :param artifacts: List of artifacts to be operated upon.
         :return: Operation object ready to add tranformations to
         """
-        self.current_operation = self.operator_class(sources=artifacts, artifact_class=self.artifact_class)
+        self.current_operation = self.operator_class(sources=artifacts, artifact_class=self.artifact_class,
+                                                     optimize_plan=self.optimize_plan)
         return self.current_operation
 
     def chain_to_current_operation(self, op_list: List[Dict]) -> None:
@@ -165,8 +328,27 @@ class Workflow(ABC):
         if not new_label:
             new_label = self.generate_next_label()
         try:
-            new_artifact = self.current_operation.execute(new_label)
+            estimate = estimated_size(self.current_estimate()) if self.record_sizes else None
+            cache_key = None
+            cached_df = None
+            if self.result_cache is not None and self.result_cache.is_cacheable(self.current_operation.op_list):
+                cache_key = self.result_cache.key(self.current_operation.sources, self.current_operation.op_list)
+                cached_df = self.result_cache.get(cache_key)
+
+            if cached_df is not None:
+                new_artifact = self.load_cached_result(new_label, cached_df)
+            else:
+                new_artifact = self.current_operation.execute(new_label)
+                if cache_key is not None:
+                    self.result_cache.put(cache_key, new_artifact.to_df())
+            new_artifact.fingerprint = cache_key
+
             self.add_artifact(new_artifact, from_artifacts=self.current_operation.sources, operation=self.current_operation)
+            if all(s.label in self.statistics for s in self.current_operation.sources):
+                statistics = propagate_statistics([self.statistics[s.label] for s in self.current_operation.sources],
+                                                  self.current_operation.op_list)
+                if statistics is not None:
+                    self.statistics[new_artifact.label] = statistics
 
             # TODO: Exception Handling and return value on op failure / empty df
 
@@ -174,15 +356,24 @@ class Workflow(ABC):
             self.operation_list.append(self.current_operation.to_dict())
 
             # Add performance information
-            self.perf_records.append(pd.Series({
+            perf_record = {
                 'src': tuple(x.label for x in self.current_operation.sources),
                 'dst': self.current_operation.new_label,
                 'op_list': '+'.join([x['op'] for x in self.current_operation.op_list]),
                 'code': self.current_operation.code,
+                'optimized': self.current_operation.unoptimized_code is not None,
+                'cache_hit': cached_df is not None,
                 'start_time': self.current_operation.start_time,
                 'end_time': self.current_operation.end_time,
                 'elapsed_time': self.current_operation.get_execution_time()
-            }).to_frame().T)
+            }
+            if self.record_sizes:
+                perf_record.update({'estimated_rows': estimate['rows'],
+                                    'estimated_columns': estimate['columns'],
+                                    'estimated_bytes': estimate['bytes'],
+                                    'rows': len(new_artifact),
+                                    'columns': self.num_columns(new_artifact)})
+            self.perf_records.append(pd.Series(perf_record).to_frame().T)
 
             self.current_operation = None
 
@@ -196,6 +387,24 @@ class Workflow(ABC):
             self.serialize_workflow()
             raise e
 
+    def load_cached_result(self, new_label, cached_df) -> Artifact:
+        """
+        Materialize the current operation from a cached result instead of executing it. The operation timings
+        then reflect the time taken to load the cached result.
+        :param new_label: The new label to assign to the new artifact
+        :param cached_df: Cached result dataframe of the current operation
+        :return: Artifact object representing the new artifact.
+        """
+        logger.info(f'Loading {new_label} from result cache')
+        operation = self.current_operation
+        operation.start_time = time.perf_counter()
+        new_artifact = self.initialize_new_artifact(label=new_label, filename=f"{self.artifact_dir}/{new_label}.csv",
+                                                    schema_map=operation.current_schema_map)
+        new_artifact.from_df(cached_df)
+        operation.end_time = time.perf_counter()
+        operation.new_label = new_label
+        return new_artifact
+
     def generate_artifact_from_operation_list(self, artifacts: List[Artifact], op_list: List[Dict],
                                               new_label: str = None) -> Artifact:
         """
@@ -239,6 +448,7 @@ class Workflow(ABC):
                                       }, indent=2))
 
         # Write out Lineage Graph
+        import networkx as nx
         nx.write_edgelist(self.graph, f"{output_dir}/{self.name}_gt_graph.csv")
 
         # Construct Schema Map dict and write out as json
@@ -251,7 +461,7 @@ class Workflow(ABC):
 
     @classmethod
     def load_workflow(cls, input_dir: str, out_directory: str, name=None, replay=False,
-                      wf_options={}, scale_artifact={}) -> Workflow:
+                      wf_options={}, scale_artifact={}, scale_mode='regenerate', scale_options={}) -> Workflow:
         """
         Load a workflow from disk, usually for replay
         :param input_dir: Input workflow directory
@@ -260,6 +470,8 @@ class Workflow(ABC):
         :param replay: Replay the workflow? Default False.
         :param wf_options: Dict of workflow options
         :param scale_artifact: Dict of artifact labels and scale factor if scaling is required.
+        :param scale_mode: How artifacts are scaled, 'regenerate' (default) or 'upsample'
+        :param scale_options: Dict of options of the upsample scale mode, see upsample_artifact
         :return:
         """
         try:
@@ -279,7 +491,8 @@ class Workflow(ABC):
                 with open(schema_map_file, 'r') as infile:
                     all_schema_maps = json.load(infile)
                 workflow.replay_op_list(artifact_dir, op_list=ops['operation_list'], all_schema_maps=all_schema_maps,
-                                        scale_artifact=scale_artifact)
+                                        scale_artifact=scale_artifact, scale_mode=scale_mode,
+                                        scale_options=scale_options)
                 workflow.write_perf()
 
             # Revisit copying the workflow graph over, currently replay does this for us.
@@ -290,21 +503,31 @@ class Workflow(ABC):
         except FileNotFoundError as e:
             logger.error(f"Error Loading Workflow from {input_dir}: {e}")
 
-    def replay_op_list(self, artifact_dir: str, op_list=None, all_schema_maps=None, scale_artifact={}) -> None:
+    def replay_op_list(self, artifact_dir: str, op_list=None, all_schema_maps=None, scale_artifact={},
+                       scale_mode='regenerate', scale_options={}) -> None:
         """
         Replay the operation list given by "op_list" using artifacts in "artifact_dir"
         :param artifact_dir: Directory containing all the artifact
         :param op_list: List of operations to be performed (List of Dicts)
         :param all_schema_maps: Dict containing the schema map for all source artifacts in the workflow
         :param scale_artifact: Scaling factor for each artifact, if needed.
+        :param scale_mode: 'regenerate' generates scaled artifacts from their schema maps, 'upsample' replicates and
+                           resamples the rows of the pre-generated artifacts (see upsample_artifact)
+        :param scale_options: Dict of options of the upsample scale mode, see upsample_artifact
         :return: None
         """
+        if scale_mode not in ('regenerate', 'upsample'):
+            raise ValueError(f'Unknown scale mode {scale_mode}, expected regenerate or upsample')
         for opl in op_list:
             for source in opl['sources']:
                 if source not in self.artifact_dict.keys():
                     # TODO: Handle PK-FK merges properly - if DF is merge input, we need to maintain the keyspace and
-                    # column schema maybe?
-                    if source in scale_artifact.keys():
+                    # column schema maybe? The upsample scale mode keeps the keyspace of the pre-generated artifacts.
+                    if source in scale_artifact.keys() and scale_mode == 'upsample':
+                        logger.info(f"Upsampling Artifact {source} to size {scale_artifact[source]}")
+                        self.upsample_artifact(source, artifact_dir, all_schema_maps[source], scale_artifact[source],
+                                               **scale_options)
+                    elif source in scale_artifact.keys():
                         logger.info(f"Scaling up Artifact {source} to size {scale_artifact[source]}")
                         source_artifact = self.generate_base_artifact(num_rows=scale_artifact[source],
                                                                       label=source,
@@ -312,6 +535,9 @@ class Workflow(ABC):
                     else:
                         logger.info(f"Loading Pre-Generated Artifact: {source} ")
                         source_artifact = self.initialize_new_artifact(label=source, schema_map=all_schema_maps[source])
+                        # Pre-generated artifacts may have been written in another format than this client's default
+                        source_artifact.file_format = self.stored_file_format(artifact_dir, source,
+                                                                              default=source_artifact.file_format)
                         start_time = time.perf_counter()
                         source_artifact.deserialize(filename=f"{artifact_dir}/{source}.{source_artifact.file_format}")
                         end_time = time.perf_counter()
@@ -331,6 +557,28 @@ class Workflow(ABC):
             self.generate_artifact_from_operation_list([self.artifact_dict[x] for x in opl['sources']],
                                                        opl['op_list'], new_label=opl['new_label'])
 
+    @staticmethod
+    def stored_file_format(directory: str, label: str, default: str) -> str:
+        """
+        File format an artifact is stored in
+        :param directory: Directory of the artifact files, e.g. the artifact directory of a workflow
+        :param label: Label of the artifact
+        :param default: Format to use if the artifact is stored in it, or not found at all
+        :return: default, or the extension of another {label}.* file in directory
+        """
+        if os.path.exists(f"{directory}/{label}.{default}"):
+            return default
+        stored = sorted(glob.glob(f"{glob.escape(directory)}/{glob.escape(label)}.*"))
+        return os.path.splitext(stored[0])[1][1:] if stored else default
+
+    def close(self) -> None:
+        """
+        Release resources held by this workflow, such as a distributed engine. Clients holding resources beyond the
+        lifetime of a single operation override this.
+        :return: None
+        """
+        pass
+
     def write_perf(self, filename=None):
         """
         Write all performance information to filenme
@@ -341,10 +589,40 @@ class Workflow(ABC):
             filename = f"{self.out_dir}/{self.name}_perf.csv"
 
         if self.perf_records:
-            pd.concat(self.perf_records, ignore_index=True).to_csv(filename)
+            perf_df = pd.concat(self.perf_records, ignore_index=True)
+            perf_df.to_csv(filename)
+            if self.history_db:
+                from fuzzydata.core.history import HistoryStore
+                # The keys of the run are computed once, engines may already be stopped on later writes (see close)
+                run_info = self.run_info() if self.history_run_id is None else None
+                self.history_run_id = HistoryStore(self.history_db).append_run(run_info, perf_df,
+                                                                               run_id=self.history_run_id)
         else:
             logger.warning('No Performance Data to be Written')
 
+    def run_info(self) -> Dict:
+        """
+        Keys of this run in the benchmark history: the workflow fingerprint (a hash of the operation list and the
+        schema maps of the base artifacts it reads), client, scale (rows of those base artifacts), file formats, git
+        revision and host
+        :return: Dict of run keys, see fuzzydata.core.history.RUN_KEYS
+        """
+        from fuzzydata.core.history import git_revision
+        # Only base artifacts the operations read, generated but unused ones are not loaded by a replay
+        sources = {source for op in self.operation_list for source in op['sources']}
+        base_labels = sorted(label for label in sources if self.graph.in_degree(label) == 0)
+        workflow_spec = {'operation_list': self.operation_list,
+                         'schema_maps': {label: self.artifact_dict[label].schema_map for label in base_labels}}
+        fingerprint = hashlib.sha256(json.dumps(workflow_spec, sort_keys=True, default=str).encode()).hexdigest()
+        return {'name': self.name,
+                'fingerprint': fingerprint,
+                'client': type(self).__name__,
+                'scale': json.dumps({label: len(self.artifact_dict[label]) for label in base_labels}),
+                'file_format': ','.join(sorted({str(self.artifact_dict[label].file_format)
+                                                for label in self.artifact_list})),
+                'revision': git_revision(),
+                'host': platform.node()}
+
     def select_random_artifact(self, bfactor=0.5, exclude: List[str] = None) -> Artifact:
         """
         Select a random artifact from the current list of artifacts in this workflow
@@ -355,7 +633,8 @@ class Workflow(ABC):
         viable_artifacts = dict(filter(lambda x: x[0] not in exclude, self.artifact_dict.items()))
         size = len(viable_artifacts)
         a = np.arange(size)
-        prob = (bfactor / (np.exp(bfactor * size) - 1)) * np.exp(bfactor * a)
+        # Exponent shifted by its maximum, exp(bfactor * size) overflows for large workflows
+        prob = np.exp(bfactor * (a - a.max(initial=0)))
         prob = prob / prob.sum()
 
         return self.artifact_dict[np.random.choice(list(viable_artifacts.keys()), 1, p=prob)[0]]
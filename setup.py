@@ -31,6 +31,10 @@ setup(
         'SQLAlchemy>=2.0.0'
     ],
     extras_require={
-        'modin': ['modin[all]>=0.13.2']
+        'modin': ['modin[all]>=0.13.2'],
+        'dask': ['dask[dataframe,distributed]', 'pyarrow'],
+        'duckdb': ['duckdb'],
+        'polars': ['polars>=1.0'],
+        'cache': ['pyarrow']
     }
 )
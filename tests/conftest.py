@@ -1,8 +1,10 @@
+import importlib
 import logging
 import pytest
 import sqlalchemy
 import modin.pandas
 
+from fuzzydata.clients.chunked import ChunkedArtifact, ChunkedWorkflow
 from fuzzydata.clients.modin import ModinArtifact, ModinWorkflow
 from fuzzydata.clients.sqlite import SQLArtifact, SQLWorkflow
 from fuzzydata.clients.pandas import DataFrameArtifact, DataFrameWorkflow
@@ -25,10 +27,34 @@ _static_schema_test = {'EafKN__rgb_color': 'rgb_color',
                        'mRIWF__postalcode_in_state': 'postalcode_in_state',
                        '9YjpC__credit_card_provider': 'credit_card_provider'}
 
-artifact_fixtures = ['dataframe_artifact', 'sql_artifact', 'modin_artifact']
-generated_artifact_fixtures = ['dataframe_artifact_generated', 'sql_artifact_generated', 'modin_artifact_generated']
-static_artifact_fixtures = ['dataframe_artifact_static', 'sql_artifact_static', 'modin_artifact_static']
-workflow_fixtures = ['df_workflow', 'sql_workflow', 'modin_workflow']
+artifact_fixtures = ['dataframe_artifact', 'sql_artifact', 'modin_artifact', 'chunked_artifact']
+generated_artifact_fixtures = ['dataframe_artifact_generated', 'sql_artifact_generated', 'modin_artifact_generated',
+                               'chunked_artifact_generated']
+static_artifact_fixtures = ['dataframe_artifact_static', 'sql_artifact_static', 'modin_artifact_static',
+                            'chunked_artifact_static']
+workflow_fixtures = ['df_workflow', 'sql_workflow', 'modin_workflow', 'chunked_workflow']
+
+if importlib.util.find_spec('duckdb'):
+    import duckdb
+    from fuzzydata.clients.duckdb import DuckDBArtifact, DuckDBWorkflow
+    artifact_fixtures.append('duckdb_artifact')
+    generated_artifact_fixtures.append('duckdb_artifact_generated')
+    static_artifact_fixtures.append('duckdb_artifact_static')
+    workflow_fixtures.append('duckdb_workflow')
+
+if importlib.util.find_spec('polars'):
+    from fuzzydata.clients.polars import PolarsArtifact, PolarsWorkflow
+    artifact_fixtures.append('polars_artifact')
+    generated_artifact_fixtures.append('polars_artifact_generated')
+    static_artifact_fixtures.append('polars_artifact_static')
+    workflow_fixtures.append('polars_workflow')
+
+if importlib.util.find_spec('distributed'):
+    from fuzzydata.clients.dask import DaskArtifact, DaskWorkflow
+    artifact_fixtures.append('dask_artifact')
+    generated_artifact_fixtures.append('dask_artifact_generated')
+    static_artifact_fixtures.append('dask_artifact_static')
+    workflow_fixtures.append('dask_workflow')
 
 
 @pytest.fixture(scope="session")
@@ -43,6 +69,12 @@ def modin_artifact(tmpdir_factory):
     return ModinArtifact('test_df', filename=tmp_dir.join('test_df.csv'))
 
 
+@pytest.fixture(scope="session")
+def chunked_artifact(tmpdir_factory):
+    tmp_dir = tmpdir_factory.mktemp("fuzzydata_chunked_test")
+    return ChunkedArtifact('test_df', filename=tmp_dir.join('test_df.csv'), chunk_size=30)
+
+
 @pytest.fixture(scope="session")
 def sql_artifact(tmpdir_factory):
     tmp_dir = tmpdir_factory.mktemp("fuzzydata_sql_test")
@@ -51,6 +83,26 @@ def sql_artifact(tmpdir_factory):
     return SQLArtifact('test_df', filename=tmp_dir.join('test_df.csv'), sql_engine=sql_engine)
 
 
+@pytest.fixture(scope="session")
+def duckdb_artifact(tmpdir_factory):
+    tmp_dir = tmpdir_factory.mktemp("fuzzydata_duckdb_test")
+    connection = duckdb.connect(f"{tmp_dir}/fuzzydata_test.duckdb")
+    return DuckDBArtifact('test_df', filename=tmp_dir.join('test_df.csv'), connection=connection)
+
+
+@pytest.fixture(scope="session")
+def polars_artifact(tmpdir_factory):
+    tmp_dir = tmpdir_factory.mktemp("fuzzydata_polars_test")
+    return PolarsArtifact('test_df', filename=tmp_dir.join('test_df.csv'))
+
+
+@pytest.fixture(scope="session")
+def dask_artifact(tmpdir_factory):
+    tmp_dir = tmpdir_factory.mktemp("fuzzydata_dask_test")
+    return DaskArtifact('test_df', filename=tmp_dir.join('test_df.parquet'), file_format='parquet',
+                        partition_size=30)
+
+
 @pytest.fixture(scope="session")
 def dataframe_artifact_generated(dataframe_artifact):
     tmp_schema = generate_schema(20)
@@ -58,6 +110,13 @@ def dataframe_artifact_generated(dataframe_artifact):
     return dataframe_artifact
 
 
+@pytest.fixture(scope="session")
+def chunked_artifact_generated(chunked_artifact):
+    tmp_schema = generate_schema(20)
+    chunked_artifact.generate(100, tmp_schema)
+    return chunked_artifact
+
+
 @pytest.fixture(scope="session")
 def sql_artifact_generated(sql_artifact):
     tmp_schema = generate_schema(20)
@@ -72,12 +131,39 @@ def modin_artifact_generated(modin_artifact):
     return modin_artifact
 
 
+@pytest.fixture(scope="session")
+def duckdb_artifact_generated(duckdb_artifact):
+    tmp_schema = generate_schema(20)
+    duckdb_artifact.generate(100, tmp_schema)
+    return duckdb_artifact
+
+
+@pytest.fixture(scope="session")
+def polars_artifact_generated(polars_artifact):
+    tmp_schema = generate_schema(20)
+    polars_artifact.generate(100, tmp_schema)
+    return polars_artifact
+
+
+@pytest.fixture(scope="session")
+def dask_artifact_generated(dask_artifact):
+    tmp_schema = generate_schema(20)
+    dask_artifact.generate(100, tmp_schema)
+    return dask_artifact
+
+
 @pytest.fixture(scope="session")
 def dataframe_artifact_static(dataframe_artifact):
     dataframe_artifact.generate(100, _static_schema_test)
     return dataframe_artifact
 
 
+@pytest.fixture(scope="session")
+def chunked_artifact_static(chunked_artifact):
+    chunked_artifact.generate(100, _static_schema_test)
+    return chunked_artifact
+
+
 @pytest.fixture(scope="session")
 def sql_artifact_static(sql_artifact):
     sql_artifact.generate(100, _static_schema_test)
@@ -90,12 +176,30 @@ def modin_artifact_static(modin_artifact):
     return modin_artifact
 
 
+@pytest.fixture(scope="session")
+def duckdb_artifact_static(duckdb_artifact):
+    duckdb_artifact.generate(100, _static_schema_test)
+    return duckdb_artifact
+
+
+@pytest.fixture(scope="session")
+def polars_artifact_static(polars_artifact):
+    polars_artifact.generate(100, _static_schema_test)
+    return polars_artifact
+
+
 @pytest.fixture(scope='session')
 def df_workflow(tmpdir_factory):
     out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
     return DataFrameWorkflow(name='test_df_wf', out_directory=out_dir)
 
 
+@pytest.fixture(scope='session')
+def chunked_workflow(tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
+    return ChunkedWorkflow(name='test_chunked_wf', out_directory=out_dir, chunk_size=30)
+
+
 @pytest.fixture(scope='session')
 def sql_workflow(tmpdir_factory):
     out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
@@ -106,3 +210,27 @@ def sql_workflow(tmpdir_factory):
 def modin_workflow(tmpdir_factory):
     out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
     return ModinWorkflow(name='test_modin_wf', out_directory=out_dir)
+
+
+@pytest.fixture(scope='session')
+def duckdb_workflow(tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
+    return DuckDBWorkflow(name='test_duckdb_wf', out_directory=out_dir)
+
+
+@pytest.fixture(scope='session')
+def polars_workflow(tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
+    return PolarsWorkflow(name='test_polars_wf', out_directory=out_dir)
+
+
+@pytest.fixture(scope="session")
+def dask_artifact_static(dask_artifact):
+    dask_artifact.generate(100, _static_schema_test)
+    return dask_artifact
+
+
+@pytest.fixture(scope='session')
+def dask_workflow(tmpdir_factory):
+    out_dir = tmpdir_factory.mktemp('fuzzydata_temp_wf_df')
+    return DaskWorkflow(name='test_dask_wf', out_directory=out_dir, partition_size=30)
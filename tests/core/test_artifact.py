@@ -1,9 +1,15 @@
+import glob
+import json
 import pandas as pd
 import pytest
 import os
+import sqlalchemy
 
+from fuzzydata.clients.modin import ModinArtifact
+from fuzzydata.clients.pandas import DataFrameArtifact
+from fuzzydata.clients.sqlite import SQLArtifact
 from fuzzydata.core.generator import generate_schema
-from tests.conftest import artifact_fixtures
+from tests.conftest import artifact_fixtures, _static_schema_test
 
 
 @pytest.mark.dependency()
@@ -23,4 +29,88 @@ def test_serialize_deserialize(artifact, request):
     assert os.path.exists(df_file)
     concrete_artifact.destroy()
     concrete_artifact.deserialize()
-    assert isinstance(concrete_artifact.to_df(), concrete_artifact.pd.DataFrame)
\ No newline at end of file
+    assert isinstance(concrete_artifact.to_df(), concrete_artifact.pd.DataFrame)
+
+def test_modin_partitioned_parquet(modin_artifact_static, tmp_path):
+    filename = str(tmp_path / 'parquet_df.parquet')
+    artifact = ModinArtifact('parquet_df', filename=filename, file_format='parquet',
+                             from_df=modin_artifact_static.to_df(), schema_map=_static_schema_test)
+    artifact.serialize()
+    with open(f'{filename}/{ModinArtifact.manifest_file}') as infile:
+        manifest = json.load(infile)
+    assert manifest['num_rows'] == 100
+    assert len(manifest['partitions']) == len(glob.glob(f'{filename}/part.*.parquet'))
+
+    loaded_artifact = ModinArtifact('parquet_df', filename=filename, file_format='parquet',
+                                    schema_map=_static_schema_test)
+    loaded_artifact.deserialize()
+    assert loaded_artifact.to_df()._to_pandas().equals(artifact.to_df()._to_pandas())
+
+
+def test_modin_csv_round_trip(modin_artifact_static, tmp_path):
+    filename = str(tmp_path / 'csv_df.csv')
+    artifact = ModinArtifact('csv_df', filename=filename, file_format='csv', from_df=modin_artifact_static.to_df(),
+                             schema_map=_static_schema_test)
+    artifact.serialize()
+    artifact.destroy()
+
+    loaded_artifact = ModinArtifact('csv_df', filename=filename, file_format='csv', schema_map=_static_schema_test)
+    loaded_artifact.deserialize()
+    assert isinstance(loaded_artifact.to_df(), loaded_artifact.pd.DataFrame)
+    assert list(loaded_artifact.to_df().columns) == list(_static_schema_test.keys())
+    assert len(loaded_artifact) == 100
+
+
+def test_dask_csv_round_trip(dataframe_artifact_static, tmp_path):
+    pytest.importorskip('distributed')
+    from fuzzydata.clients.dask import DaskArtifact
+    filename = str(tmp_path / 'dask_df.csv')
+    df = dataframe_artifact_static.to_df()
+    artifact = DaskArtifact('dask_df', filename=filename, file_format='csv', from_df=df,
+                            schema_map=_static_schema_test, partition_size=30)
+    artifact.serialize()
+    artifact.destroy()
+
+    loaded_artifact = DaskArtifact('dask_df', filename=filename, file_format='csv', schema_map=_static_schema_test)
+    loaded_artifact.deserialize()
+    assert isinstance(loaded_artifact.to_df(), loaded_artifact.pd.DataFrame)
+    # Text columns keep the schema dtype instead of being inferred from their values (e.g. zipcodes as integers)
+    loaded_df = loaded_artifact.to_df().compute().reset_index(drop=True)
+    assert loaded_df['M8OoL__postcode'].tolist() == df['M8OoL__postcode'].tolist()
+    assert loaded_df.astype(df.dtypes.to_dict()).equals(df.reset_index(drop=True))
+
+
+def test_polars_path_round_trip(dataframe_artifact_static, tmpdir):
+    pytest.importorskip('polars')
+    from fuzzydata.clients.polars import PolarsArtifact
+    filename = tmpdir.join('polars_df.csv')  # py.path, as in the workflow fixtures
+    PolarsArtifact('polars_df', filename=filename, from_df=dataframe_artifact_static.to_df(),
+                   schema_map=_static_schema_test).serialize()
+    loaded_artifact = PolarsArtifact('polars_df', filename=filename, schema_map=_static_schema_test)
+    loaded_artifact.deserialize()
+    assert len(loaded_artifact) == 100
+
+
+@pytest.mark.parametrize('csv_engine', [None, 'pyarrow'])
+def test_typed_csv_round_trip(dataframe_artifact_static, csv_engine, tmp_path):
+    pytest.importorskip('pyarrow')
+    df = dataframe_artifact_static.to_df()
+    filename = str(tmp_path / 'typed_df.csv')
+    DataFrameArtifact('typed_df', filename=filename, from_df=df, schema_map=_static_schema_test).serialize()
+
+    loaded_artifact = DataFrameArtifact('typed_df', filename=filename, typed_storage=True, csv_engine=csv_engine,
+                                        schema_map=_static_schema_test)
+    loaded_artifact.deserialize()
+    loaded_df = loaded_artifact.to_df()
+    assert list(loaded_df.columns) == list(_static_schema_test.keys())
+    assert loaded_df['AqhyH__century'].dtype == 'category'
+    assert loaded_df['zmpoV__randomize_nb_elements'].dtype == 'int64'
+    assert loaded_df.astype(object).equals(df.astype(object))
+
+
+def test_sql_serialize_without_index(tmp_path):
+    sql_engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path}/index_test.db")
+    artifact = SQLArtifact('index_df', filename=str(tmp_path / 'index_df.csv'), sql_engine=sql_engine)
+    artifact.generate(10, _static_schema_test)
+    artifact.serialize()
+    assert list(pd.read_csv(artifact.filename, nrows=0).columns) == list(_static_schema_test)
@@ -0,0 +1,58 @@
+import pytest
+
+from fuzzydata.clients.modin import ModinWorkflow
+from fuzzydata.clients.pandas import DataFrameWorkflow
+from fuzzydata.clients.sqlite import SQLWorkflow
+from fuzzydata.core.cache import ResultCache
+from tests.conftest import _static_schema_test
+
+pytest.importorskip('pyarrow')
+
+_groupby_list = [{'op': 'groupby',
+                  'args': {'group_columns': ['AqhyH__century'],
+                           'agg_columns': ['zmpoV__randomize_nb_elements'],
+                           'agg_function': 'max'}}]
+
+_sample_list = [{'op': 'sample', 'args': {'frac': 0.5}}]
+
+
+@pytest.mark.parametrize('wf_class', [DataFrameWorkflow, SQLWorkflow, ModinWorkflow])
+def test_result_cache(wf_class, tmpdir_factory):
+    workflow = wf_class(name=f'test_cache_{wf_class.__name__}', out_directory=tmpdir_factory.mktemp('cache_wf'),
+                        result_cache=str(tmpdir_factory.mktemp('result_cache')))
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+
+    first = workflow.generate_artifact_from_operation_list([base_artifact], _groupby_list)
+    assert not workflow.perf_records[-1]['cache_hit'].iloc[0]
+    assert len(workflow.result_cache) == 1
+
+    second = workflow.generate_artifact_from_operation_list([base_artifact], _groupby_list)
+    assert workflow.perf_records[-1]['cache_hit'].iloc[0]
+    assert second.fingerprint == first.fingerprint
+    assert len(second) == len(first)
+
+    workflow.generate_artifact_from_operation_list([base_artifact], _sample_list)
+    assert not workflow.perf_records[-1]['cache_hit'].iloc[0]
+    assert len(workflow.result_cache) == 1
+
+    # Replacing the contents of a source resets its fingerprint, so the cached result is not reused
+    base_artifact.from_df(base_artifact.to_df().head(10))
+    assert base_artifact.fingerprint is None
+    workflow.generate_artifact_from_operation_list([base_artifact], _groupby_list)
+    assert not workflow.perf_records[-1]['cache_hit'].iloc[0]
+    assert len(workflow.result_cache) == 2
+
+
+def test_result_cache_eviction(dataframe_artifact_static, tmpdir_factory):
+    cache = ResultCache(str(tmpdir_factory.mktemp('result_cache_lru')), max_bytes=1)
+    df = dataframe_artifact_static.to_df()
+    key = cache.key([dataframe_artifact_static], _groupby_list)
+    assert cache.key([dataframe_artifact_static], _groupby_list) == key
+    assert not cache.is_cacheable(_sample_list)
+    assert cache.put(key, df)
+    assert key not in cache
+    assert cache.get(key) is None
+
+    cache.max_bytes = 2**30
+    assert cache.put(key, df)
+    assert cache.get(key).equals(df)
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from fuzzydata.clients import DataFrameWorkflow
+from fuzzydata.core.estimator import estimate_op, estimate_op_list, estimated_size, table_estimate, within_budget
+from fuzzydata.core.generator import generate_table, generate_workflow
+from fuzzydata.core.statistics import compute_statistics
+
+_schema = {'low__city': {'provider': 'city', 'cardinality': 4},
+           'high__country': {'provider': 'country', 'cardinality': 50},
+           'key__zipcode': {'provider': 'zipcode', 'cardinality': 200},
+           'num__pyint': 'pyint'}
+
+
+@pytest.fixture(scope="module")
+def table():
+    df = generate_table(2000, column_dict=_schema, seed=9)
+    return df, table_estimate(_schema, 2000, statistics=compute_statistics(df, key_columns=['key__zipcode']))
+
+
+def test_estimate_groupby_and_pivot(table):
+    df, estimate = table
+    groupby = estimate_op(estimate, 'groupby', {'group_columns': ['low__city'], 'agg_columns': ['num__pyint'],
+                                                'agg_function': 'sum'})
+    assert estimated_size(groupby)['rows'] == df['low__city'].nunique()
+    assert estimated_size(groupby)['columns'] == 2
+
+    pivot = estimate_op(estimate, 'pivot', {'index_cols': ['low__city'], 'columns': ['high__country'],
+                                            'value_col': ['num__pyint'], 'agg_func': 'sum'})
+    pivoted = df.pivot_table(index='low__city', columns='high__country', values='num__pyint', aggfunc='sum')
+    assert estimated_size(pivot)['rows'] == len(pivoted.index)
+    assert estimated_size(pivot)['columns'] == len(pivoted.columns) + 1
+    assert not within_budget(estimated_size(pivot), {'max_columns': 20})
+    assert within_budget(estimated_size(pivot), {'max_rows': 4, 'max_bytes': None})
+
+
+def test_estimate_merge(table):
+    df, estimate = table
+    # Right table with two rows per key: the merge doubles the rows
+    right_df = pd.concat([df[['key__zipcode']].drop_duplicates()] * 2, ignore_index=True)
+    right_df['other__pyint'] = range(len(right_df.index))
+    right_schema = {'key__zipcode': _schema['key__zipcode'], 'other__pyint': 'pyint'}
+    right = table_estimate(right_schema, len(right_df.index), statistics=compute_statistics(right_df))
+    merged = estimate_op_list([estimate, right], [{'op': 'merge', 'args': {'key_col': 'key__zipcode'}}])
+    assert estimated_size(merged)['rows'] == pytest.approx(len(df.merge(right_df, on='key__zipcode').index))
+    assert estimated_size(merged)['columns'] == 5
+
+    # Generated PK-FK join tables keep the rows
+    assert estimated_size(estimate_op(estimate, 'merge', {'key_col': 'key__zipcode'}))['rows'] == 2000
+
+
+def test_generate_workflow_op_budget(tmpdir_factory):
+    workflow = generate_workflow(DataFrameWorkflow, name='budget', num_versions=8, base_shape=(6, 500),
+                                 out_directory=tmpdir_factory.mktemp('budget'), matfreq=1,
+                                 op_budget={'max_rows': 400, 'max_columns': 10})
+    perf = pd.concat(workflow.perf_records, ignore_index=True).dropna(subset=['estimated_rows'])
+    assert len(perf.index) > 0
+    assert (perf['estimated_rows'] <= 400).all() and (perf['estimated_columns'] <= 10).all()
+    assert (perf['rows'] == [len(workflow.artifact_dict[label]) for label in perf['dst']]).all()
+
+
+def test_record_sizes(tmpdir_factory):
+    workflow = generate_workflow(DataFrameWorkflow, name='no_budget', num_versions=3, base_shape=(6, 100),
+                                 out_directory=tmpdir_factory.mktemp('no_budget'))
+    assert not workflow.record_sizes
+    assert not {'estimated_rows', 'rows'} & set(pd.concat(workflow.perf_records, ignore_index=True).columns)
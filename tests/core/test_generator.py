@@ -1,13 +1,24 @@
 import glob
+import importlib.util
 import itertools
 import logging
 import os
 
+import modin.pandas
+import numpy as np
 import pandas as pd
 import pytest
 
 from fuzzydata.clients import supported_workflows, SQLWorkflow, travis_workflows, DataFrameWorkflow, ModinWorkflow
-from fuzzydata.core.generator import generate_schema, generate_table, generate_workflow
+from fuzzydata.clients.chunked import ChunkedArtifact
+from fuzzydata.clients.modin import generate_partitioned_table
+from fuzzydata.clients.pandas import DataFrameArtifact
+from fuzzydata.core.generator import apply_schema_dtypes, generate_schema, generate_star_schema, generate_table, \
+    generate_ops_choices, generate_workflow, get_schema_type_mapping, WIDE_TABLE_COLUMNS, \
+    _faker_cols, column_null_rate, column_provider, generate_pkfk_join_table, provider_costs, \
+    provider_dtype
+from fuzzydata.core.statistics import compute_statistics
+from tests.conftest import _static_schema_test
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +49,188 @@ def test_generate_table(schema, num_rows):
     assert num_rows == len(table.index)
 
 
+# Seeded tests use the static schema, which has no providers relative to the current time (e.g. unix_time)
+def test_generate_table_seed():
+    table = generate_table(50, column_dict=_static_schema_test, seed=42)
+    assert table.equals(generate_table(50, column_dict=_static_schema_test, seed=42))
+    assert not table.equals(generate_table(50, column_dict=_static_schema_test, seed=7))
+
+
+def test_apply_schema_dtypes():
+    table = apply_schema_dtypes(generate_table(100, column_dict=_static_schema_test), _static_schema_test)
+    assert table['AqhyH__century'].dtype == 'category'
+    assert pd.api.types.is_string_dtype(table['RFD4U__uuid4'].dtype)
+    assert table['RFD4U__uuid4'].dtype != object
+    assert table['zmpoV__randomize_nb_elements'].dtype == 'int64'
+
+
+def test_provider_dtype():
+    from faker import Faker
+    faker = Faker()
+    faker.seed_instance(0)
+    # The static dtype table must hold every value a provider generates
+    for provider in _faker_cols:
+        value_types = {type(faker.format(provider)) for _ in range(50)}
+        dtype = provider_dtype(provider)
+        if dtype == 'bool':
+            assert value_types == {bool}, provider
+        elif dtype == 'int64':
+            assert value_types == {int}, provider
+        elif dtype == 'float64':
+            assert value_types <= {int, float}, provider
+        else:
+            assert not value_types & {bool, int, float}, provider
+
+
+def test_generate_table_column_spec():
+    schema = {'key__city': {'provider': 'city', 'cardinality': 20, 'distribution': 'zipf', 'zipf_a': 1.5},
+              'hot__country_code': {'provider': 'country_code', 'cardinality': 10, 'hot_fraction': 0.5},
+              'num__random_int': {'provider': 'random_int', 'cardinality': 5},
+              'plain__city': 'city'}
+    table = generate_table(2000, column_dict=schema, seed=7)
+    assert table['key__city'].nunique() <= 20
+    counts = table['key__city'].value_counts(normalize=True)
+    assert counts.iloc[0] > 3 * counts.iloc[-1]
+    assert table['hot__country_code'].value_counts(normalize=True).iloc[0] >= 0.45
+    assert table['num__random_int'].dtype == 'int64'
+    assert table['num__random_int'].nunique() <= 5
+    assert table.equals(generate_table(2000, column_dict=schema, seed=7))
+
+    column_dist = {'cardinality': 5, 'distribution': 'zipf'}
+    for label, spec in generate_schema(20, column_dist=column_dist).items():
+        if isinstance(spec, dict):
+            assert spec['cardinality'] == 5 and spec['distribution'] == 'zipf'
+            assert {'groupable', 'joinable'} & set(get_schema_type_mapping({label: spec}).keys())
+
+
+def test_inject_nulls(tmp_path):
+    schema = {'num__random_int': {'provider': 'random_int', 'null_rate': 0.3},
+              'key__city': {'provider': 'city', 'cardinality': 10, 'null_rate': 0.1},
+              'empty__country_code': {'provider': 'country_code', 'null_rate': 1.0},
+              'plain__city': 'city'}
+    table = generate_table(1000, column_dict=schema, seed=11)
+    assert table['num__random_int'].dtype == 'Int64'
+    assert 0.2 < table['num__random_int'].isna().mean() < 0.4
+    assert table['empty__country_code'].isna().all()
+    assert not table['plain__city'].isna().any()
+    assert table.isna().equals(generate_table(1000, column_dict=schema, seed=11).isna())
+
+    filename = str(tmp_path / 'nulls.csv')
+    DataFrameArtifact('nulls', filename=filename, from_df=table, schema_map=schema).serialize()
+    loaded_artifact = DataFrameArtifact('nulls', filename=filename, schema_map=schema)
+    loaded_artifact.deserialize()
+    assert loaded_artifact.to_df()['num__random_int'].dtype == 'Int64'
+    assert loaded_artifact.to_df().isna().equals(table.isna())
+
+    for _ in range(20):
+        for op in generate_ops_choices(schema, 1000):
+            assert 'empty__country_code' not in op['args'].get('group_columns', [])
+            assert op['args'].get('key_col') != 'empty__country_code'
+
+    # Measured null counts take precedence over the schema's null rates
+    statistics = compute_statistics(table.assign(plain__city=table['plain__city'].mask(table.index % 4 > 0)))
+    for _ in range(20):
+        for op in generate_ops_choices(schema, 1000, statistics=statistics):
+            assert 'plain__city' not in op['args'].get('group_columns', [])
+            assert op['args'].get('key_col') != 'plain__city'
+
+    chunked_artifact = ChunkedArtifact('nulls_chunked', filename=str(tmp_path / 'nulls_chunked.csv'), chunk_size=300,
+                                       from_df=table, schema_map=schema)
+    assert all(chunk['num__random_int'].dtype == 'Int64' for chunk in chunked_artifact.iter_chunks())
+
+    right_df, right_schema = generate_pkfk_join_table(table, schema, key_col='key__city', new_col_size=3)
+    assert right_df['key__city'].notna().all() and right_df['key__city'].is_unique
+    assert all(column_null_rate(spec) > 0 for col, spec in right_schema.items() if col != 'key__city')
+
+
+def test_generate_schema_budget():
+    cost_table = {provider: {'rows_per_sec': 100.0 if provider == 'text' else 10000.0, 'bytes_per_row': 10.0}
+                  for provider in _faker_cols}
+    schema = generate_schema(8, min_rows_per_sec=1000, cost_table=cost_table)
+    assert 'text' not in map(column_provider, schema.values())
+    assert set(get_schema_type_mapping(schema)) == {'groupable', 'joinable', 'numeric', 'string'}
+
+    schema = generate_schema(8, max_bytes_per_row=150)
+    assert provider_costs(list(map(column_provider, schema.values()))).loc[
+        list(map(column_provider, schema.values())), 'bytes_per_row'].sum() <= 150
+
+
+def test_generate_wide_table():
+    reserved = [f'a__{provider}' for provider in _faker_cols]
+    assert list(generate_schema(1, unique_prefix=iter(['a', 'b']).__next__, reserved_labels=reserved))[0][:3] == 'b__'
+
+    schema = generate_schema(WIDE_TABLE_COLUMNS)
+    assert len(schema) == WIDE_TABLE_COLUMNS
+    schema[next(iter(schema))] = {'provider': 'random_int', 'cardinality': 3, 'null_rate': 0.5}
+    table = generate_table(50, column_dict=schema, seed=5)
+    assert list(table.columns) == list(schema)
+    assert table.iloc[:, 0].dtype == 'Int64' and table.iloc[:, 0].nunique() <= 3
+    # One block per dtype, apart from the nullable column
+    assert table._mgr.nblocks == table.dtypes.nunique()
+    static_columns = [label for label, spec in schema.items()
+                      if column_provider(spec) not in ('iso8601', 'unix_time', 'time')]
+    assert table[static_columns].equals(generate_table(50, column_dict=schema, seed=5)[static_columns])
+
+
+def test_generate_star_schema(tmpdir_factory):
+    fact, fact_schema, dimensions = generate_star_schema(500, num_cols=2, num_dimensions=2, dimension_rows=20,
+                                                         column_dist={'distribution': 'zipf'}, seed=5)
+    assert len(fact.index) == 500
+    assert list(fact.columns) == list(fact_schema.keys())
+    for dimension, dimension_schema, key_col in dimensions:
+        assert dimension[key_col].is_unique
+        assert set(fact[key_col]) <= set(dimension[key_col])
+        # Dimension attributes are functionally dependent on the key
+        assert (fact.groupby(key_col)[list(dimension_schema)[1:]].nunique() <= 1).all().all()
+
+    workflow = DataFrameWorkflow(name='star', out_directory=str(tmpdir_factory.mktemp('star')))
+    fact_artifact, dimension_artifacts = workflow.generate_star_artifacts(num_rows=500, num_cols=2,
+                                                                          num_dimensions=2, denormalize=False)
+    assert len(workflow) == 3 and workflow.artifact_list[-1] == fact_artifact.label
+    key_col, dimension_artifact = next(iter(dimension_artifacts.items()))
+    assert set(dimension_artifact.schema_map) - set(fact_artifact.schema_map)
+    merged = workflow.generate_artifact_from_operation_list(
+        [fact_artifact, dimension_artifact],
+        [{'op': 'merge', 'args': {'key_col': key_col, 'right_cols': list(dimension_artifact.schema_map)}}])
+    assert len(merged) == 500
+    assert set(dimension_artifact.schema_map) <= set(merged.schema_map)
+
+
+def test_generate_star_schema_options():
+    fact, fact_schema, dimensions = generate_star_schema(200, num_cols=2, num_dimensions=2, null_rate=0.2, seed=3)
+    _, same_schema, same_dimensions = generate_star_schema(200, num_cols=2, num_dimensions=2, null_rate=0.2, seed=3)
+    assert same_schema == fact_schema
+    assert [schema for _, schema, _ in same_dimensions] == [schema for _, schema, _ in dimensions]
+    key_cols = [key_col for _, _, key_col in dimensions]
+    assert fact[key_cols].notna().all().all()
+    assert fact.drop(columns=key_cols).isna().any().all()
+
+
+def test_generate_workflow_star_schema_merges(tmpdir_factory):
+    merges = 0
+    for seed in range(4):
+        np.random.seed(seed)
+        workflow = generate_workflow(DataFrameWorkflow, name=f'star_{seed}', num_versions=8, base_shape=(3, 300),
+                                     out_directory=tmpdir_factory.mktemp('star_wf'),
+                                     star_schema={'num_dimensions': 3, 'seed': seed})
+        merges += sum(op_dict['op'] == 'merge' for op in workflow.operation_list for op_dict in op['op_list'])
+        # Generated PK-FK join tables are merged, not left behind as orphans
+        assert all(workflow.graph.degree(label) > 0 for label in workflow.artifact_list[4:])
+    assert merges > 0
+
+
+def test_generate_partitioned_table(modin_artifact):
+    table = generate_partitioned_table(101, _static_schema_test, num_partitions=4, seed=42)
+    assert isinstance(table, modin.pandas.DataFrame)
+    assert list(table.columns) == list(_static_schema_test.keys())
+    assert list(table.index) == list(range(101))
+    assert table._to_pandas().equals(generate_partitioned_table(101, _static_schema_test, num_partitions=4,
+                                                                seed=42)._to_pandas())
+
+    schema = {'key__city': {'provider': 'city', 'cardinality': 3}}
+    assert generate_partitioned_table(101, schema, num_partitions=4)['key__city'].nunique() <= 3
+
+
 @pytest.mark.parametrize('wf_class,num_versions,base_shape', itertools.product(workflows_to_test,
                                                                                [10, 20],
                                                                                [(10, 1000), (20, 10000)]))
@@ -60,4 +253,18 @@ def test_generate_workflow(wf_class, num_versions, base_shape, tmpdir_factory):
         assert os.path.exists(f"{output_path}/{workflow.name}_gt_graph.csv")
     except Exception as e:
         logger.error(f"Error in Workflow Path: {output_path}")
-        raise e
\ No newline at end of file
+        raise e
+
+@pytest.mark.skipif(not importlib.util.find_spec('distributed'), reason='dask.distributed is not installed')
+def test_generate_workflow_dask_pivot(tmpdir_factory):
+    from fuzzydata.clients.dask import DaskOperation, DaskWorkflow
+    exclude = ['groupby', 'merge', 'sample', 'select', 'fill', 'project']
+    pivots = []
+    for seed in range(8):
+        np.random.seed(seed)
+        workflow = generate_workflow(DaskWorkflow, name=f'dask_pivot_{seed}', num_versions=3, base_shape=(15, 200),
+                                     out_directory=tmpdir_factory.mktemp('dask_pivot'), exclude_ops=exclude,
+                                     column_dist={'cardinality': 5}, wf_options={'file_format': 'csv'})
+        pivots += [op['op_list'][0] for op in workflow.operation_list if op['op_list'][0]['op'] == 'pivot']
+    assert pivots
+    assert all(pivot['args']['agg_func'] in DaskOperation.pivot_agg_functions for pivot in pivots)
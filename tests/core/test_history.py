@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fuzzydata.clients import DataFrameWorkflow
+from fuzzydata.core.generator import generate_workflow
+from fuzzydata.core.history import HistoryStore, compare_runs, permutation_test
+from tests.conftest import _static_schema_test
+
+
+def _perf(times):
+    return pd.DataFrame({'src': [np.nan] + [('artifact_0',)] * (len(times) - 1),
+                         'dst': [f'artifact_{i}' for i in range(len(times))],
+                         'op': ['generate'] + [np.nan] * (len(times) - 1),
+                         'op_list': [np.nan] + ['groupby'] * (len(times) - 1),
+                         'elapsed_time': times})
+
+
+def test_history_store(tmpdir_factory):
+    history = HistoryStore(str(tmpdir_factory.mktemp('history').join('history.db')))
+    pandas_run = history.append_run({'client': 'DataFrameWorkflow', 'revision': 'abc123'}, _perf([1.0, 2.0]))
+    sql_run = history.append_run({'client': 'SQLWorkflow', 'revision': 'abd456'}, _perf([1.0, 2.0, 3.0]))
+    assert history.runs('client=SQLWorkflow')['run_id'].tolist() == [sql_run]
+    assert history.runs('revision=ab')['run_id'].tolist() == [pandas_run, sql_run]
+    assert history.runs(f'{pandas_run},{sql_run},revision=abc')['run_id'].tolist() == [pandas_run]
+    with pytest.raises(ValueError):
+        history.runs('colour=blue')
+
+    records = history.records([sql_run])
+    assert records['op'].tolist() == ['generate', 'groupby', 'groupby']
+    assert records['src'].tolist() == [None, 'artifact_0', 'artifact_0']
+
+    # Writing the perf of a run again replaces its records
+    assert history.append_run(None, _perf([4.0]), run_id=sql_run) == sql_run
+    assert history.records([sql_run])['elapsed_time'].tolist() == [4.0]
+    assert len(history.runs().index) == 2
+
+
+def test_compare_runs():
+    rng = np.random.default_rng(0)
+    assert permutation_test(rng.normal(1, 0.05, 20), rng.normal(2, 0.05, 20), num_permutations=1000) < 0.01
+    assert permutation_test(rng.normal(1, 0.05, 20), rng.normal(1, 0.05, 20), num_permutations=1000) > 0.01
+
+    # Ten runs of a workflow per side: artifact_1 regresses, artifact_2 is unchanged, artifact_3 is only in the baseline
+    baseline = pd.concat([HistoryStore.normalize_records(_perf(rng.normal([1.0, 1.0, 1.0, 1.0], 0.02)))
+                          for _ in range(10)])
+    candidate = pd.concat([HistoryStore.normalize_records(_perf(rng.normal([0.5, 2.0, 1.0], 0.02)))
+                           for _ in range(10)])
+    report = compare_runs(baseline, candidate, num_permutations=1000).set_index('dst')
+    assert report['status'].to_dict() == {'artifact_0': 'faster', 'artifact_1': 'slower', 'artifact_2': 'unchanged'}
+    assert report.loc['artifact_1', 'speedup'] == pytest.approx(0.5, rel=0.1)
+
+    by_op = compare_runs(baseline, candidate, by='op', num_permutations=1000).set_index('op')
+    assert by_op.loc['generate', 'candidate_n'] == 10 and by_op.loc['groupby', 'baseline_n'] == 30
+
+
+def test_workflow_history(tmpdir_factory):
+    history_db = str(tmpdir_factory.mktemp('workflow_history').join('history.db'))
+    workflow = generate_workflow(DataFrameWorkflow, name='history', num_versions=3, base_shape=(5, 50),
+                                 out_directory=tmpdir_factory.mktemp('history_wf'),
+                                 wf_options={'history_db': history_db})
+    workflow.write_perf()
+    runs = HistoryStore(history_db).runs()
+    assert runs['run_id'].tolist() == [workflow.history_run_id]
+    assert runs.loc[0, 'client'] == 'DataFrameWorkflow' and runs.loc[0, 'fingerprint'] == \
+        workflow.run_info()['fingerprint']
+    assert len(HistoryStore(history_db).records([workflow.history_run_id]).index) == len(workflow.perf_records)
+
+
+def test_replay_fingerprint(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('fingerprint_wf')
+    workflow = DataFrameWorkflow(name='fingerprint', out_directory=output_path)
+    workflow.generate_base_artifact(num_rows=20, column_maps=_static_schema_test)  # Not read by any operation
+    base_artifact = workflow.generate_base_artifact(num_rows=20, column_maps=_static_schema_test)
+    workflow.generate_artifact_from_operation_list([base_artifact], [{'op': 'sample', 'args': {'frac': 0.5}}])
+    workflow.serialize_workflow()
+
+    replayed = DataFrameWorkflow.load_workflow(output_path, tmpdir_factory.mktemp('fingerprint_replay'), replay=True)
+    assert replayed.run_info()['fingerprint'] == workflow.run_info()['fingerprint']
+    assert replayed.run_info()['scale'] == workflow.run_info()['scale']
@@ -5,7 +5,10 @@ import os
 import pytest
 import numpy as np
 
-from fuzzydata.core.generator import generate_pkfk_join_table
+from fuzzydata.clients.chunked import ChunkedArtifact
+from fuzzydata.clients.pandas import DataFrameArtifact, compile_chain
+from fuzzydata.core.artifact import to_pandas
+from fuzzydata.core.generator import generate_pkfk_join_table, generate_table
 from tests.conftest import static_artifact_fixtures, generated_artifact_fixtures
 
 logger = logging.getLogger(__name__)
@@ -92,12 +95,14 @@ def test_operation_chain(artifact, request):
 @pytest.mark.parametrize('source_artifact', static_artifact_fixtures)
 def test_merge_op(source_artifact, request):
     concrete_artifact = request.getfixturevalue(source_artifact)
-    new_df, new_schema = generate_pkfk_join_table(source_table=concrete_artifact.to_df(),
+    new_df, new_schema = generate_pkfk_join_table(source_table=to_pandas(concrete_artifact.to_df()),
                                                   source_schema=concrete_artifact.schema_map,
                                                   key_col=_merge_operation['args']['key_col'])
     extra_args = {}
     if hasattr(concrete_artifact,'sql_engine'):
         extra_args['sql_engine'] = concrete_artifact.sql_engine
+    if hasattr(concrete_artifact, 'connection'):
+        extra_args['connection'] = concrete_artifact.connection
 
     join_artifact = concrete_artifact.__class__('join_df',
                                                 filename=os.path.dirname(concrete_artifact.filename) + 'join_df.csv',
@@ -113,3 +118,101 @@ def test_merge_op(source_artifact, request):
     expected_join_result_cols = set(concrete_artifact.to_df().columns).union(set(join_artifact.to_df().columns))
     assert set(result_artifact.to_df().columns) == expected_join_result_cols
 
+
+# Skipping modin, its results lose the column labels (https://github.com/modin-project/modin/issues/4287)
+@pytest.mark.parametrize('artifact', [a for a in static_artifact_fixtures if a != 'modin_artifact_static'])
+def test_fill_op(artifact, request):
+    concrete_artifact = request.getfixturevalue(artifact)
+    fill_op = concrete_artifact.operation_class(sources=[concrete_artifact])
+    fill_op.chain_operation('fill', _operations[2]['args'])
+    source_df, result_df = to_pandas(concrete_artifact.to_df()), to_pandas(fill_op.execute('filled').to_df())
+    assert list(result_df.columns) == list(concrete_artifact.schema_map)
+    col_name = _operations[2]['args']['col_name']
+    assert (result_df[col_name] == 'RuPay').sum() == source_df[col_name].isin(['Visa', 'RuPay']).sum()
+    assert not (result_df[col_name] == 'Visa').any()
+
+
+def test_compiled_chain_cache(dataframe_artifact_static):
+    compile_chain.cache_clear()
+    groupable = _schema_type_mapping['groupable']
+    # Chains of the same operations on different columns share one compiled code object
+    for output_cols in [groupable, groupable[::-1], groupable[1:] + groupable[:1]]:
+        sample_op = dataframe_artifact_static.operation_class(sources=[dataframe_artifact_static])
+        sample_op.chain_operation('project', {'output_cols': output_cols})
+        result = sample_op.execute('after_compiled')
+        assert list(result.to_df().columns) == output_cols
+    assert compile_chain.cache_info().misses == 1
+    assert compile_chain.cache_info().hits == 2
+
+
+@pytest.mark.parametrize('agg_function', ['mean', 'sum', 'count', 'min', 'max'])
+def test_chunked_groupby(dataframe_artifact_static, agg_function, tmp_path):
+    chunked_artifact = ChunkedArtifact('chunked_df', filename=tmp_path / 'chunked_df.csv', chunk_size=7,
+                                       from_df=dataframe_artifact_static.to_df(),
+                                       schema_map=dataframe_artifact_static.schema_map)
+    results = []
+    for artifact in [dataframe_artifact_static, chunked_artifact]:
+        groupby_op = artifact.operation_class(sources=[artifact])
+        groupby_op.chain_operation('groupby', {'group_columns': ['AqhyH__century'],
+                                               'agg_columns': ['zmpoV__randomize_nb_elements'],
+                                               'agg_function': agg_function})
+        result_df = groupby_op.execute(f'after_{agg_function}').to_df()
+        results.append(result_df.sort_values('AqhyH__century').reset_index(drop=True))
+    assert np.allclose(results[0]['zmpoV__randomize_nb_elements'], results[1]['zmpoV__randomize_nb_elements'])
+
+
+@pytest.mark.parametrize('right_rows', [5, 40])
+def test_chunked_merge(right_rows, tmp_path):
+    left_schema = {'key__pyint': {'provider': 'random_int', 'cardinality': 50}, 'left__city': 'city'}
+    left_df = generate_table(100, column_dict=left_schema, seed=1)
+    right_df, right_schema = generate_pkfk_join_table(left_df.head(right_rows), left_schema, key_col='key__pyint')
+    left = ChunkedArtifact('left', filename=tmp_path / 'left.csv', chunk_size=7, from_df=left_df,
+                           schema_map=left_schema)
+    right = ChunkedArtifact('right', filename=tmp_path / 'right.csv', chunk_size=7, from_df=right_df,
+                            schema_map=right_schema)
+    merge_op = left.operation_class(sources=[left, right], artifact_dir=str(tmp_path))
+    merge_op.chain_operation('merge', {'key_col': 'key__pyint'})
+    result = merge_op.execute('merged')
+    assert result.data_file == str(tmp_path / 'merged.csv')
+
+    columns = list(result.to_df().columns)
+    expected = left.to_df().merge(right.to_df(), on='key__pyint')[columns]
+    assert result.to_df().sort_values(columns).reset_index(drop=True).equals(
+        expected.sort_values(columns).reset_index(drop=True))
+
+
+def test_typed_storage_groupby(dataframe_artifact_static):
+    typed_artifact = DataFrameArtifact('typed_df', from_df=dataframe_artifact_static.to_df(), typed_storage=True,
+                                       schema_map=dataframe_artifact_static.schema_map)
+    assert typed_artifact.to_df()['AqhyH__century'].dtype == 'category'
+    assert typed_artifact.to_df().memory_usage(deep=True).sum() < \
+           dataframe_artifact_static.to_df().memory_usage(deep=True).sum()
+
+    results = []
+    for artifact in [dataframe_artifact_static, typed_artifact]:
+        groupby_op = artifact.operation_class(sources=[artifact])
+        groupby_op.chain_operation('groupby', {'group_columns': ['AqhyH__century'],
+                                               'agg_columns': ['zmpoV__randomize_nb_elements'],
+                                               'agg_function': 'sum'})
+        results.append(groupby_op.execute('after_typed_groupby').to_df())
+    # Only observed categories form groups
+    assert len(results[0].index) == len(results[1].index)
+    assert results[1]['AqhyH__century'].dtype == 'category'
+
+
+@pytest.mark.parametrize('condition', ['zmpoV__randomize_nb_elements >= 0', 'zmpoV__randomize_nb_elements < 0'])
+def test_duckdb_pivot(duckdb_artifact_static, condition):
+    pivot_args = {'index_cols': ['AqhyH__century'], 'columns': ['9YjpC__credit_card_provider'],
+                  'value_col': ['zmpoV__randomize_nb_elements'], 'agg_func': 'sum'}
+    pivot_op = duckdb_artifact_static.operation_class(sources=[duckdb_artifact_static])
+    pivot_op.chain_operation('select', {'condition': condition})
+    pivot_op.chain_operation('pivot', pivot_args)
+    # Pivot values are only looked up when the chain is materialized, so the source may change until then
+    duckdb_artifact_static.from_df(duckdb_artifact_static.to_df().head(10))
+    result_df = pivot_op.execute('after_pivot').to_df()
+
+    expected = duckdb_artifact_static.to_df().query(condition).pivot_table(
+        index='AqhyH__century', columns='9YjpC__credit_card_provider', values='zmpoV__randomize_nb_elements',
+        aggfunc='sum')
+    assert set(result_df.columns) == {'AqhyH__century'} | set(expected.columns)
+    assert len(result_df) == len(expected)
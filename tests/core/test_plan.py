@@ -0,0 +1,79 @@
+import pytest
+
+from fuzzydata.core.artifact import to_pandas
+from fuzzydata.core.plan import build_plan, optimize, to_op_list
+from tests.conftest import static_artifact_fixtures, _static_schema_test
+
+_right_schema = {'a0UaD__zipcode_in_state': 'zipcode_in_state',
+                 'xYz12__city': 'city',
+                 'pQr34__pyint': 'pyint'}
+
+_project_cols = ['AqhyH__century', 'zmpoV__randomize_nb_elements']
+
+_groupby = {'op': 'groupby',
+            'args': {'group_columns': ['AqhyH__century'],
+                     'agg_columns': ['zmpoV__randomize_nb_elements'],
+                     'agg_function': 'max'}}
+
+
+def optimized_op_list(op_list, schemas=(_static_schema_test,)):
+    return to_op_list(optimize(build_plan(op_list, list(schemas))))
+
+
+def test_plan_roundtrip():
+    op_list = [{'op': 'sample', 'args': {'frac': 0.5}}, _groupby]
+    plan = build_plan(op_list, [_static_schema_test])
+    assert repr(plan) == 'groupby(sample(scan(0)))'
+    assert plan.columns == ['AqhyH__century', 'zmpoV__randomize_nb_elements']
+    assert to_op_list(plan) == op_list
+
+
+def test_fuse_and_push_project_below_sample():
+    op_list = [{'op': 'project', 'args': {'output_cols': list(_static_schema_test.keys())[:6]}},
+               {'op': 'sample', 'args': {'frac': 0.5}},
+               {'op': 'project', 'args': {'output_cols': _project_cols[:1]}}]
+    assert optimized_op_list(op_list) == [{'op': 'project', 'args': {'output_cols': _project_cols[:1]}},
+                                          {'op': 'sample', 'args': {'frac': 0.5}}]
+
+
+def test_prune_columns_before_groupby():
+    op_list = [{'op': 'sample', 'args': {'frac': 0.5}}, _groupby]
+    assert optimized_op_list(op_list) == [{'op': 'project', 'args': {'output_cols': _project_cols}},
+                                          {'op': 'sample', 'args': {'frac': 0.5}},
+                                          _groupby]
+
+
+def test_push_project_below_merge():
+    op_list = [{'op': 'merge', 'args': {'key_col': 'a0UaD__zipcode_in_state'}},
+               {'op': 'project', 'args': {'output_cols': ['AqhyH__century', 'xYz12__city']}}]
+    assert optimized_op_list(op_list, (_static_schema_test, _right_schema)) == [
+        {'op': 'project', 'args': {'output_cols': ['a0UaD__zipcode_in_state', 'AqhyH__century']}},
+        {'op': 'merge', 'args': {'key_col': 'a0UaD__zipcode_in_state',
+                                 'right_cols': ['a0UaD__zipcode_in_state', 'xYz12__city']}},
+        {'op': 'project', 'args': {'output_cols': ['AqhyH__century', 'xYz12__city']}}]
+
+
+def test_pivot_is_left_alone():
+    op_list = [{'op': 'pivot', 'args': {'index_cols': ['RFD4U__uuid4'], 'columns': ['AqhyH__century'],
+                                        'value_col': ['zmpoV__randomize_nb_elements'], 'agg_func': 'sum'}}]
+    assert optimized_op_list(op_list) == op_list
+
+
+@pytest.mark.parametrize('artifact', static_artifact_fixtures)
+def test_optimized_operation(artifact, request):
+    concrete_artifact = request.getfixturevalue(artifact)
+    op_list = [{'op': 'project', 'args': {'output_cols': list(_static_schema_test.keys())[:12]}},
+               {'op': 'project', 'args': {'output_cols': _project_cols}},
+               _groupby]
+    results = []
+    for optimize_plan in [False, True]:
+        operation = concrete_artifact.operation_class(sources=[concrete_artifact], optimize_plan=optimize_plan,
+                                                      artifact_class=concrete_artifact.__class__)
+        for op_dict in op_list:
+            operation.chain_operation(op_dict['op'], op_dict['args'])
+        results.append(operation.execute(f'after_plan_{optimize_plan}'))
+        assert (operation.unoptimized_code is not None) == optimize_plan
+    unoptimized_df, optimized_df = [to_pandas(r.to_df()).sort_values('AqhyH__century').reset_index(drop=True)
+                                   for r in results]
+    assert unoptimized_df.equals(optimized_df)
+    assert len(unoptimized_df.index) > 0
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fuzzydata.core.generator import generate_ops_choices, generate_table
+from fuzzydata.core.statistics import compute_chunk_statistics, compute_statistics, parse_condition, \
+    propagate_statistics, select_condition
+from tests.conftest import _static_schema_test
+
+_schema = {'key__city': {'provider': 'city', 'cardinality': 5},
+           'num__pyint': 'pyint',
+           'text__sentence': 'sentence',
+           'null__random_int': {'provider': 'random_int', 'null_rate': 0.2}}
+
+
+@pytest.fixture(scope="module")
+def table():
+    return generate_table(2000, column_dict=_schema, seed=3)
+
+
+def test_compute_statistics(table):
+    statistics = compute_statistics(table, key_columns=['key__city'])
+    assert statistics['num_rows'] == 2000
+    key_stats = statistics['columns']['key__city']
+    assert key_stats['distinct'] == table['key__city'].nunique()
+    assert sorted(key_stats['values']) == sorted(table['key__city'].unique())
+    assert sum(count for _, count in key_stats['top_k']) == 2000
+    num_stats = statistics['columns']['num__pyint']
+    assert (num_stats['min'], num_stats['max']) == (table['num__pyint'].min(), table['num__pyint'].max())
+    assert statistics['columns']['null__random_int']['nulls'] == table['null__random_int'].isna().sum()
+    assert 'values' not in num_stats
+
+
+def test_compute_chunk_statistics(table):
+    statistics = compute_statistics(table, key_columns=['key__city'])
+    chunk_statistics = compute_chunk_statistics((table.iloc[start:start + 300] for start in range(0, 2000, 300)),
+                                                key_columns=['key__city'])
+    assert chunk_statistics['num_rows'] == 2000
+    for col, column_stats in statistics['columns'].items():
+        chunk_column_stats = chunk_statistics['columns'][col]
+        for stat in ['distinct', 'nulls', 'min', 'max']:
+            assert chunk_column_stats[stat] == column_stats[stat], (col, stat)
+        if column_stats['quantiles'] is not None and col != 'text__sentence':  # Strings are sampled differently
+            assert chunk_column_stats['quantiles'] == pytest.approx(column_stats['quantiles'])
+    key_stats = chunk_statistics['columns']['key__city']
+    assert sorted(key_stats['values']) == sorted(statistics['columns']['key__city']['values'])
+    assert dict(key_stats['top_k']) == dict(statistics['columns']['key__city']['top_k'])
+
+    # Distinct counts of columns beyond the sketch size are estimated
+    unique = pd.DataFrame({'id': np.arange(50000)})
+    estimate = compute_chunk_statistics(unique.iloc[start:start + 7000] for start in range(0, 50000, 7000))
+    assert estimate['columns']['id']['distinct'] == pytest.approx(50000, rel=0.05)
+    assert estimate['columns']['id']['top_k'][0][1] == 1
+
+
+@pytest.mark.parametrize('column', list(_schema))
+@pytest.mark.parametrize('selectivity', [0.1, 0.5, 0.9])
+def test_select_condition(table, column, selectivity):
+    statistics = compute_statistics(table)
+    condition, estimate = select_condition(column, statistics['columns'][column], 2000, selectivity)
+    assert parse_condition(condition)[0] == column
+    actual = len(table.query(condition).index) / 2000
+    assert actual == pytest.approx(estimate, abs=0.05)
+    if column != 'key__city':  # Low cardinality columns can only hit the target roughly
+        assert actual == pytest.approx(selectivity, abs=0.1)
+
+
+def test_propagate_statistics(table):
+    statistics = compute_statistics(table, key_columns=['key__city'])
+    condition, estimate = select_condition('num__pyint', statistics['columns']['num__pyint'], 2000, 0.5)
+    op_list = [{'op': 'select', 'args': {'condition': condition}},
+               {'op': 'sample', 'args': {'frac': 0.5}},
+               {'op': 'project', 'args': {'output_cols': ['key__city', 'num__pyint']}}]
+    propagated = propagate_statistics([statistics], op_list)
+    assert propagated['num_rows'] == int(round(2000 * estimate * 0.5))
+    assert list(propagated['columns']) == ['key__city', 'num__pyint']
+    assert propagated['columns']['num__pyint']['max'] <= parse_condition(condition)[2][0]
+    assert 'values' in propagated['columns']['key__city']
+    assert propagate_statistics([statistics], [{'op': 'groupby', 'args': {}}]) is None
+
+
+def test_generate_select_and_fill(table):
+    statistics = compute_statistics(table)
+    np.random.seed(0)
+    for _ in range(10):
+        ops_choices = {op['op']: op['args'] for op in generate_ops_choices(_schema, 2000, statistics=statistics,
+                                                                            selectivity=0.3)}
+        assert len(table.query(ops_choices['select']['condition']).index) > 0
+        fill = ops_choices['fill']
+        filled = table.replace({fill['col_name']: eval(fill['old_value'])}, eval(fill['new_value']))
+        assert not filled[fill['col_name']].equals(table[fill['col_name']])
+    assert 'select' not in {op['op'] for op in generate_ops_choices(_static_schema_test, 2000)}
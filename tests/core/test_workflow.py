@@ -1,10 +1,21 @@
 import glob
 import os.path
 import logging
+import pandas as pd
 import pytest
+import subprocess
+import sys
+import sqlalchemy
 
+from fuzzydata.clients.chunked import ChunkedWorkflow
+from fuzzydata.clients.engine import engine_manager
+from fuzzydata.clients.modin import ModinWorkflow
+from fuzzydata.clients.pandas import DataFrameWorkflow
+from fuzzydata.clients.sqlite import SQLWorkflow
 from fuzzydata.core.artifact import Artifact
-from tests.conftest import workflow_fixtures
+from fuzzydata.core.statistics import compute_statistics
+from fuzzydata.core.upsample import upsample_chunks
+from tests.conftest import workflow_fixtures, _static_schema_test
 
 # Disable Faker log spam in DEBUG mode
 logger = logging.getLogger(__name__)
@@ -63,3 +74,218 @@ def test_serialize_deserialize_workflow(abstract_workflow, request, tmpdir_facto
     new_out_dir = tmpdir_factory.mktemp('replay_wf')
     new_wf_cls = workflow.__class__
     new_wf_cls.load_workflow(output_path, new_out_dir, replay=True)
+
+
+@pytest.mark.parametrize('wf_class', [DataFrameWorkflow, ChunkedWorkflow])
+def test_upsample_replay(wf_class, tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('upsample_wf')
+    workflow = wf_class(name='test_upsample_wf', out_directory=output_path)
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+    workflow.generate_artifact_from_operation_list([base_artifact], _operation_list)
+    workflow.serialize_workflow()
+
+    replayed = wf_class.load_workflow(output_path, tmpdir_factory.mktemp('upsample_replay'), replay=True,
+                                      scale_artifact={'artifact_0': 1050}, scale_mode='upsample',
+                                      scale_options={'expand_keys': True, 'perturb': 0.1, 'chunk_rows': 300,
+                                                     'seed': 0})
+    original = base_artifact.to_df()
+    upsampled = replayed['artifact_0'].to_df()
+    assert len(upsampled.index) == 1050
+    # Replica 0 is the original artifact, the keys of the other replicas are distinct from it
+    assert upsampled['RFD4U__uuid4'].head(100).tolist() == original['RFD4U__uuid4'].tolist()
+    assert upsampled['RFD4U__uuid4'].is_unique
+    assert set(upsampled['AqhyH__century']) <= set(original['AqhyH__century'])
+    assert 'upsample' in set(pd.concat(replayed.perf_records)['op'])
+
+
+def test_chunked_replay_output(tmpdir_factory):
+    input_path = tmpdir_factory.mktemp('chunked_input_wf')
+    workflow = ChunkedWorkflow(name='test_chunked_input_wf', out_directory=input_path, chunk_size=30)
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+    workflow.generate_artifact_from_operation_list([base_artifact], _operation_list)
+    workflow.serialize_workflow()
+    input_files = {f: os.path.getmtime(f) for f in glob.glob(f'{workflow.artifact_dir}/*')}
+
+    replayed = ChunkedWorkflow.load_workflow(input_path, tmpdir_factory.mktemp('chunked_output_wf'), replay=True)
+    replayed.serialize_workflow()
+    assert {f: os.path.getmtime(f) for f in glob.glob(f'{workflow.artifact_dir}/*')} == input_files
+    assert sorted(os.listdir(replayed.artifact_dir)) == ['artifact_0.csv', 'artifact_1.csv']
+    assert len(replayed['artifact_1']) == 10
+
+    # Destroying a deserialized or serialized artifact keeps its file
+    for artifact in [replayed['artifact_0'], replayed['artifact_1']]:
+        artifact.destroy()
+        artifact.deserialize()
+        assert len(artifact) == len(workflow[artifact.label])
+    assert os.path.exists(f'{workflow.artifact_dir}/artifact_0.csv')
+
+
+def test_replay_csv_workflow_with_parquet_client(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('csv_wf')
+    workflow = DataFrameWorkflow(name='test_csv_wf', out_directory=output_path)
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+    workflow.generate_artifact_from_operation_list([base_artifact], _operation_list)
+    workflow.serialize_workflow()
+
+    # ModinWorkflow writes parquet by default, the pre-generated artifacts are read in the format they were written in
+    replayed = ModinWorkflow.load_workflow(output_path, tmpdir_factory.mktemp('csv_wf_replay'), replay=True)
+    assert replayed is not None
+    assert replayed['artifact_0'].file_format == 'csv'
+    assert [len(replayed[label]) for label in workflow.artifact_list] == \
+        [len(workflow[label]) for label in workflow.artifact_list]
+
+
+def test_upsample_keeps_merges():
+    fk_table = pd.DataFrame({'key': list('aabbcd'), 'value': range(6)})
+    pk_table = pd.DataFrame({'key': list('abc'), 'attribute': [1.0, 2.0, 3.0]})
+    merged = fk_table.merge(pk_table, on='key')
+
+    def upsample(df, expand_keys):
+        return pd.concat(upsample_chunks(df, 3 * len(df.index), key_columns=['key'], expand_keys=expand_keys,
+                                         perturb=0.5, chunk_rows=4, seed=1), ignore_index=True)
+
+    assert len(upsample(fk_table, False).merge(pk_table, on='key').index) == 3 * len(merged.index)
+    upsampled_pk_table = upsample(pk_table, True)
+    assert upsampled_pk_table['key'].is_unique
+    assert len(upsample(fk_table, True).merge(upsampled_pk_table, on='key').index) == 3 * len(merged.index)
+
+
+def test_sql_index_advisor(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('sql_index_wf')
+    workflow = SQLWorkflow(name='test_sql_index_wf', out_directory=output_path, auto_index=True)
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+    groupby_list = [{'op': 'groupby',
+                     'args': {'group_columns': ['AqhyH__century'],
+                              'agg_columns': ['zmpoV__randomize_nb_elements'],
+                              'agg_function': 'max'}}]
+    workflow.initialize_operation([base_artifact])
+    workflow.chain_to_current_operation(groupby_list)
+    assert workflow.advise_indexes(workflow.current_operation) == [(base_artifact.label, 'AqhyH__century')]
+    workflow.execute_current_operation(workflow.generate_next_label())
+
+    indexes = sqlalchemy.inspect(workflow.sql_engine).get_indexes(base_artifact.label)
+    assert ['AqhyH__century'] in [ix['column_names'] for ix in indexes]
+    perf = pd.concat(workflow.perf_records, ignore_index=True)
+    assert (perf['op'] == 'index').sum() == 1
+
+    # Views are traced back to the base table, which is already indexed
+    workflow.initialize_operation([workflow[workflow.artifact_list[-1]]])
+    workflow.chain_to_current_operation(groupby_list)
+    assert workflow.advise_indexes(workflow.current_operation) == []
+
+
+def test_sql_index_advisor_columns(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('sql_index_columns_wf')
+    workflow = SQLWorkflow(name='test_sql_index_columns_wf', out_directory=output_path)
+    left = workflow.generate_base_artifact(num_rows=20, column_maps={'key__pyint': 'pyint', 'ab__city': 'city',
+                                                                     'ab__city_suffix': 'city_suffix'})
+    right = workflow.generate_base_artifact(num_rows=20, column_maps={'key__pyint': 'pyint', 'cd__century': 'century'})
+
+    # A column label that is a prefix of the selected column is not advised
+    workflow.initialize_operation([left])
+    workflow.chain_to_current_operation([{'op': 'select', 'args': {'condition': "`ab__city_suffix` == 'Ville'"}}])
+    assert workflow.advise_indexes(workflow.current_operation) == [(left.label, 'ab__city_suffix')]
+
+    # Group columns of a merge result are resolved to the table that contains them
+    workflow.initialize_operation([left, right])
+    workflow.chain_to_current_operation([{'op': 'merge', 'args': {'key_col': 'key__pyint'}},
+                                         {'op': 'groupby', 'args': {'group_columns': ['cd__century'],
+                                                                    'agg_columns': ['ab__city'],
+                                                                    'agg_function': 'count'}}])
+    assert workflow.advise_indexes(workflow.current_operation) == [(left.label, 'key__pyint'),
+                                                                   (right.label, 'key__pyint'),
+                                                                   (right.label, 'cd__century')]
+
+
+def test_sql_statistics_catalog(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('sql_stats_wf')
+    workflow = SQLWorkflow(name='test_sql_stats_wf', out_directory=output_path, record_sizes=True)
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+    assert base_artifact.label not in workflow.stats_catalog  # Statistics are collected lazily
+    assert len(base_artifact) == 100
+    assert workflow.stats_catalog.get(base_artifact.label)['columns'] is None
+
+    # Statistics computed in the database match the ones computed from the table
+    key_columns = ['AqhyH__century']
+    statistics = workflow.artifact_statistics(base_artifact)
+    assert statistics is workflow.stats_catalog.statistics(base_artifact.label)
+    expected = compute_statistics(base_artifact.to_df(), key_columns=key_columns)
+    assert statistics['num_rows'] == 100
+    for col, column_stats in expected['columns'].items():
+        for stat in ['distinct', 'nulls', 'min', 'max']:
+            assert statistics['columns'][col][stat] == column_stats[stat], (col, stat)
+        assert sorted(count for _, count in statistics['columns'][col]['top_k']) == \
+            sorted(count for _, count in column_stats['top_k'])
+    assert statistics['columns']['zmpoV__randomize_nb_elements']['quantiles'] == \
+        pytest.approx(expected['columns']['zmpoV__randomize_nb_elements']['quantiles'])
+    assert statistics['columns']['RFD4U__uuid4']['quantiles'] == expected['columns']['RFD4U__uuid4']['quantiles']
+    assert sorted(workflow.stats_catalog.statistics(base_artifact.label, key_columns)['columns']['AqhyH__century']
+                  ['values']) == sorted(expected['columns']['AqhyH__century']['values'])
+
+    new_artifact = workflow.generate_artifact_from_operation_list([base_artifact], [{'op': 'sample',
+                                                                                    'args': {'frac': 0.5}}])
+    assert len(new_artifact) == 50
+    assert workflow.perf_records[-1]['rows'].iloc[0] == 50
+
+    base_artifact.from_df(base_artifact.to_df().head(10))
+    assert base_artifact.label not in workflow.stats_catalog
+    assert new_artifact.label not in workflow.stats_catalog  # Views derived from the rewritten table are stale
+    assert len(base_artifact) == 10
+    assert len(new_artifact) == 10  # The sample view keeps its row limit of 50
+
+
+def test_sql_statistics_sampled_view(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('sql_sample_stats_wf')
+    workflow = SQLWorkflow(name='test_sql_sample_stats_wf', out_directory=output_path)
+    schema = {'num__random_int': {'provider': 'random_int', 'null_rate': 0.5}, 'plain__city': 'city'}
+    base_artifact = workflow.generate_base_artifact(num_rows=100, column_maps=schema)
+    # Sample views return different rows on every query, so quantiles must not rely on counts of an earlier query
+    for _ in range(10):
+        new_artifact = workflow.generate_artifact_from_operation_list([base_artifact], [{'op': 'sample',
+                                                                                         'args': {'frac': 0.5}}])
+        quantiles = workflow.artifact_statistics(new_artifact)['columns']['num__random_int']['quantiles']
+        assert quantiles == sorted(quantiles)
+
+
+def test_modin_select(modin_workflow):
+    base_artifact = modin_workflow.generate_base_artifact(num_rows=100, column_maps=_static_schema_test)
+    new_artifact = modin_workflow.generate_artifact_from_operation_list(
+        [base_artifact], [{'op': 'select', 'args': {'condition': '`zmpoV__randomize_nb_elements` <= 10'}}])
+    expected = base_artifact.to_df()._to_pandas().query('`zmpoV__randomize_nb_elements` <= 10')
+    assert len(new_artifact) == len(expected.index)
+
+
+def test_modin_statistics(modin_workflow):
+    base_artifact = modin_workflow.generate_base_artifact(num_rows=1000, column_maps=_static_schema_test)
+    statistics = modin_workflow.artifact_statistics(base_artifact)
+    expected = compute_statistics(base_artifact.to_df()._to_pandas())
+    assert statistics['num_rows'] == 1000
+    for col, column_stats in expected['columns'].items():
+        assert {k: statistics['columns'][col][k] for k in ['distinct', 'nulls', 'min', 'max']} == \
+            {k: column_stats[k] for k in ['distinct', 'nulls', 'min', 'max']}
+
+
+def test_engine_reuse(modin_workflow, tmpdir_factory):
+    engine_client = engine_manager.client
+    second_workflow = ModinWorkflow(name='test_modin_wf_2', out_directory=tmpdir_factory.mktemp('fuzzydata_wf_2'))
+    assert engine_manager.running
+    assert engine_manager.client is engine_client
+    assert not any('engine_start' in set(r['op']) for r in second_workflow.perf_records)
+
+    # Closing a workflow keeps the engine running for the other open workflows
+    second_workflow.close()
+    assert engine_manager.running
+    assert engine_manager.client is engine_client
+    assert modin_workflow in engine_manager.workflows
+
+
+def test_lazy_client_registry():
+    from fuzzydata.clients import WorkflowRegistry, supported_workflows
+    assert supported_workflows['sql'] is SQLWorkflow
+    assert 'modin' in supported_workflows
+    assert list(WorkflowRegistry(['pandas', 'sql'])) == ['pandas', 'sql']
+
+    # Importing the CLI must not import any client or dataframe library
+    check = "import sys, fuzzydata.cli; assert not {'pandas', 'fuzzydata.clients.sqlite'} & set(sys.modules)"
+    subprocess.run([sys.executable, '-c', check], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from fuzzydata.cli import main
 
@@ -13,3 +15,30 @@ def test_main(tmpdir_factory):
         "--matfreq=2"
     ]
     main(args)
+
+
+def test_profile(tmpdir_factory):
+    output_file = str(tmpdir_factory.mktemp('cli_profile').join('costs.json'))
+    main(['profile', '--samples=20', '--providers=["pyint", "text"]', f'--output={output_file}'])
+    with open(output_file) as infile:
+        cost_table = json.load(infile)
+    assert set(cost_table) == {'pyint', 'text'}
+    assert cost_table['text']['bytes_per_row'] > cost_table['pyint']['bytes_per_row']
+
+
+def test_compare(tmpdir_factory):
+    output_path = tmpdir_factory.mktemp('cli_compare')
+    history_db = str(output_path.join('history.db'))
+    report_file = str(output_path.join('report.csv'))
+    main(["--wf_client=pandas", f"--output_dir={output_path.join('generated')}", "--columns=10", "--rows=100",
+          "--versions=5", f"--history_db={history_db}"])
+    main(["--wf_client=pandas", f"--output_dir={output_path.join('replayed')}", "--wf_name=replayed",
+          f"--replay_dir={output_path.join('generated')}", f"--history_db={history_db}"])
+    report = main(['compare', f'--history={history_db}', '--baseline=1', '--candidate=2', f'--output={report_file}'])
+    assert len(report.index) > 0 and set(report['status']) <= {'faster', 'slower', 'unchanged'}
+    with open(report_file) as infile:
+        assert infile.readline().startswith('dst,baseline_n,candidate_n')
+
+    from fuzzydata.core.history import HistoryStore
+    runs = HistoryStore(history_db).runs()
+    assert runs['fingerprint'].nunique() == 1